@@ -0,0 +1,4 @@
+"""
+Benchmarks that run against the database configured in Settings.
+Each module is runnable, e.g. `python -m app.benchmarks.bench_create_multi`
+"""
@@ -0,0 +1,771 @@
+"""
+End-to-end latency and throughput of every router, over a synthetic dataset.
+
+    python -m app.benchmarks.bench_api --teachers 20 --requests 20000 --concurrency 16
+
+Seeds a dataset whose size is set per entity: teachers, each with a group of
+students and a shelf of resources and cards; standards; goals per student
+with their resources; laps per goal and attempts per lap. A weighted mix of
+requests touching every router in `controller/api.py`, mostly students
+studying and teachers browsing their shelves, is then driven through the app
+in-process by `--concurrency` concurrent clients, over ASGI.
+
+Reports, as JSON, the dataset counts and for each endpoint its request
+count, error count, throughput, p50/p95/p99 latency, and the mean database
+time and query count taken from its Server-Timing header. Everything seeded
+or created by the run is tagged and removed afterwards, unless `--keep`.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import random
+import re
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Any, Callable, Optional
+
+import httpx
+from pydantic import SecretStr
+from sqlalchemy import delete, insert, or_, select
+from sqlmodel import Session
+
+from app import crud
+from app.core.auth import create_access_token, role_claims
+from app.core.security import get_password_hash
+from app.database import async_engine, engine
+from app.deps import get_settings
+from app.models import (
+    Attempt,
+    AttemptCreateInternal,
+    Card,
+    CardCreate,
+    Goal,
+    GoalCreate,
+    GoalResource,
+    GoalResourceCreate,
+    Group,
+    GroupCreate,
+    Lap,
+    LapCreate,
+    Resource,
+    ResourceCreateInternal,
+    ResourceFormat,
+    Role,
+    Standard,
+    StandardCreate,
+    StandardResource,
+    StandardResourceCreate,
+    Subject,
+    Topic,
+    TopicCreate,
+    User,
+    UserGroup,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("app.benchmarks.bench_api")
+
+PASSWORD = "bench12345"
+SERVER_TIMING_DB = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries"')
+
+# method, path, kwargs for httpx, under an endpoint name
+Call = tuple[str, str, str, dict[str, Any]]
+
+
+@dataclass
+class Dataset:
+    tag: str
+    password_hash: Optional[SecretStr] = None
+    users: dict[int, tuple[Optional[Role], bool]] = field(default_factory=dict)
+    emails: dict[int, str] = field(default_factory=dict)
+    superuser_id: int = 0
+    teachers: list[int] = field(default_factory=list)
+    group_of: dict[int, int] = field(default_factory=dict)
+    students_of: dict[int, list[int]] = field(default_factory=dict)
+    resources_of: dict[int, list[int]] = field(default_factory=dict)
+    cards_of: dict[int, list[tuple[int, str]]] = field(default_factory=dict)
+    standards: list[int] = field(default_factory=list)
+    standard_links: set[tuple[int, int]] = field(default_factory=set)
+    goals: list[tuple[int, int, int]] = field(default_factory=list)
+    student_of_goal: dict[int, int] = field(default_factory=dict)
+    resources_of_goal: dict[int, list[int]] = field(default_factory=dict)
+    goal_links: set[tuple[int, int]] = field(default_factory=set)
+    laps: list[tuple[int, int, int]] = field(default_factory=list)
+    n_attempts: int = 0
+    tokens: dict[int, str] = field(default_factory=dict)
+
+    def email(self, name: str) -> str:
+        return f"bench-{self.tag}-{name}@example.com"
+
+    def label(self, name: str) -> str:
+        return f"bench-{self.tag}-{name}"
+
+    def headers(self, user_id: int) -> dict[str, str]:
+        if user_id not in self.tokens:
+            settings = get_settings()
+            role, is_superuser = self.users[user_id]
+            claims = None
+            if settings.ROLE_CLAIMS_VERSION is not None:
+                claims = role_claims(
+                    User(id=user_id, role=role, is_superuser=is_superuser),
+                    settings.ROLE_CLAIMS_VERSION,
+                )
+            self.tokens[user_id] = create_access_token(
+                subject=str(user_id),
+                exp=settings.ACCESS_TOKEN_EXPIRE_MINUTES,
+                key=settings.JWT_SECRET,
+                algo=settings.ALGORITHM,
+                claims=claims,
+            )
+        return {"Authorization": f"Bearer {self.tokens[user_id]}"}
+
+    def counts(self) -> dict[str, int]:
+        return dict(
+            teachers=len(self.teachers),
+            students=sum(map(len, self.students_of.values())),
+            resources=sum(map(len, self.resources_of.values())),
+            cards=sum(map(len, self.cards_of.values())),
+            standards=len(self.standards),
+            goals=len(self.goals),
+            laps=len(self.laps),
+            attempts=self.n_attempts,
+        )
+
+
+"""
+Seeding
+"""
+
+
+def create_users(
+        session: Session, ds: Dataset, names: list[str], role: Optional[Role]
+) -> list[int]:
+    """Users sharing one password hash, so seeding costs a single bcrypt"""
+    if ds.password_hash is None:
+        ds.password_hash = get_password_hash(PASSWORD)
+    users_in = [
+        User(email=ds.email(name), role=role, hashed_password=ds.password_hash)
+        for name in names
+    ]
+    users = crud.user.create_multi(session, objs_in=users_in, bulk=True)
+    for user in users:
+        ds.users[user.id] = (role, False)
+        ds.emails[user.id] = user.email
+    return [user.id for user in users]
+
+
+def seed_teacher(session: Session, ds: Dataset, t: int, args, rng: random.Random):
+    """A teacher with their group of students, resources and goals"""
+    [teacher_id] = create_users(session, ds, [f"t{t}"], Role.teacher)
+    student_ids = create_users(
+        session, ds, [f"t{t}s{s}" for s in range(args.students)], Role.student
+    )
+    [group] = crud.group.create_multi(
+        session, objs_in=[GroupCreate(label=ds.label(f"t{t}"))], bulk=True
+    )
+    session.execute(
+        insert(UserGroup),
+        [dict(user_id=u, group_id=group.id) for u in [teacher_id, *student_ids]],
+    )
+    session.commit()
+    ds.teachers.append(teacher_id)
+    ds.group_of[teacher_id] = group.id
+    ds.students_of[teacher_id] = student_ids
+
+    resources_in = [
+        ResourceCreateInternal(
+            name=ds.label(f"t{t}r{r}"),
+            private=rng.random() < 0.7,
+            format=ResourceFormat.flashcard,
+            creator_id=teacher_id,
+        )
+        for r in range(args.resources)
+    ]
+    resources = crud.resource.create_multi(session, objs_in=resources_in, bulk=True)
+    resource_ids = [r.id for r in resources]
+    ds.resources_of[teacher_id] = resource_ids
+    cards_in = [
+        CardCreate(question=f"q{r}.{c}", answer=f"a{r}.{c}", resource_id=r)
+        for r in resource_ids
+        for c in range(args.cards)
+    ]
+    for card in crud.card.create_multi(session, objs_in=cards_in, bulk=True):
+        ds.cards_of.setdefault(card.resource_id, []).append((card.id, card.answer))
+    links_in = [
+        StandardResourceCreate(standard_id=s, resource_id=r)
+        for r in resource_ids
+        for s in rng.sample(ds.standards, min(2, len(ds.standards)))
+    ]
+    crud.standard_resource.create_multi(session, objs_in=links_in, bulk=True)
+    ds.standard_links.update((link.resource_id, link.standard_id) for link in links_in)
+
+    goals_in = [
+        GoalCreate(
+            teacher_id=teacher_id,
+            student_id=student_id,
+            standard_id=rng.choice(ds.standards),
+            group_id=group.id,
+            start_date=date.today(),
+            end_date=date.today() + timedelta(days=rng.randint(7, 90)),
+            accuracy=rng.choice([70, 80, 90]),
+            n_trials=rng.choice([10, 20, 50]),
+        )
+        for student_id in student_ids
+        for _ in range(args.goals)
+    ]
+    goals = crud.goal.create_multi(session, objs_in=goals_in, bulk=True)
+    goal_links_in = [
+        GoalResourceCreate(goal_id=g.id, resource_id=r)
+        for g in goals
+        for r in rng.sample(resource_ids, min(2, len(resource_ids)))
+    ]
+    crud.goal_resource.create_multi(session, objs_in=goal_links_in, bulk=True)
+    for link in goal_links_in:
+        ds.resources_of_goal.setdefault(link.goal_id, []).append(link.resource_id)
+        ds.goal_links.add((link.goal_id, link.resource_id))
+    for g in goals:
+        ds.goals.append((g.id, teacher_id, g.student_id))
+        ds.student_of_goal[g.id] = g.student_id
+
+    laps_in = [
+        LapCreate(goal_id=g.id, resource_id=rng.choice(ds.resources_of_goal[g.id]))
+        for g in goals
+        for _ in range(args.laps)
+        if g.id in ds.resources_of_goal
+    ]
+    laps = crud.lap.create_multi(session, objs_in=laps_in, bulk=True)
+    ds.laps.extend((lap.id, lap.goal_id, lap.resource_id) for lap in laps)
+    attempts_in = []
+    for lap in laps:
+        cards = ds.cards_of.get(lap.resource_id, [])
+        for card_id, answer in rng.sample(cards, min(args.attempts, len(cards))):
+            correct = rng.random() < 0.75
+            attempts_in.append(
+                AttemptCreateInternal(
+                    lap_id=lap.id,
+                    card_id=card_id,
+                    submission=answer if correct else "?",
+                    correct=correct,
+                )
+            )
+    crud.attempt.create_multi(session, objs_in=attempts_in, bulk=True)
+    ds.n_attempts += len(attempts_in)
+    session.expunge_all()
+
+
+def seed(session: Session, args, rng: random.Random) -> Dataset:
+    ds = Dataset(tag=f"{time.time_ns():x}")
+    [ds.superuser_id] = create_users(session, ds, ["admin"], None)
+    crud.user.make_superuser(session, db_obj=crud.user.get(session, ds.superuser_id))
+    ds.users[ds.superuser_id] = (None, True)
+
+    n_topics = max(1, args.standards // 12)
+    topics_in = [TopicCreate(description=ds.label(f"topic{i}")) for i in range(n_topics)]
+    topics = crud.topic.create_multi(session, objs_in=topics_in, bulk=True)
+    standards_in = [
+        StandardCreate(
+            template=ds.label(f"std{i}"),
+            grade=rng.randint(1, 12),
+            subject=rng.choice(list(Subject)),
+            topic_id=topics[i % n_topics].id,
+        )
+        for i in range(args.standards)
+    ]
+    standards = crud.standard.create_multi(session, objs_in=standards_in, bulk=True)
+    ds.standards = [s.id for s in standards]
+
+    for t in range(args.teachers):
+        seed_teacher(session, ds, t, args, rng)
+        logger.info(f"Seeded teacher {t + 1}/{args.teachers}")
+    return ds
+
+
+def drop(session: Session, tag: str) -> None:
+    """Remove everything tagged by one run, seeded or created through the API"""
+    users = select(User.id).where(User.email.like(f"bench-{tag}-%"))
+    goals = select(Goal.id).where(
+        or_(Goal.teacher_id.in_(users), Goal.student_id.in_(users))
+    )
+    laps = select(Lap.id).where(Lap.goal_id.in_(goals))
+    resources = select(Resource.id).where(Resource.creator_id.in_(users))
+    topics = select(Topic.id).where(Topic.description.like(f"bench-{tag}-%"))
+    standards = select(Standard.id).where(Standard.topic_id.in_(topics))
+    statements = (
+        delete(Attempt).where(Attempt.lap_id.in_(laps)),
+        delete(Lap).where(Lap.goal_id.in_(goals)),
+        delete(GoalResource).where(GoalResource.goal_id.in_(goals)),
+        delete(Goal).where(Goal.id.in_(goals)),
+        delete(Card).where(Card.resource_id.in_(resources)),
+        delete(StandardResource).where(
+            or_(
+                StandardResource.resource_id.in_(resources),
+                StandardResource.standard_id.in_(standards),
+            )
+        ),
+        delete(Resource).where(Resource.id.in_(resources)),
+        delete(UserGroup).where(UserGroup.user_id.in_(users)),
+        delete(Group).where(Group.label.like(f"bench-{tag}-%")),
+        delete(User).where(User.id.in_(users)),
+        delete(Standard).where(Standard.id.in_(standards)),
+        delete(Topic).where(Topic.id.in_(topics)),
+    )
+    for stmt in statements:
+        session.execute(stmt, execution_options={"synchronize_session": False})
+    session.commit()
+    crud.catalog.invalidate()
+
+
+"""
+Request mix
+
+Each scenario picks its actors and targets from the dataset and returns the
+call to make, or None when the dataset has nothing it can use.
+"""
+
+
+def _student_goal(ds: Dataset, rng: random.Random) -> tuple[int, int, int]:
+    return rng.choice(ds.goals)
+
+
+def _teacher_resource(ds: Dataset, rng: random.Random) -> tuple[int, int]:
+    teacher_id = rng.choice(ds.teachers)
+    return teacher_id, rng.choice(ds.resources_of[teacher_id])
+
+
+def get_user_me(ds, rng):
+    user_id = rng.choice(list(ds.users))
+    return "GET", "/user/me", dict(headers=ds.headers(user_id))
+
+
+def patch_user_me(ds, rng):
+    _, _, student_id = _student_goal(ds, rng)
+    body = {"display_name": f"student {rng.randint(0, 999)}"}
+    return "PATCH", "/user/me", dict(json=body, headers=ds.headers(student_id))
+
+
+def get_users(ds, rng):
+    params = {"limit": 100}
+    return "GET", "/user/", dict(params=params, headers=ds.headers(ds.superuser_id))
+
+
+def get_standards(ds, rng):
+    _, _, student_id = _student_goal(ds, rng)
+    params = {"grade": rng.randint(1, 12)}
+    return "GET", "/standard/", dict(params=params, headers=ds.headers(student_id))
+
+
+def get_standard(ds, rng):
+    _, _, student_id = _student_goal(ds, rng)
+    path = f"/standard/{rng.choice(ds.standards)}"
+    return "GET", path, dict(headers=ds.headers(student_id))
+
+
+def get_resources(ds, rng):
+    teacher_id = rng.choice(ds.teachers)
+    params = {"limit": 100}
+    return "GET", "/resource/", dict(params=params, headers=ds.headers(teacher_id))
+
+
+def get_resources_by_standard(ds, rng):
+    teacher_id = rng.choice(ds.teachers)
+    params = {"standard_id": rng.choice(ds.standards), "include_public": True}
+    return "GET", "/resource/", dict(params=params, headers=ds.headers(teacher_id))
+
+
+def get_resource(ds, rng):
+    teacher_id, resource_id = _teacher_resource(ds, rng)
+    return "GET", f"/resource/{resource_id}", dict(headers=ds.headers(teacher_id))
+
+
+def get_cards(ds, rng):
+    teacher_id, resource_id = _teacher_resource(ds, rng)
+    params = {"resource_id": resource_id}
+    return "GET", "/card/", dict(params=params, headers=ds.headers(teacher_id))
+
+
+def get_card(ds, rng):
+    teacher_id, resource_id = _teacher_resource(ds, rng)
+    if not ds.cards_of.get(resource_id):
+        return None
+    card_id, _ = rng.choice(ds.cards_of[resource_id])
+    return "GET", f"/card/{card_id}", dict(headers=ds.headers(teacher_id))
+
+
+def get_goal(ds, rng):
+    goal_id, _, student_id = _student_goal(ds, rng)
+    return "GET", f"/goal/{goal_id}", dict(headers=ds.headers(student_id))
+
+
+def get_goal_progress(ds, rng):
+    goal_id, _, student_id = _student_goal(ds, rng)
+    return "GET", f"/goal/{goal_id}/progress", dict(headers=ds.headers(student_id))
+
+
+def _student_lap(ds: Dataset, rng: random.Random) -> Optional[tuple[int, int, int]]:
+    if not ds.laps:
+        return None
+    lap_id, goal_id, resource_id = rng.choice(ds.laps)
+    student_id = ds.student_of_goal[goal_id]
+    return lap_id, resource_id, student_id
+
+
+def get_lap(ds, rng):
+    if not (picked := _student_lap(ds, rng)):
+        return None
+    lap_id, _, student_id = picked
+    return "GET", f"/lap/{lap_id}", dict(headers=ds.headers(student_id))
+
+
+def post_lap(ds, rng):
+    goal_id, _, student_id = _student_goal(ds, rng)
+    resources = ds.resources_of_goal.get(goal_id)
+    if not resources:
+        return None
+    body = {"goal_id": goal_id, "resource_id": rng.choice(resources)}
+    return "POST", "/lap/", dict(json=body, headers=ds.headers(student_id))
+
+
+def _answers(ds, rng, resource_id, n):
+    """Submissions for up to `n` of a resource's cards, three in four right"""
+    cards = ds.cards_of.get(resource_id, [])
+    return [
+        {"card_id": card_id, "submission": answer if rng.random() < 0.75 else "?"}
+        for card_id, answer in rng.sample(cards, min(n, len(cards)))
+    ]
+
+
+def post_attempt(ds, rng):
+    if not (picked := _student_lap(ds, rng)):
+        return None
+    lap_id, resource_id, student_id = picked
+    answers = _answers(ds, rng, resource_id, 1)
+    if not answers:
+        return None
+    body = dict(answers[0], lap_id=lap_id)
+    return "POST", "/attempt/", dict(json=body, headers=ds.headers(student_id))
+
+
+def post_attempt_batch(ds, rng):
+    if not (picked := _student_lap(ds, rng)):
+        return None
+    lap_id, resource_id, student_id = picked
+    answers = _answers(ds, rng, resource_id, 20)
+    if not answers:
+        return None
+    body = {"lap_id": lap_id, "attempts": answers}
+    return "POST", "/attempt/batch", dict(json=body, headers=ds.headers(student_id))
+
+
+def post_resource(ds, rng):
+    teacher_id = rng.choice(ds.teachers)
+    body = {"name": ds.label(f"new{rng.randint(0, 10**9)}"), "private": True}
+    return "POST", "/resource/", dict(json=body, headers=ds.headers(teacher_id))
+
+
+def patch_resource(ds, rng):
+    teacher_id, resource_id = _teacher_resource(ds, rng)
+    body = {"name": ds.label(f"renamed{resource_id}"), "private": rng.random() < 0.7}
+    return "PATCH", f"/resource/{resource_id}", dict(
+        json=body, headers=ds.headers(teacher_id)
+    )
+
+
+def post_card(ds, rng):
+    teacher_id, resource_id = _teacher_resource(ds, rng)
+    body = {"question": "new q", "answer": "new a", "resource_id": resource_id}
+    return "POST", "/card/", dict(json=body, headers=ds.headers(teacher_id))
+
+
+def patch_card(ds, rng):
+    teacher_id, resource_id = _teacher_resource(ds, rng)
+    if not ds.cards_of.get(resource_id):
+        return None
+    card_id, answer = rng.choice(ds.cards_of[resource_id])
+    body = {"question": f"edited {card_id}", "answer": answer}
+    return "PATCH", f"/card/{card_id}", dict(json=body, headers=ds.headers(teacher_id))
+
+
+def post_goal(ds, rng):
+    teacher_id = rng.choice(ds.teachers)
+    if not ds.students_of[teacher_id]:
+        return None
+    body = {
+        "student_id": rng.choice(ds.students_of[teacher_id]),
+        "standard_id": rng.choice(ds.standards),
+        "group_id": ds.group_of[teacher_id],
+        "start_date": date.today().isoformat(),
+        "end_date": (date.today() + timedelta(days=30)).isoformat(),
+        "accuracy": 80,
+        "n_trials": 20,
+    }
+    return "POST", "/goal/", dict(json=body, headers=ds.headers(teacher_id))
+
+
+def _unlinked(ds, rng, links, owner_id, candidates, n):
+    """Up to `n` candidates not yet linked to `owner_id`, now counted as linked"""
+    picked = [c for c in candidates if (owner_id, c) not in links]
+    picked = rng.sample(picked, min(n, len(picked)))
+    links.update((owner_id, c) for c in picked)
+    return picked
+
+
+def post_goal_resource_link(ds, rng, n=1):
+    goal_id, teacher_id, _ = _student_goal(ds, rng)
+    resource_ids = _unlinked(
+        ds, rng, ds.goal_links, goal_id, ds.resources_of[teacher_id], n
+    )
+    if len(resource_ids) < n:
+        return None
+    headers = ds.headers(teacher_id)
+    if n == 1:
+        body = {"goal_id": goal_id, "resource_id": resource_ids[0]}
+        return "POST", "/goal/resource-link/", dict(json=body, headers=headers)
+    body = {"goal_id": goal_id, "resource_ids": resource_ids}
+    return "POST", "/goal/resource-link/multi/", dict(json=body, headers=headers)
+
+
+def post_goal_resource_links(ds, rng):
+    return post_goal_resource_link(ds, rng, n=2)
+
+
+def post_standard_link(ds, rng, n=1):
+    teacher_id, resource_id = _teacher_resource(ds, rng)
+    standard_ids = _unlinked(
+        ds, rng, ds.standard_links, resource_id, ds.standards, n
+    )
+    if len(standard_ids) < n:
+        return None
+    headers = ds.headers(teacher_id)
+    if n == 1:
+        body = {"resource_id": resource_id, "standard_id": standard_ids[0]}
+        return "POST", "/resource/standard-link/", dict(json=body, headers=headers)
+    body = {"resource_id": resource_id, "standard_ids": standard_ids}
+    return "POST", "/resource/standard-link/multi", dict(json=body, headers=headers)
+
+
+def post_standard_links(ds, rng):
+    return post_standard_link(ds, rng, n=2)
+
+
+def post_topic(ds, rng):
+    body = {"description": ds.label(f"topic-new{rng.randint(0, 10**9)}")}
+    return "POST", "/topic/", dict(json=body, headers=ds.headers(ds.superuser_id))
+
+
+def post_signup(ds, rng):
+    body = {"email": ds.email(f"signup{rng.randint(0, 10**9)}"), "password": PASSWORD}
+    return "POST", "/auth/signup", dict(json=body)
+
+
+def post_login(ds, rng):
+    _, _, student_id = _student_goal(ds, rng)
+    form = {"username": ds.emails[student_id], "password": PASSWORD}
+    return "POST", "/auth/login", dict(data=form)
+
+
+def get_pool_stats(ds, rng):
+    return "GET", "/internal/pool", dict(headers=ds.headers(ds.superuser_id))
+
+
+# (endpoint, relative weight, scenario)
+MIX: list[tuple[str, float, Callable]] = [
+    ("GET /user/me", 5, get_user_me),
+    ("PATCH /user/me", 1, patch_user_me),
+    ("GET /user/", 0.5, get_users),
+    ("GET /standard/", 3, get_standards),
+    ("GET /standard/{standard_id}", 5, get_standard),
+    ("GET /resource/", 4, get_resources),
+    ("GET /resource/?standard_id", 2, get_resources_by_standard),
+    ("GET /resource/{resource_id}", 4, get_resource),
+    ("GET /card/?resource_id", 6, get_cards),
+    ("GET /card/{card_id}", 4, get_card),
+    ("GET /goal/{goal_id}", 6, get_goal),
+    ("GET /goal/{goal_id}/progress", 8, get_goal_progress),
+    ("GET /lap/{lap_id}", 6, get_lap),
+    ("POST /lap/", 3, post_lap),
+    ("POST /attempt/", 12, post_attempt),
+    ("POST /attempt/batch", 3, post_attempt_batch),
+    ("POST /resource/", 1, post_resource),
+    ("PATCH /resource/{resource_id}", 1, patch_resource),
+    ("POST /card/", 1, post_card),
+    ("PATCH /card/{card_id}", 1, patch_card),
+    ("POST /goal/", 1, post_goal),
+    ("POST /goal/resource-link/", 0.5, post_goal_resource_link),
+    ("POST /goal/resource-link/multi/", 0.5, post_goal_resource_links),
+    ("POST /resource/standard-link/", 0.5, post_standard_link),
+    ("POST /resource/standard-link/multi", 0.5, post_standard_links),
+    ("POST /topic/", 0.1, post_topic),
+    ("POST /auth/signup", 0.2, post_signup),
+    ("POST /auth/login", 0.5, post_login),
+    ("GET /internal/pool", 0.2, get_pool_stats),
+]
+
+
+def plan(
+        ds: Dataset, n: int, rng: random.Random, only: Optional[set[str]]
+) -> list[Call]:
+    mix = [m for m in MIX if only is None or m[0] in only]
+    weights = [weight for _, weight, _ in mix]
+    calls = []
+    while len(calls) < n:
+        name, _, scenario = rng.choices(mix, weights)[0]
+        call = scenario(ds, rng)
+        if call is not None:
+            calls.append((name, *call))
+    return calls
+
+
+"""
+Driving and reporting
+"""
+
+
+async def drive(app, calls: list[Call], concurrency: int) -> tuple[list[tuple], float]:
+    """Make `calls` through `concurrency` clients, timing each of them"""
+    samples = []
+    pending = iter(calls)
+
+    async def client_loop(client: httpx.AsyncClient):
+        for name, method, path, kwargs in pending:
+            start = time.perf_counter()
+            response = await client.request(method, path, **kwargs)
+            elapsed = time.perf_counter() - start
+            db = SERVER_TIMING_DB.search(response.headers.get("server-timing", ""))
+            samples.append(
+                (
+                    name,
+                    response.status_code,
+                    elapsed,
+                    float(db[1]) if db else None,
+                    int(db[2]) if db else None,
+                )
+            )
+
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        wall = time.perf_counter() - start
+    return samples, wall
+
+
+async def warm_and_drive(
+        app, warmup: list[Call], calls: list[Call], concurrency: int
+) -> tuple[list[tuple], float]:
+    """
+    `drive` the warmup calls, unmeasured, then the measured ones. asyncpg
+    connections belong to the event loop that opened them, so both run in
+    one loop and the async pool is emptied before the loop closes.
+    """
+    try:
+        await drive(app, warmup, concurrency)
+        return await drive(app, calls, concurrency)
+    finally:
+        await async_engine.dispose()
+
+
+def percentile(ordered: list[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def summarize(samples: list[tuple], wall: float) -> dict[str, Any]:
+    def stats(group: list[tuple]) -> dict[str, Any]:
+        latencies = sorted(s[2] * 1000 for s in group)
+        db = [(s[3], s[4]) for s in group if s[3] is not None]
+        statuses = Counter(s[1] for s in group)
+        return dict(
+            requests=len(group),
+            errors=sum(n for status, n in statuses.items() if status >= 400),
+            statuses={str(k): v for k, v in sorted(statuses.items())},
+            throughput_rps=round(len(group) / wall, 2),
+            latency_ms=dict(
+                mean=round(sum(latencies) / len(latencies), 3),
+                p50=round(percentile(latencies, 50), 3),
+                p95=round(percentile(latencies, 95), 3),
+                p99=round(percentile(latencies, 99), 3),
+                max=round(latencies[-1], 3),
+            ),
+            db_ms_mean=round(sum(d for d, _ in db) / len(db), 3) if db else None,
+            queries_mean=round(sum(q for _, q in db) / len(db), 2) if db else None,
+        )
+
+    by_endpoint = defaultdict(list)
+    for sample in samples:
+        by_endpoint[sample[0]].append(sample)
+    return dict(
+        total=stats(samples),
+        endpoints={name: stats(group) for name, group in sorted(by_endpoint.items())},
+    )
+
+
+def run(args) -> dict[str, Any]:
+    from app.main import app
+
+    # every slow request would be logged with its SQL otherwise
+    logging.getLogger("app.core.query_stats").setLevel(logging.ERROR)
+    rng = random.Random(args.seed)
+    with Session(engine) as session:
+        start = time.perf_counter()
+        ds = seed(session, args, rng)
+        seed_s = time.perf_counter() - start
+        try:
+            only = set(args.endpoints) if args.endpoints else None
+            warmup = plan(ds, args.warmup, rng, only)
+            calls = plan(ds, args.requests, rng, only)
+            samples, wall = asyncio.run(
+                warm_and_drive(app, warmup, calls, args.concurrency)
+            )
+        finally:
+            if not args.keep:
+                drop(session, ds.tag)
+    return dict(
+        dataset=dict(ds.counts(), tag=ds.tag, seed_s=round(seed_s, 2)),
+        requests=len(calls),
+        concurrency=args.concurrency,
+        wall_s=round(wall, 3),
+        **summarize(samples, wall),
+    )
+
+
+def add_dataset_arguments(parser: argparse.ArgumentParser) -> None:
+    dataset = parser.add_argument_group("dataset")
+    dataset.add_argument("--teachers", type=int, default=10)
+    dataset.add_argument("--students", type=int, default=20, help="per teacher")
+    dataset.add_argument("--resources", type=int, default=10, help="per teacher")
+    dataset.add_argument("--cards", type=int, default=20, help="per resource")
+    dataset.add_argument("--standards", type=int, default=60)
+    dataset.add_argument("--goals", type=int, default=2, help="per student")
+    dataset.add_argument("--laps", type=int, default=3, help="per goal")
+    dataset.add_argument("--attempts", type=int, default=20, help="per lap")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    add_dataset_arguments(parser)
+    load = parser.add_argument_group("load")
+    load.add_argument("--requests", type=int, default=5000)
+    load.add_argument("--warmup", type=int, default=200)
+    load.add_argument("--concurrency", type=int, default=8)
+    load.add_argument(
+        "--endpoints", nargs="+", choices=[name for name, _, _ in MIX],
+        help="only drive these endpoints",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--keep", action="store_true", help="keep the dataset")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Per-row insert cost of CRUDBase.create_multi, per-row vs bulk mode.
+
+    python -m app.benchmarks.bench_create_multi --sizes 10 1000 100000
+
+Cards are written to a throwaway user/resource which is removed afterwards.
+"""
+import argparse
+import json
+import logging
+import time
+
+from sqlalchemy import delete
+from sqlmodel import Session
+
+from app import crud
+from app.database import engine
+from app.models import Card, CardCreate, ResourceCreateInternal, User, UserCreate
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("app.benchmarks.bench_create_multi")
+
+DEFAULT_SIZES = (10, 1_000, 100_000)
+
+
+def time_create_multi(session: Session, resource_id: int, n: int, bulk: bool) -> float:
+    """Return seconds taken to create `n` cards in one create_multi call"""
+    cards_in = [
+        CardCreate(question=f"q{i}", answer=f"a{i}", resource_id=resource_id)
+        for i in range(n)
+    ]
+    start = time.perf_counter()
+    crud.card.create_multi(session, objs_in=cards_in, bulk=bulk)
+    elapsed = time.perf_counter() - start
+    session.execute(delete(Card).where(Card.resource_id == resource_id))
+    session.commit()
+    session.expunge_all()
+    return elapsed
+
+
+def run(sizes: list[int], modes: list[str]) -> list[dict]:
+    results = []
+    with Session(engine) as session:
+        user = crud.user.create(
+            session,
+            obj_in=UserCreate(
+                email=f"bench-{time.time_ns()}@example.com", password="bench12345"
+            ),
+        )
+        resource = crud.resource.create(
+            session,
+            obj_in=ResourceCreateInternal(name="bench", creator_id=user.id),
+        )
+        user_id, resource_id = user.id, resource.id
+        try:
+            for n in sizes:
+                for mode in modes:
+                    elapsed = time_create_multi(
+                        session, resource_id, n, bulk=mode == "bulk"
+                    )
+                    result = dict(
+                        rows=n,
+                        mode=mode,
+                        total_s=round(elapsed, 4),
+                        per_row_us=round(elapsed / n * 1e6, 2),
+                    )
+                    logger.info(result)
+                    results.append(result)
+        finally:
+            crud.resource.remove(session, _id=resource_id)
+            session.delete(session.get(User, user_id))
+            session.commit()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument(
+        "--modes", nargs="+", choices=("per-row", "bulk"), default=("per-row", "bulk")
+    )
+    args = parser.parse_args()
+    print(json.dumps(run(args.sizes, args.modes), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Peak RSS of the list endpoints, paged JSON vs streamed NDJSON.
+
+    python -m app.benchmarks.bench_list_streaming --rows 100000
+
+Seeds `--rows` resources for a throwaway user, then for each mode starts a
+fresh interpreter that fetches the whole collection and reports its peak
+resident set size:
+
+* `materialized`: one unbounded read validated and encoded as a single JSON
+  list, the way the list routes worked before cursors and streaming
+* `json-pages`: GET /resource/ page by page, following X-Next-Cursor
+* `ndjson`: one streamed GET /resource/ with `Accept: application/x-ndjson`
+
+HTTP response bodies are discarded as they arrive, so only the server side
+is measured.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import resource as rlimit
+import subprocess
+import sys
+import time
+from urllib.parse import urlencode
+
+from sqlalchemy import delete
+from sqlmodel import Session
+
+from app import crud
+from app.database import engine
+from app.models import Resource, ResourceCreateInternal, User, UserCreate
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("app.benchmarks.bench_list_streaming")
+
+MODES = ("materialized", "json-pages", "ndjson")
+PAGE_SIZE = 5000
+
+
+async def asgi_get(app, path: str, params: dict, headers: dict) -> tuple[dict, int]:
+    """Drive a GET through `app`, returning response headers and body size"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": urlencode(params).encode(),
+        "root_path": "",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        "client": ("bench", 0),
+        "server": ("bench", 80),
+    }
+    response_headers, n_bytes = {}, 0
+    request_sent, response_complete = False, asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await response_complete.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal n_bytes
+        if message["type"] == "http.response.start":
+            response_headers.update(
+                (k.decode().lower(), v.decode()) for k, v in message["headers"]
+            )
+        elif message["type"] == "http.response.body":
+            n_bytes += len(message.get("body", b""))
+            if not message.get("more_body", False):
+                response_complete.set()
+
+    await app(scope, receive, send)
+    return response_headers, n_bytes
+
+
+def child(mode: str, user_id: int) -> dict:
+    """Fetch every resource of `user_id` in one mode, measured in this process"""
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+
+    from app.core.auth import create_access_token
+    from app.deps import get_settings
+    from app.main import app
+    from app.models import ResourceRead
+
+    settings = get_settings()
+    token = create_access_token(
+        subject=str(user_id),
+        exp=settings.ACCESS_TOKEN_EXPIRE_MINUTES,
+        key=settings.JWT_SECRET,
+        algo=settings.ALGORITHM,
+    )
+    headers = {"Authorization": f"Bearer {token}"}
+    rss_before = rlimit.getrusage(rlimit.RUSAGE_SELF).ru_maxrss
+
+    start, n_bytes, n_requests = time.perf_counter(), 0, 0
+    if mode == "materialized":
+        with Session(engine) as session:
+            rows = crud.resource.get_multi_by_creator(session, user_id, limit=None)
+            models = [ResourceRead.from_orm(r) for r in rows]
+            n_bytes = len(JSONResponse(jsonable_encoder(models)).body)
+        n_requests = 1
+    elif mode == "ndjson":
+        headers["Accept"] = "application/x-ndjson"
+        _, n_bytes = asyncio.run(asgi_get(app, "/resource/", {}, headers))
+        n_requests = 1
+    else:
+        params = {"limit": PAGE_SIZE}
+        while True:
+            resp_headers, size = asyncio.run(
+                asgi_get(app, "/resource/", params, headers)
+            )
+            n_bytes, n_requests = n_bytes + size, n_requests + 1
+            if "x-next-cursor" not in resp_headers:
+                break
+            params["cursor"] = resp_headers["x-next-cursor"]
+
+    return dict(
+        mode=mode,
+        requests=n_requests,
+        total_s=round(time.perf_counter() - start, 3),
+        body_mb=round(n_bytes / 2**20, 2),
+        baseline_rss_mb=round(rss_before / 1024, 1),
+        peak_rss_mb=round(rlimit.getrusage(rlimit.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    )
+
+
+def seed(session: Session, n_rows: int) -> int:
+    user = crud.user.create(
+        session,
+        obj_in=UserCreate(
+            email=f"bench-{time.time_ns()}@example.com", password="bench12345"
+        ),
+    )
+    user_id = user.id
+    for i in range(0, n_rows, 10_000):
+        objs_in = [
+            ResourceCreateInternal(name=f"bench {j}", creator_id=user_id)
+            for j in range(i, min(n_rows, i + 10_000))
+        ]
+        crud.resource.create_multi(session, objs_in=objs_in, bulk=True)
+        session.expunge_all()
+    return user_id
+
+
+def run(n_rows: int, modes: list[str]) -> list[dict]:
+    results = []
+    with Session(engine) as session:
+        user_id = seed(session, n_rows)
+        try:
+            for mode in modes:
+                out = subprocess.run(
+                    [sys.executable, "-m", __spec__.name, "--child", mode, str(user_id)],
+                    check=True,
+                    capture_output=True,
+                    text=True,
+                ).stdout
+                result = dict(json.loads(out.splitlines()[-1]), rows=n_rows)
+                logger.info(result)
+                results.append(result)
+        finally:
+            session.execute(delete(Resource).where(Resource.creator_id == user_id))
+            session.delete(session.get(User, user_id))
+            session.commit()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument(
+        "--child", nargs=2, metavar=("MODE", "USER_ID"), help=argparse.SUPPRESS
+    )
+    args = parser.parse_args()
+    if args.child:
+        logging.disable(logging.INFO)
+        print(json.dumps(child(args.child[0], int(args.child[1]))))
+    else:
+        print(json.dumps(run(args.rows, args.modes), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Latency of full-text search over a large card table.
+
+    python -m app.benchmarks.bench_search --cards 10000000
+
+Seeds `--cards` cards, in decks of `--deck-size`, with questions and answers
+drawn from a Zipf distributed vocabulary of made-up words. The decks belong
+to two throwaway users: the searching user's own, public decks of the other
+user, and private decks of the other user that the search must skip. Cards
+are written with COPY, and the `search` vectors generated by Postgres as
+they go in.
+
+Then times a first page of results for queries matching few to very many
+cards, each the best of `--repeat` runs:
+
+* `cards`: crud.card.get_multi_by_search, as GET /card/search runs it
+* `resources`: crud.resource.get_multi_by_search over the deck names, as
+  GET /resource/?q= runs it with include_public
+* `ilike`: the same card query as a case-insensitive substring match, the
+  way it would have to run without the search vectors, for comparison;
+  `--no-ilike` skips it, as it scans the table
+
+The seeded rows are deleted afterwards, unless `--keep`.
+"""
+import argparse
+import io
+import itertools
+import json
+import logging
+import random
+import time
+
+from sqlalchemy import delete, or_, text
+from sqlmodel import Session, select
+
+from app import crud
+from app.crud.crud_resource import visible_to
+from app.database import engine
+from app.models import (
+    Card,
+    Resource,
+    ResourceCreateInternal,
+    User,
+    UserCreate,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("app.benchmarks.bench_search")
+
+SYLLABLES = (
+    "ka", "lo", "mi", "ne", "ru", "ta", "vo", "si", "pe", "gu",
+    "zen", "dar", "mol", "tis", "bra", "fen", "qua", "wix", "hol", "jun",
+)
+PAGE_SIZE = 50
+
+
+def vocabulary(size: int, rng: random.Random) -> list[str]:
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+    return sorted(words, key=lambda _: rng.random())
+
+
+class Text:
+    """Sentences of words drawn by a Zipf law, so a word's rank sets its hits"""
+
+    def __init__(self, words: list[str], rng: random.Random):
+        self.words = words
+        self.rng = rng
+        self.cum_weights = list(
+            itertools.accumulate(1 / rank for rank in range(1, len(words) + 1))
+        )
+
+    def sentence(self, n_words: int) -> str:
+        words = self.rng.choices(self.words, cum_weights=self.cum_weights, k=n_words)
+        return " ".join(words)
+
+
+def create_user(session: Session, tag: str) -> int:
+    user_in = UserCreate(
+        email=f"bench-{tag}-{time.time_ns()}@example.com", password="bench12345"
+    )
+    return crud.user.create(session, obj_in=user_in).id
+
+
+def seed(session: Session, args, rng: random.Random) -> tuple[int, list[int]]:
+    """The id of the searching user, and the ids of both seeded users"""
+    user_id, other_id = create_user(session, "me"), create_user(session, "other")
+    words = Text(vocabulary(args.vocabulary, rng), rng)
+    n_decks = -(-args.cards // args.deck_size)
+    # a third each: the user's own, public, and hidden decks
+    decks = [
+        ResourceCreateInternal(
+            name=words.sentence(3),
+            private=i % 3 != 1,
+            creator_id=user_id if i % 3 == 0 else other_id,
+        )
+        for i in range(n_decks)
+    ]
+    resource_ids = [
+        r.id for r in crud.resource.create_multi(session, objs_in=decks, bulk=True)
+    ]
+    session.expunge_all()
+
+    start, n_cards = time.perf_counter(), 0
+    while n_cards < args.cards:
+        buffer = io.StringIO()
+        for _ in range(min(args.batch_rows, args.cards - n_cards)):
+            resource_id = resource_ids[n_cards // args.deck_size]
+            question = words.sentence(rng.randint(4, 12))
+            answer = words.sentence(rng.randint(1, 4))
+            buffer.write(f"{question}\t{answer}\t{resource_id}\n")
+            n_cards += 1
+        buffer.seek(0)
+        with session.connection().connection.cursor() as cursor:
+            cursor.copy_expert(
+                "COPY card (question, answer, resource_id) FROM STDIN", buffer
+            )
+        session.commit()
+        elapsed = time.perf_counter() - start
+        logger.info(f"{n_cards}/{args.cards} cards in {elapsed:.0f}s")
+    session.execute(text("ANALYZE card"))
+    session.execute(text("ANALYZE resource"))
+    session.commit()
+    return user_id, [user_id, other_id]
+
+
+def queries(session: Session, user_id: int) -> dict[str, str]:
+    """Queries over words of falling frequency among the user's cards"""
+    counts = session.execute(
+        text(
+            "SELECT word, ndoc FROM ts_stat($$"
+            "  SELECT card.search FROM card JOIN resource"
+            "  ON resource.id = card.resource_id"
+            f" WHERE resource.creator_id = {int(user_id)} LIMIT 100000"
+            "$$) ORDER BY ndoc DESC"
+        )
+    ).all()
+    common, mid, rare = counts[0][0], counts[len(counts) // 20][0], counts[-1][0]
+    return {
+        "common": common,
+        "mid": mid,
+        "rare": rare,
+        "two words": f"{mid} {rare}",
+        "or": f"{rare} or {counts[-2][0]}",
+    }
+
+
+def drop(session: Session, user_ids: list[int]) -> None:
+    resources = select(Resource.id).where(Resource.creator_id.in_(user_ids))
+    for stmt in (
+        delete(Card).where(Card.resource_id.in_(resources)),
+        delete(Resource).where(Resource.creator_id.in_(user_ids)),
+        delete(User).where(User.id.in_(user_ids)),
+    ):
+        session.execute(stmt.execution_options(synchronize_session=False))
+    session.commit()
+
+
+def best_of(fn, repeat: int) -> tuple[float, int]:
+    best, n = float("inf"), 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        n = len(fn())
+        best = min(best, time.perf_counter() - start)
+    return best, n
+
+
+def run(args) -> list[dict]:
+    rng = random.Random(args.seed)
+    results = []
+    with Session(engine) as session:
+        user_id, user_ids = seed(session, args, rng)
+        try:
+            for label, q in queries(session, user_id).items():
+                timings = {
+                    "cards": lambda: crud.card.get_multi_by_search(
+                        session, user_id, q, limit=PAGE_SIZE
+                    ),
+                    "resources": lambda: crud.resource.get_multi_by_search(
+                        session, user_id, q, include_public=True, limit=PAGE_SIZE
+                    ),
+                }
+                if args.ilike:
+                    word = q.split()[0]
+                    stmt = (
+                        select(Card)
+                        .join(Resource)
+                        .where(visible_to(user_id))
+                        .where(
+                            or_(
+                                Card.question.ilike(f"%{word}%"),
+                                Card.answer.ilike(f"%{word}%"),
+                            )
+                        )
+                        .order_by(Card.id)
+                        .limit(PAGE_SIZE)
+                    )
+                    timings["ilike"] = lambda: session.exec(stmt).all()
+                result = dict(query=label, q=q)
+                for name, fn in timings.items():
+                    seconds, n = best_of(fn, args.repeat)
+                    result[f"{name}_ms"] = round(seconds * 1000, 2)
+                    result[f"{name}_rows"] = n
+                session.expunge_all()
+                logger.info(result)
+                results.append(result)
+        finally:
+            if not args.keep:
+                drop(session, user_ids)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--cards", type=int, default=10_000_000)
+    parser.add_argument("--deck-size", type=int, default=50)
+    parser.add_argument("--vocabulary", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--batch-rows", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--no-ilike", dest="ilike", action="store_false")
+    parser.add_argument("--keep", action="store_true", help="keep the seeded rows")
+    args = parser.parse_args()
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Response serialization of large decks, FastAPI's default path vs orjson.
+
+    python -m app.benchmarks.bench_serialization --cards 100 1000 10000
+
+Builds a Resource with `--cards` cards in memory, so no database is needed,
+and times turning it into a response body the two ways GET /card/ can:
+
+* `default`: FastAPI's serialize_response against ResourceReadWithCards,
+  which validates the ORM object and runs jsonable_encoder over the result,
+  then a JSONResponse
+* `orjson`: app.core.serialization.model_response, which validates once and
+  encodes the model with orjson
+
+Both bodies are decoded and compared before timing, and each timing is the
+best of `--repeat` rounds.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.core import serialization
+from app.models import Card, Resource, ResourceReadWithCards
+
+
+def deck(n_cards: int) -> Resource:
+    resource = Resource(id=1, name="bench deck", private=False, creator_id=1)
+    resource.cards = [
+        Card(
+            id=i,
+            resource_id=1,
+            question=f"What is {i} × {i + 1}? " + "·" * (i % 40),
+            answer=str(i * (i + 1)),
+        )
+        for i in range(n_cards)
+    ]
+    return resource
+
+
+loop = asyncio.new_event_loop()
+
+
+def default_body(field, resource: Resource) -> bytes:
+    content = loop.run_until_complete(
+        serialize_response(field=field, response_content=resource, is_coroutine=True)
+    )
+    return JSONResponse(content).body
+
+
+def orjson_body(field, resource: Resource) -> bytes:
+    return serialization.model_response(ResourceReadWithCards, resource).body
+
+
+def best_of(fn, field, resource: Resource, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(field, resource)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(sizes: list[int], repeat: int) -> list[dict]:
+    serialization.fast_json_enabled = lambda: True
+    field = create_response_field(name="response", type_=ResourceReadWithCards)
+    results = []
+    for n_cards in sizes:
+        resource = deck(n_cards)
+        default, fast = default_body(field, resource), orjson_body(field, resource)
+        assert json.loads(default) == json.loads(fast)
+        default_s = best_of(default_body, field, resource, repeat)
+        orjson_s = best_of(orjson_body, field, resource, repeat)
+        results.append(
+            dict(
+                cards=n_cards,
+                body_kb=round(len(fast) / 1024, 1),
+                default_ms=round(default_s * 1000, 2),
+                orjson_ms=round(orjson_s * 1000, 2),
+                speedup=round(default_s / orjson_s, 1),
+            )
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cards", nargs="+", type=int, default=[100, 1000, 10_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run(args.cards, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
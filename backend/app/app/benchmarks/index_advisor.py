@@ -0,0 +1,846 @@
+"""
+Indexes the workload is missing, and indexes it can do without.
+
+    python -m app.benchmarks.index_advisor --teachers 40 --resources 40 \\
+        --requests 20000 --migration "workload indexes"
+
+Seeds the bench_api dataset, sized by the same flags, replays its request
+mix through the app and captures every statement the app executes, with how
+often it ran and for how long, in the manner of pg_stat_statements. The
+extension's own view is read instead when it is installed in the database;
+with `--no-replay` that is all, to advise from the traffic it has recorded.
+
+Each captured SELECT, UPDATE and DELETE is then EXPLAINed over the seeded
+data, and every scan that filters a table of at least `--min-rows` rows
+without an index to match proposes one: the columns it compares for
+equality, then the column of a range, if any. Boolean conditions, as the
+`NOT private` of public resources, make the index partial. Foreign keys no
+index leads with are proposed too, as every delete on the referenced table
+and every join along the key scans for them. Proposals already served by an
+existing index, or by a longer proposal, are dropped.
+
+Indexes are reported as redundant when another index leads with their
+columns, or for a unique one, when a narrower unique index already implies
+it.
+
+Reports, as JSON, the statements that took longest, the proposals, each
+with the time spent by the statements that asked for it, and the redundant
+indexes. `--migration` also writes an Alembic revision creating the
+proposals CONCURRENTLY and dropping the redundant indexes, for review.
+The seeded rows are removed afterwards, unless `--keep`.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Iterator, Optional
+
+from alembic.script import ScriptDirectory
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from app.benchmarks import bench_api
+from app.database import engine
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("app.benchmarks.index_advisor")
+
+EXPLAINED = ("SELECT", "UPDATE", "DELETE", "WITH")
+# Postgres limits identifiers to 63 bytes
+MAX_NAME = 63
+
+
+@dataclass
+class Statement:
+    query: str
+    calls: int = 0
+    total_ms: float = 0.0
+    # the parameters of one execution, None for the normalized text of
+    # pg_stat_statements, which is explained as a generic plan
+    params: Any = None
+
+
+@dataclass
+class TableIndex:
+    table: str
+    name: str
+    columns: list[str]
+    unique: bool
+    primary: bool
+    where: Optional[str]
+    method: str
+    # the unique or primary key constraint the index backs
+    constraint: Optional[str] = None
+
+
+@dataclass
+class Proposal:
+    table: str
+    columns: list[str]
+    # how many of the leading columns are compared for equality, in any order
+    n_eq: int
+    where: Optional[str] = None
+    reasons: set[str] = field(default_factory=set)
+    statements: int = 0
+    calls: int = 0
+    total_ms: float = 0.0
+
+    @property
+    def key(self) -> tuple:
+        return self.table, tuple(self.columns), self.where
+
+    @property
+    def name(self) -> str:
+        name = f"ix_{self.table}_{'_'.join(self.columns)}"
+        if self.where:
+            name += "_" + re.sub(r"\W+", "_", self.where.lower()).strip("_")
+        return name[:MAX_NAME]
+
+    def merge(self, other: "Proposal") -> None:
+        self.reasons |= other.reasons
+        self.statements += other.statements
+        self.calls += other.calls
+        self.total_ms += other.total_ms
+
+
+"""
+Capture
+"""
+
+
+@contextmanager
+def capture() -> Iterator[dict[str, Statement]]:
+    """Tally the statements executed on every Engine, async ones included"""
+    statements: dict[str, Statement] = {}
+    started = "index_advisor_started"
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault(started, []).append(time.perf_counter())
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        if not conn.info.get(started):
+            return
+        elapsed = time.perf_counter() - conn.info[started].pop()
+        tally = statements.get(statement)
+        if tally is None:
+            params = parameters[0] if executemany and parameters else parameters
+            tally = statements[statement] = Statement(statement, params=params)
+        tally.calls += 1
+        tally.total_ms += elapsed * 1000
+
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get(started):
+            conn.info[started].pop()
+
+    event.listen(Engine, "before_cursor_execute", before)
+    event.listen(Engine, "after_cursor_execute", after)
+    event.listen(Engine, "handle_error", handle_error)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, "before_cursor_execute", before)
+        event.remove(Engine, "after_cursor_execute", after)
+        event.remove(Engine, "handle_error", handle_error)
+
+
+def has_pg_stat_statements(session: Session) -> bool:
+    return session.execute(
+        text("SELECT 1 FROM pg_extension WHERE extname = 'pg_stat_statements'")
+    ).first() is not None
+
+
+def read_pg_stat_statements(session: Session) -> dict[str, Statement]:
+    rows = session.execute(
+        text(
+            "SELECT query, calls, total_exec_time FROM pg_stat_statements "
+            "WHERE dbid = (SELECT oid FROM pg_database "
+            "WHERE datname = current_database())"
+        )
+    )
+    return {
+        query: Statement(query, calls, total_ms)
+        for query, calls, total_ms in rows
+    }
+
+
+"""
+Catalog
+"""
+
+
+def read_indexes(session: Session) -> list[TableIndex]:
+    rows = session.execute(
+        text(
+            "SELECT t.relname, i.relname, ix.indisunique, ix.indisprimary, "
+            "ARRAY(SELECT a.attname FROM unnest(ix.indkey::int2[]) "
+            "  WITH ORDINALITY AS k(attnum, n) "
+            "  JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum "
+            "  ORDER BY k.n), "
+            "pg_get_expr(ix.indpred, ix.indrelid), am.amname, con.conname "
+            "FROM pg_index ix "
+            "JOIN pg_class t ON t.oid = ix.indrelid "
+            "JOIN pg_class i ON i.oid = ix.indexrelid "
+            "JOIN pg_am am ON am.oid = i.relam "
+            "LEFT JOIN pg_constraint con ON con.conindid = ix.indexrelid "
+            "  AND con.contype IN ('p', 'u') "
+            "WHERE t.relnamespace = 'public'::regnamespace "
+            "ORDER BY t.relname, i.relname"
+        )
+    )
+    return [
+        TableIndex(
+            table, name, list(columns), unique, primary,
+            strip_parens(where) if where else None, method, constraint,
+        )
+        for table, name, unique, primary, columns, where, method, constraint in rows
+    ]
+
+
+def read_foreign_keys(session: Session) -> list[tuple[str, str, list[str], str]]:
+    """(table, constraint, columns, referenced table) of every foreign key"""
+    rows = session.execute(
+        text(
+            "SELECT c.conrelid::regclass::text, c.conname, "
+            "ARRAY(SELECT a.attname FROM unnest(c.conkey) "
+            "  WITH ORDINALITY AS k(attnum, n) "
+            "  JOIN pg_attribute a ON a.attrelid = c.conrelid "
+            "  AND a.attnum = k.attnum ORDER BY k.n), "
+            "c.confrelid::regclass::text "
+            "FROM pg_constraint c "
+            "WHERE c.contype = 'f' AND c.connamespace = 'public'::regnamespace "
+            "ORDER BY 1, 2"
+        )
+    )
+    return [(table, name, list(columns), ref) for table, name, columns, ref in rows]
+
+
+def read_referenced_keys(session: Session) -> set[tuple[str, tuple[str, ...]]]:
+    """The (table, columns) foreign keys point at, which must stay unique"""
+    rows = session.execute(
+        text(
+            "SELECT c.confrelid::regclass::text, "
+            "ARRAY(SELECT a.attname FROM unnest(c.confkey) "
+            "  WITH ORDINALITY AS k(attnum, n) "
+            "  JOIN pg_attribute a ON a.attrelid = c.confrelid "
+            "  AND a.attnum = k.attnum ORDER BY k.n) "
+            "FROM pg_constraint c "
+            "WHERE c.contype = 'f' AND c.connamespace = 'public'::regnamespace"
+        )
+    )
+    return {(table, tuple(columns)) for table, columns in rows}
+
+
+def read_columns(session: Session) -> dict[str, dict[str, str]]:
+    """The data type of each column, by table"""
+    rows = session.execute(
+        text(
+            "SELECT table_name, column_name, data_type "
+            "FROM information_schema.columns WHERE table_schema = 'public'"
+        )
+    )
+    columns: dict[str, dict[str, str]] = {}
+    for table, column, data_type in rows:
+        columns.setdefault(table, {})[column] = data_type
+    return columns
+
+
+def read_table_rows(session: Session) -> dict[str, float]:
+    rows = session.execute(
+        text(
+            "SELECT relname, reltuples FROM pg_class "
+            "WHERE relkind = 'r' AND relnamespace = 'public'::regnamespace"
+        )
+    )
+    return dict(rows.all())
+
+
+"""
+Plans
+
+Scan filters, as EXPLAIN prints them, are split into their alternatives,
+each a conjunction of conditions, and every alternative asks for an index
+of its own, as a BitmapOr can combine them.
+"""
+
+
+def _scan(expr: str, depth_zero) -> None:
+    """Call depth_zero(i) at every index of `expr` outside parens and quotes"""
+    depth, quoted = 0, False
+    for i, char in enumerate(expr):
+        if char == "'":
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                depth_zero(i)
+        elif depth == 0:
+            depth_zero(i)
+
+
+def strip_parens(expr: str) -> str:
+    """`expr` without the parens wrapping all of it"""
+    expr = expr.strip()
+    while expr.startswith("("):
+        closes = []
+        _scan(expr, closes.append)
+        if not closes or closes[0] != len(expr) - 1:
+            break
+        expr = expr[1:-1].strip()
+    return expr
+
+
+def split_top(expr: str, op: str) -> list[str]:
+    """Split `expr` on the boolean operator `op` outside of parens"""
+    token = f" {op} "
+    cuts = []
+    _scan(expr, lambda i: cuts.append(i) if expr.startswith(token, i) else None)
+    parts, start = [], 0
+    for cut in cuts:
+        parts.append(expr[start:cut])
+        start = cut + len(token)
+    parts.append(expr[start:])
+    return [part.strip() for part in parts]
+
+
+def alternatives(expr: str) -> list[list[str]]:
+    """`expr` in disjunctive normal form, as lists of conditions"""
+    expr = strip_parens(expr)
+    ors = split_top(expr, "OR")
+    if len(ors) > 1:
+        return [conj for part in ors for conj in alternatives(part)]
+    ands = split_top(expr, "AND")
+    if len(ands) > 1:
+        result = [[]]
+        for part in ands:
+            result = [a + b for a in result for b in alternatives(part)]
+        return result
+    return [[expr]]
+
+
+_COMPARISON = re.compile(r"^(\w+) (=|<>|<=|>=|<|>) (.+)$", re.S)
+RANGE_OPERATORS = {"<", ">", "<=", ">="}
+
+
+def propose_for_filter(
+        table: str,
+        alias: str,
+        expr: str,
+        columns: dict[str, str],
+        order_by: list[str],
+) -> list[Proposal]:
+    """
+    The index each alternative of the scan filter `expr` asks for. An
+    alternative testing only booleans gets a partial index over
+    `order_by`, the columns the scan is read in.
+    """
+    proposals = []
+    for conditions in alternatives(expr):
+        eq, ranges, where = [], [], []
+        for condition in conditions:
+            condition = strip_parens(condition)
+            condition = re.sub(rf"\b{re.escape(alias)}\.(?=\w)", "", condition)
+            # varchar columns are compared as text, e.g. (name)::text = 'x'
+            condition = re.sub(r"\((\w+)\)::[\w ]+?(?= |$)", r"\1", condition)
+            match = _COMPARISON.match(condition)
+            negated = condition[4:] if condition.startswith("NOT ") else None
+            if match and match[1] in columns and match[3] not in columns:
+                if match[2] == "=" and match[1] not in eq:
+                    eq.append(match[1])
+                elif match[2] in RANGE_OPERATORS:
+                    ranges.append(match[1])
+            elif columns.get(negated or condition) == "boolean":
+                where.append(condition)
+        keys = eq + [c for c in ranges[:1] if c not in eq]
+        if not keys and where:
+            keys = list(order_by)
+        if keys:
+            proposals.append(
+                Proposal(
+                    table,
+                    keys,
+                    n_eq=len(eq),
+                    where=" AND ".join(sorted(where)) or None,
+                )
+            )
+    return proposals
+
+
+def scans(plan: dict, sort_key: tuple = ()) -> Iterator[tuple[dict, tuple]]:
+    """Every node of `plan`, with the Sort Key of the nearest Sort above it"""
+    yield plan, sort_key
+    sort_key = tuple(plan.get("Sort Key", sort_key))
+    for child in plan.get("Plans", ()):
+        yield from scans(child, sort_key)
+
+
+def sorted_columns(alias: str, sort_key: tuple, columns: dict[str, str]) -> list[str]:
+    """The leading columns of `sort_key` that belong to the scanned relation"""
+    leading = []
+    for key in sort_key:
+        column = re.sub(rf"^{re.escape(alias)}\.", "", key)
+        if column not in columns:
+            break
+        leading.append(column)
+    return leading
+
+
+def propose_for_plan(
+        plan: dict,
+        columns: dict[str, dict[str, str]],
+        indexes: dict[str, TableIndex],
+        table_rows: dict[str, float],
+        min_rows: float,
+) -> list[Proposal]:
+    """
+    What the filtering scans of `plan` ask for: sequential scans, and index
+    scans reading a whole index only for its order. The index of a scan
+    whose rows are then sorted leads with the columns compared for equality,
+    and goes on in the sort order, so it serves both.
+    """
+    proposals = []
+    for node, sort_key in scans(plan):
+        table, expr = node.get("Relation Name"), node.get("Filter")
+        if table not in columns or not expr or table_rows.get(table, 0) < min_rows:
+            continue
+        alias = node.get("Alias", table)
+        if node["Node Type"] == "Seq Scan":
+            order_by = sorted_columns(alias, sort_key, columns[table])
+            primary = [i for i in indexes.values() if i.table == table and i.primary]
+            # what an index over booleans alone is best kept in
+            fallback = order_by or (primary[0].columns if primary else [])
+        elif node["Node Type"] in ("Index Scan", "Index Only Scan"):
+            if "Index Cond" in node or node.get("Index Name") not in indexes:
+                continue
+            order_by = fallback = indexes[node["Index Name"]].columns
+        else:
+            continue
+        for proposal in propose_for_filter(
+                table, alias, expr, columns[table], fallback
+        ):
+            if proposal.n_eq == len(proposal.columns):
+                proposal.columns += [
+                    c for c in order_by if c not in proposal.columns
+                ]
+            proposals.append(proposal)
+    return proposals
+
+
+def explain(session: Session, statement: Statement) -> Optional[dict]:
+    """The plan of `statement`, or None if it can not be explained on its own"""
+    raw = session.connection().connection
+    if statement.params is None:
+        sql, params = f"EXPLAIN (GENERIC_PLAN, FORMAT JSON) {statement.query}", None
+    else:
+        sql, params = f"EXPLAIN (FORMAT JSON) {statement.query}", statement.params
+    cursor = raw.cursor()
+    try:
+        cursor.execute(sql, params)
+        return cursor.fetchone()[0][0]["Plan"]
+    except Exception as e:
+        raw.rollback()
+        logger.debug("Could not explain %s: %s", statement.query, e)
+        return None
+    finally:
+        cursor.close()
+
+
+"""
+Advice
+"""
+
+
+def covers(columns: list[str], proposal: Proposal) -> bool:
+    """If an index on `columns` serves what `proposal` asks for"""
+    n = len(proposal.columns)
+    eq = proposal.n_eq
+    return (
+        set(columns[:eq]) == set(proposal.columns[:eq])
+        and columns[eq:n] == proposal.columns[eq:]
+    )
+
+
+def is_served(proposal: Proposal, indexes: list[TableIndex]) -> bool:
+    return any(
+        index.table == proposal.table
+        and index.method == "btree"
+        and index.where in (None, proposal.where)
+        and covers(index.columns, proposal)
+        for index in indexes
+    )
+
+
+def consolidate(proposals: list[Proposal]) -> list[Proposal]:
+    """
+    One proposal per index, with the tallies of every statement that asked
+    for it, and none that a longer proposal serves
+    """
+    merged: dict[tuple, Proposal] = {}
+    for proposal in proposals:
+        if proposal.key in merged:
+            merged[proposal.key].merge(proposal)
+        else:
+            merged[proposal.key] = proposal
+    kept: list[Proposal] = []
+    for proposal in sorted(merged.values(), key=lambda p: -len(p.columns)):
+        wider = next(
+            (
+                other
+                for other in kept
+                if other.table == proposal.table
+                and other.where == proposal.where
+                and covers(other.columns, proposal)
+            ),
+            None,
+        )
+        if wider is None:
+            kept.append(proposal)
+        else:
+            wider.merge(proposal)
+    return sorted(kept, key=lambda p: (-p.total_ms, p.table, p.columns))
+
+
+def foreign_key_proposals(
+        foreign_keys: list[tuple[str, str, list[str], str]]
+) -> list[Proposal]:
+    return [
+        Proposal(table, columns, n_eq=len(columns), reasons={f"foreign key {name}"})
+        for table, name, columns, _ in foreign_keys
+    ]
+
+
+def redundant_indexes(
+        indexes: list[TableIndex], referenced: set[tuple[str, tuple[str, ...]]]
+) -> list[tuple[TableIndex, TableIndex]]:
+    """
+    (index, what makes it redundant) for every btree index that either
+    another one leads with its columns, or is unique on columns a narrower
+    unique index already keeps unique, and no foreign key points at
+    """
+    redundant = []
+    btree = [i for i in indexes if i.method == "btree"]
+    for index in btree:
+        if index.primary:
+            continue
+        for other in btree:
+            if other is index or other.table != index.table:
+                continue
+            if other.where != index.where:
+                continue
+            n = len(index.columns)
+            if (
+                    not index.unique
+                    and other.columns[:n] == index.columns
+                    and (len(other.columns) > n or other.name < index.name)
+            ) or (
+                    index.unique
+                    and other.unique
+                    and other.where is None
+                    and set(other.columns) < set(index.columns)
+                    and (index.table, tuple(index.columns)) not in referenced
+            ):
+                redundant.append((index, other))
+                break
+    return redundant
+
+
+def advise(
+        session: Session, workload: dict[str, Statement], min_rows: float
+) -> dict[str, Any]:
+    session.execute(text("ANALYZE"))
+    session.commit()
+    indexes = read_indexes(session)
+    by_name = {index.name: index for index in indexes}
+    columns = read_columns(session)
+    table_rows = read_table_rows(session)
+    foreign_keys = read_foreign_keys(session)
+
+    proposals, explained = [], 0
+    for statement in workload.values():
+        if not statement.query.lstrip().upper().startswith(EXPLAINED):
+            continue
+        plan = explain(session, statement)
+        if plan is None:
+            continue
+        explained += 1
+        for proposal in propose_for_plan(
+                plan, columns, by_name, table_rows, min_rows
+        ):
+            proposal.reasons.add("workload")
+            proposal.statements = 1
+            proposal.calls = statement.calls
+            proposal.total_ms = statement.total_ms
+            proposals.append(proposal)
+    session.rollback()
+
+    proposals = consolidate(proposals + foreign_key_proposals(foreign_keys))
+    proposals = [p for p in proposals if not is_served(p, indexes)]
+    redundant = redundant_indexes(indexes, read_referenced_keys(session))
+    top = sorted(workload.values(), key=lambda s: -s.total_ms)[:10]
+    return dict(
+        workload=dict(
+            statements=len(workload),
+            calls=sum(s.calls for s in workload.values()),
+            total_ms=round(sum(s.total_ms for s in workload.values()), 2),
+            explained=explained,
+        ),
+        top=[
+            dict(
+                query=" ".join(s.query.split())[:300],
+                calls=s.calls,
+                total_ms=round(s.total_ms, 2),
+                mean_ms=round(s.total_ms / s.calls, 3) if s.calls else None,
+            )
+            for s in top
+        ],
+        proposals=[
+            dict(
+                name=p.name,
+                table=p.table,
+                columns=p.columns,
+                where=p.where,
+                reasons=sorted(p.reasons),
+                statements=p.statements,
+                calls=p.calls,
+                total_ms=round(p.total_ms, 2),
+            )
+            for p in proposals
+        ],
+        redundant=[
+            dict(
+                name=index.name,
+                table=index.table,
+                columns=index.columns,
+                unique=index.unique,
+                constraint=index.constraint,
+                covered_by=other.name,
+            )
+            for index, other in redundant
+        ],
+    )
+
+
+"""
+Migration
+"""
+
+
+def _literal(value: Any) -> str:
+    return json.dumps(value)
+
+
+def _create_index(index: dict, unique: bool = False) -> str:
+    lines = [
+        "        op.create_index(",
+        f"            {_literal(index['name'])},",
+        f"            {_literal(index['table'])},",
+        f"            {_literal(index['columns'])},",
+    ]
+    if unique:
+        lines.append("            unique=True,")
+    if index.get("where"):
+        where = _literal(index["where"])
+        lines.append(f"            postgresql_where=sa.text({where}),")
+    lines += [
+        "            postgresql_concurrently=True,",
+        "            if_not_exists=True,",
+        "        )",
+    ]
+    return "\n".join(lines)
+
+
+def _drop_index(index: dict) -> str:
+    return (
+        f"        op.drop_index(\n"
+        f"            {_literal(index['name'])},\n"
+        f"            table_name={_literal(index['table'])},\n"
+        f"            postgresql_concurrently=True,\n"
+        f"            if_exists=True,\n"
+        f"        )"
+    )
+
+
+def _call(function: str, *args: str) -> str:
+    """An op call on one line, or with its arguments on the next if too long"""
+    line = f"        op.{function}({', '.join(args)})"
+    if len(line) <= 88:
+        return line
+    return f"        op.{function}(\n            {', '.join(args)}\n        )"
+
+
+def _drop_constraint(index: dict) -> str:
+    return _call(
+        "drop_constraint",
+        _literal(index["constraint"]),
+        _literal(index["table"]),
+        'type_="unique"',
+    )
+
+
+def _create_constraint(index: dict) -> str:
+    return _call(
+        "create_unique_constraint",
+        _literal(index["constraint"]),
+        _literal(index["table"]),
+        _literal(index["columns"]),
+    )
+
+
+def render_migration(
+        advice: dict[str, Any], message: str, revision: str, down_revision: str
+) -> str:
+    """
+    An Alembic revision creating the proposed indexes and dropping the
+    redundant ones. CREATE and DROP INDEX CONCURRENTLY can not run in a
+    transaction, so the revision runs in an autocommit block; an index
+    backing a constraint is dropped with its constraint instead, which
+    takes a brief exclusive lock on the table.
+    """
+    proposals, redundant = advice["proposals"], advice["redundant"]
+    upgrade = [_create_index(p) for p in proposals] + [
+        _drop_constraint(r) if r["constraint"] else _drop_index(r) for r in redundant
+    ]
+    downgrade = [
+        _create_constraint(r) if r["constraint"] else _create_index(r, r["unique"])
+        for r in reversed(redundant)
+    ] + [_drop_index(p) for p in reversed(proposals)]
+    notes = [
+        f"{p['name']}: {', '.join(p['reasons'])}"
+        + (f", {p['calls']} calls, {p['total_ms']} ms" if p["calls"] else "")
+        for p in proposals
+    ] + [f"{r['name']}: redundant with {r['covered_by']}" for r in redundant]
+    imports = "import sqlalchemy as sa\n" if any(p["where"] for p in proposals) else ""
+    no_op = "        pass"
+    return f'''"""{message}
+
+Revision ID: {revision}
+Revises: {down_revision}
+Create Date: {datetime.now()}
+
+Proposed by app.benchmarks.index_advisor:
+{chr(10).join(notes)}
+"""
+{imports}from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "{revision}"
+down_revision = "{down_revision}"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY can not run inside a transaction
+    with op.get_context().autocommit_block():
+{chr(10).join(upgrade) or no_op}
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+{chr(10).join(downgrade) or no_op}
+'''
+
+
+def write_migration(advice: dict[str, Any], message: str) -> str:
+    scripts = os.path.join(os.path.dirname(os.path.dirname(__file__)), "migrations")
+    head = ScriptDirectory(scripts).get_current_head()
+    versions = os.path.join(scripts, "versions")
+    revision = uuid.uuid4().hex[-12:]
+    slug = re.sub(r"\W+", "_", message.lower()).strip("_")
+    path = os.path.join(versions, f"{revision}_{slug}.py")
+    with open(path, "w") as f:
+        f.write(render_migration(advice, message, revision, head))
+    return path
+
+
+"""
+Running
+"""
+
+
+def replay(
+        session: Session, args, use_extension: bool = False
+) -> tuple[str, dict[str, Statement]]:
+    """
+    Seed the bench_api dataset and drive its request mix, capturing the
+    statements, or reading them from pg_stat_statements if `use_extension`
+    """
+    from app.main import app
+
+    logging.getLogger("app.core.query_stats").setLevel(logging.ERROR)
+    rng = random.Random(args.seed)
+    ds = bench_api.seed(session, args, rng)
+    calls = bench_api.plan(ds, args.requests, rng, None)
+    if use_extension:
+        session.execute(text("SELECT pg_stat_statements_reset()"))
+        session.commit()
+    with capture() as captured:
+        asyncio.run(bench_api.warm_and_drive(app, [], calls, args.concurrency))
+    if use_extension:
+        return ds.tag, read_pg_stat_statements(session)
+    return ds.tag, captured
+
+
+def run(args) -> dict[str, Any]:
+    with Session(engine) as session:
+        tag = None
+        try:
+            if args.replay:
+                tag, workload = replay(
+                    session, args, has_pg_stat_statements(session)
+                )
+            elif has_pg_stat_statements(session):
+                workload = read_pg_stat_statements(session)
+            else:
+                raise SystemExit("--no-replay needs pg_stat_statements installed")
+            advice = advise(session, workload, args.min_rows)
+        finally:
+            if tag is not None and not args.keep:
+                bench_api.drop(session, tag)
+    if args.migration:
+        advice["migration"] = write_migration(advice, args.migration)
+    return advice
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    bench_api.add_dataset_arguments(parser)
+    load = parser.add_argument_group("load")
+    load.add_argument("--requests", type=int, default=5000)
+    load.add_argument("--concurrency", type=int, default=8)
+    load.add_argument(
+        "--no-replay", dest="replay", action="store_false",
+        help="advise from what pg_stat_statements has recorded",
+    )
+    parser.add_argument(
+        "--min-rows", type=float, default=1000,
+        help="leave tables smaller than this to sequential scans",
+    )
+    parser.add_argument(
+        "--migration", metavar="MESSAGE",
+        help="write an Alembic revision with this message",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--keep", action="store_true", help="keep the dataset")
+    args = parser.parse_args()
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
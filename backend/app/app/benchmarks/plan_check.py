@@ -0,0 +1,197 @@
+"""
+EXPLAIN plans of every statement the app runs, checked against a baseline.
+
+    python -m app.benchmarks.plan_check
+    python -m app.benchmarks.plan_check --update --teachers 40 --resources 40
+
+Seeds the bench_api dataset and replays its request mix, as index_advisor
+does, capturing each statement the endpoints issue through app.crud, and
+EXPLAINs it over the seeded data. Statements are keyed by their SQL, with a
+list of parameters, as in IN (...), folded into one, so that a list of
+another length is the same statement. Requests are made one at a time by
+default, so that a replay captures the same parameters as the last.
+
+A plan is kept as its estimated total cost and the scans it makes, each
+with its relation and index. `--update` writes them, with the dataset flags
+and seed, to the baseline file. A check replays the dataset of the baseline
+and fails, exiting 1, when a statement
+
+* sequentially scans a table of at least `--min-rows` rows that its
+  baseline plan did not, statements new since the baseline included, or
+* is estimated at over `--max-cost-ratio` times its baseline cost.
+
+Statements new or gone since the baseline, and scans that changed, are
+reported without failing. Update the baseline along with a change to the
+models, queries or migrations, once its new plans have been reviewed. Plans
+depend on what else the tables hold, so both run on a database migrated to
+head and holding nothing else.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+from typing import Any
+
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app.benchmarks import bench_api
+from app.benchmarks.index_advisor import (
+    EXPLAINED,
+    Statement,
+    explain,
+    read_table_rows,
+    replay,
+    scans,
+)
+from app.database import engine
+
+BASELINE = os.path.join(os.path.dirname(__file__), "plan_baseline.json")
+DATASET = (
+    "teachers", "students", "resources", "cards", "standards", "goals", "laps",
+    "attempts",
+)
+# estimates this cheap are single row lookups, whatever their ratio
+COST_FLOOR = 100.0
+
+_PARAMETER_LIST = re.compile(r"(%(?:\(\w+\))?s)(?:, %(?:\(\w+\))?s)+")
+
+
+def statement_key(query: str) -> str:
+    return _PARAMETER_LIST.sub(r"\1", " ".join(query.split()))
+
+
+def summarize(plan: dict) -> dict[str, Any]:
+    """
+    The estimated cost of `plan`, and its scans: of tables, e.g. Seq Scan on
+    card, and of indexes, e.g. Index Scan using card_pkey, whether the index
+    is read on its own, for the table or for a bitmap, which are choices
+    the planner may make differently on every ANALYZE
+    """
+    scanned = set()
+    for node, _ in scans(plan):
+        if "Index Name" in node:
+            scanned.add(f"Index Scan using {node['Index Name']}")
+        elif "Relation Name" in node and node["Node Type"] != "Bitmap Heap Scan":
+            scanned.add(f"{node['Node Type']} on {node['Relation Name']}")
+    return dict(cost=plan["Total Cost"], scans=sorted(scanned))
+
+
+def seq_scanned(summary: dict[str, Any]) -> set[str]:
+    return {
+        scan.removeprefix("Seq Scan on ")
+        for scan in summary["scans"]
+        if scan.startswith("Seq Scan on ")
+    }
+
+
+def compare(
+        baseline: dict[str, dict],
+        current: dict[str, dict],
+        table_rows: dict[str, float],
+        min_rows: float,
+        max_cost_ratio: float,
+) -> dict[str, Any]:
+    regressions, changed = [], []
+    for key, summary in sorted(current.items()):
+        before = baseline.get(key)
+        scanned_before = seq_scanned(before) if before else set()
+        for table in sorted(seq_scanned(summary) - scanned_before):
+            if table_rows.get(table, 0) >= min_rows:
+                reason = "Seq Scan" if before else "new statement with Seq Scan"
+                regressions.append(dict(statement=key, reason=f"{reason} on {table}"))
+        if before is None:
+            continue
+        if summary["cost"] > max(before["cost"], COST_FLOOR) * max_cost_ratio:
+            regressions.append(
+                dict(
+                    statement=key,
+                    reason=f"cost {before['cost']} -> {summary['cost']}",
+                )
+            )
+        if summary["scans"] != before["scans"]:
+            changed.append(
+                dict(statement=key, before=before["scans"], after=summary["scans"])
+            )
+    return dict(
+        checked=len(current),
+        regressions=regressions,
+        changed=changed,
+        new=sorted(current.keys() - baseline.keys()),
+        missing=sorted(baseline.keys() - current.keys()),
+    )
+
+
+def capture_plans(session: Session, args) -> tuple[dict[str, dict], dict[str, float]]:
+    """The summarized plan of every statement of a replay, by statement key"""
+    tag = None
+    try:
+        tag, workload = replay(session, args)
+        session.execute(text("ANALYZE"))
+        session.commit()
+        table_rows = read_table_rows(session)
+        statements: dict[str, Statement] = {}
+        # of the lists of any length folded together, the shortest one
+        for statement in sorted(workload.values(), key=lambda s: len(s.query)):
+            if statement.query.lstrip().upper().startswith(EXPLAINED):
+                statements.setdefault(statement_key(statement.query), statement)
+        plans = {}
+        for key, statement in statements.items():
+            plan = explain(session, statement)
+            if plan is not None:
+                plans[key] = summarize(plan)
+        session.rollback()
+    finally:
+        if tag is not None and not args.keep:
+            bench_api.drop(session, tag)
+    return plans, table_rows
+
+
+def run(args) -> dict[str, Any]:
+    if not args.update:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        # replay what the baseline was captured over
+        for name in DATASET + ("requests", "seed"):
+            setattr(args, name, baseline[name])
+    with Session(engine) as session:
+        plans, table_rows = capture_plans(session, args)
+    if args.update:
+        baseline = {name: getattr(args, name) for name in DATASET}
+        baseline.update(requests=args.requests, seed=args.seed, plans=plans)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        return dict(baseline=args.baseline, statements=len(plans))
+    return compare(
+        baseline["plans"], plans, table_rows, args.min_rows, args.max_cost_ratio
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    bench_api.add_dataset_arguments(parser)
+    load = parser.add_argument_group("load")
+    load.add_argument("--requests", type=int, default=2000)
+    load.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument(
+        "--update", action="store_true",
+        help="write the baseline from this replay, sized by the dataset flags",
+    )
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--min-rows", type=float, default=1000)
+    parser.add_argument("--max-cost-ratio", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--keep", action="store_true", help="keep the dataset")
+    args = parser.parse_args()
+    report = run(args)
+    print(json.dumps(report, indent=2))
+    if report.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
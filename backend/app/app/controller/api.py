@@ -1,6 +1,8 @@
 from fastapi import APIRouter
 
-from .endpoints import auth, user, resource, standard, topic, card, goal, lap, attempt
+from .endpoints import (
+    auth, user, resource, standard, topic, card, goal, lap, attempt, internal
+)
 
 api_router = APIRouter()
 
@@ -21,3 +23,5 @@ api_router.include_router(goal.router, prefix="/goal", tags=["goal"])
 api_router.include_router(lap.router, prefix="/lap", tags=["lap"])
 
 api_router.include_router(attempt.router, prefix="/attempt", tags=["attempt"])
+
+api_router.include_router(internal.router, prefix="/internal", tags=["internal"])
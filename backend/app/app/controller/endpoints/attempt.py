@@ -1,15 +1,17 @@
 from typing import Any
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app import crud
-from app.deps import get_session, get_current_student
+from app.deps import get_async_session, get_current_student_async
 from app.models import (
     AttemptCreateExternal,
     User,
     AttemptReadWithLap,
     AttemptCreateInternal,
+    AttemptBatchCreate,
+    AttemptRead,
 )
 
 router = APIRouter()
@@ -29,22 +31,65 @@ def is_correct(submission: str, answer: str) -> bool:
 
 
 @router.post("/", status_code=201, response_model=AttemptReadWithLap)
-def create_attempt(
+async def create_attempt(
     *,
     attempt_in: AttemptCreateExternal,
-    current_student: User = Depends(get_current_student),
-    session: Session = Depends(get_session),
+    current_student: User = Depends(get_current_student_async),
+    session: AsyncSession = Depends(get_async_session),
 ) -> Any:
     lap_id, card_id = attempt_in.lap_id, attempt_in.card_id
-    lap = crud.lap.get(session, lap_id)
-    card = crud.card.get(session, card_id)
+    lap = await crud.lap.aget(session, lap_id)
+    card = await crud.card.aget(session, card_id)
     if not lap:
         raise HTTPException(404, f"Lap with ID {lap_id} not found.")
     if not card:
         raise HTTPException(404, f"Card with ID {card_id} not found.")
-    if current_student != lap.goal.student:
+    goal = await crud.goal.aget(session, lap.goal_id)
+    if current_student.id != goal.student_id:
         raise HTTPException(401, f"Not a member of Goal {lap.goal_id}")
 
     attempt_in = AttemptCreateInternal.from_orm(attempt_in)
     attempt_in.correct = is_correct(attempt_in.submission, card.answer)
-    return crud.attempt.create(session, obj_in=attempt_in)
+    return await crud.attempt.acreate(
+        session, obj_in=attempt_in, load=AttemptReadWithLap
+    )
+
+
+@router.post("/batch", status_code=201, response_model=list[AttemptRead])
+async def create_attempts_batch(
+    *,
+    batch_in: AttemptBatchCreate,
+    current_student: User = Depends(get_current_student_async),
+    session: AsyncSession = Depends(get_async_session),
+) -> Any:
+    """
+    Submit many attempts on one lap at once, e.g. answers a client buffered
+    while offline. The lap is authorized once, the cards are read in one
+    query and the attempts are written with one multi-row insert, in order.
+    """
+    lap_id = batch_in.lap_id
+    lap = await crud.lap.aget(session, lap_id)
+    if not lap:
+        raise HTTPException(404, f"Lap with ID {lap_id} not found.")
+    goal = await crud.goal.aget(session, lap.goal_id)
+    if current_student.id != goal.student_id:
+        raise HTTPException(401, f"Not a member of Goal {lap.goal_id}")
+    card_ids = {a.card_id for a in batch_in.attempts}
+    cards = {c.id: c for c in await crud.card.aget_mult_by_ids(session, card_ids)}
+    if len(cards) < len(card_ids):
+        raise HTTPException(404, f"Cards with IDs {card_ids - cards.keys()} not found.")
+
+    attempts_in = [
+        AttemptCreateInternal(
+            lap_id=lap_id,
+            card_id=a.card_id,
+            submission=a.submission,
+            correct=is_correct(a.submission, cards[a.card_id].answer),
+        )
+        for a in batch_in.attempts
+    ]
+    attempts = await crud.attempt.acreate_multi(session, objs_in=attempts_in)
+    return [
+        AttemptRead(submission=a.submission, correct=a.correct, card=cards[a.card_id])
+        for a in attempts
+    ]
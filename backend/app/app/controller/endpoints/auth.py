@@ -6,7 +6,7 @@ from pydantic import SecretStr
 from sqlalchemy.orm.session import Session
 
 from app import crud
-from app.core.auth import authenticate, create_access_token
+from app.core.auth import authenticate, create_access_token, role_claims
 from app.core.config import Settings
 from app.deps import get_session, get_settings
 from app.models import UserRead, UserCreate
@@ -31,12 +31,16 @@ def login(
     )
     if not user:
         raise HTTPException(400, "Incorrect username or password")
+    claims = None
+    if settings.ROLE_CLAIMS_VERSION is not None:
+        claims = role_claims(user, settings.ROLE_CLAIMS_VERSION)
     return {
         "access_token": create_access_token(
             subject=str(user.id),
             exp=settings.ACCESS_TOKEN_EXPIRE_MINUTES,
             key=settings.JWT_SECRET,
             algo=settings.ALGORITHM,
+            claims=claims,
         ),
         "token_type": "bearer",
         "user": UserRead.from_orm(user),
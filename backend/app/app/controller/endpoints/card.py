@@ -1,13 +1,33 @@
-from typing import Any
+from typing import Any, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app import crud
-from app.deps import get_session, get_current_user
+from app.controller.endpoints.common_params import (
+    ETAG_HEADER,
+    check_if_match,
+    make_etag,
+    not_modified,
+    decode_cursor,
+    set_next_cursor,
+)
+from app.core.response_cache import deck_key, get_deck_cache, invalidate_deck
+from app.core.serialization import dumps, model_response
+from app.deps import (
+    get_session,
+    get_async_session,
+    get_current_user,
+    get_current_user_async,
+    BatchQueryParams,
+)
 from app.models import (
+    Card,
     CardCreate,
     CardUpdate,
+    Resource,
+    ResourceRead,
     User,
     ResourceReadWithCards,
     CardReadWithResource,
@@ -16,10 +36,21 @@ from app.models import (
 router = APIRouter()
 
 
+def deck_etag(resource: Resource) -> str:
+    # a resource's version counts changes to its cards too
+    return make_etag("deck", resource.id, resource.version)
+
+
+def card_etag(card: Card) -> str:
+    resource = ResourceRead.from_orm(card.resource)
+    return make_etag("card", card.id, card.version, resource.dict())
+
+
 @router.post("/", status_code=201, response_model=ResourceReadWithCards)
 def create_cards(
     *,
     cards_in: CardCreate | list[CardCreate],
+    response: Response,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session),
 ) -> Any:
@@ -40,42 +71,116 @@ def create_cards(
     if current_user != resource.creator:
         raise HTTPException(401, f"Not creator of Resource with ID {resource.id}.")
 
-    crud.card.create_multi(session, objs_in=cards_in)
-    return resource
+    crud.resource.touch(resource)
+    crud.card.create_multi(session, objs_in=cards_in, bulk=True)
+    invalidate_deck(resource_id)
+    response.headers[ETAG_HEADER] = deck_etag(resource)
+    return model_response(
+        ResourceReadWithCards, resource, status_code=201, response=response
+    )
 
 
-@router.get("/{card_id}", status_code=200, response_model=CardReadWithResource)
-def fetch_card(
+@router.get("/search", status_code=200, response_model=list[CardReadWithResource])
+def search_cards(
     *,
-    card_id: int,
+    response: Response,
+    resource_id: Optional[int] = None,
+    batch: BatchQueryParams = Depends(),
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session),
 ) -> Any:
-    card = crud.card.get(session, card_id)
+    """
+    Search the questions and answers of the cards of the user's own and of
+    public resources, or of a single resource, for the query `q`, best match
+    first. Matches in the question rank above matches in the answer. When a
+    page is full, the X-Next-Cursor response header holds the `cursor` for
+    the next page.
+    """
+    if not batch.q:
+        raise HTTPException(422, "A search query q is required")
+    after = decode_cursor(batch.cursor, sort_type=(int, float))
+    if resource_id is not None:
+        resource = crud.resource.get(session, resource_id)
+        if not resource:
+            raise HTTPException(404, f"Resource with ID {resource_id} not found")
+        if resource.private and current_user.id != resource.creator_id:
+            raise HTTPException(401, f"Not creator of Resource with ID {resource_id}.")
+    page = crud.card.get_multi_by_search(
+        session,
+        current_user.id,
+        batch.q,
+        resource_id=resource_id,
+        skip=batch.skip,
+        limit=batch.limit,
+        after=after,
+    )
+    set_next_cursor(response, page, batch.limit, lambda row: (row[1], row[0].id))
+    return [card for card, _ in page]
+
+
+@router.get("/{card_id}", status_code=200, response_model=CardReadWithResource)
+async def fetch_card(
+    *,
+    card_id: int,
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user_async),
+    session: AsyncSession = Depends(get_async_session),
+) -> Any:
+    card = await crud.card.aget(session, card_id, load=CardReadWithResource)
     if not card:
         raise HTTPException(404, f"Card with ID {card_id} not found")
-    if card.resource.private and card.resource.creator != current_user:
+    if card.resource.private and card.resource.creator_id != current_user.id:
         raise HTTPException(401, f"Not creator of Resource for Card {card_id}.")
+    etag = card_etag(card)
+    if cached := not_modified(request, etag):
+        return cached
+    response.headers[ETAG_HEADER] = etag
     return card
 
 
 @router.get("/", status_code=200, response_model=ResourceReadWithCards)
-def fetch_cards_by_resource(
+async def fetch_cards_by_resource(
     *,
     resource_id: int,
-    current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session),
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user_async),
+    session: AsyncSession = Depends(get_async_session),
 ) -> Any:
     """
-    Get the flashcards for a resource.
+    Get the flashcards for a resource. The cards are only read if the
+    client's If-None-Match does not already name the current deck, and, for
+    a public resource, if the deck is not cached.
     """
-    resource = crud.resource.get(session, resource_id)
+    resource = await crud.resource.aget(session, resource_id)
     if not resource:
         raise HTTPException(404, f"Resource with ID {resource_id} not found")
-    if resource.private and current_user != resource.creator:
+    if resource.private and current_user.id != resource.creator_id:
         raise HTTPException(401, f"Not creator of Resource with ID {resource_id}.")
-    print(resource)
-    return resource
+    etag = deck_etag(resource)
+    if cached := not_modified(request, etag):
+        return cached
+
+    deck_cache = None if resource.private else get_deck_cache()
+    if deck_cache is not None:
+        body = await deck_cache.aget(deck_key(resource_id), resource.version)
+        if body is not None:
+            return Response(
+                body, media_type="application/json", headers={ETAG_HEADER: etag}
+            )
+
+    resource = await crud.resource.aget(
+        session, resource_id, load=ResourceReadWithCards, populate_existing=True
+    )
+    response.headers[ETAG_HEADER] = deck_etag(resource)
+    if deck_cache is None:
+        return model_response(ResourceReadWithCards, resource, response=response)
+    body = dumps(ResourceReadWithCards.from_orm(resource))
+    await deck_cache.aset(deck_key(resource_id), resource.version, body)
+    return Response(
+        body, media_type="application/json", headers=dict(response.headers)
+    )
 
 
 @router.patch("/{card_id}", status_code=200, response_model=CardReadWithResource)
@@ -83,13 +188,22 @@ def update_card(
     *,
     card_id: int,
     card_in: CardUpdate,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session),
 ) -> Any:
     """
     Update a card. Must belong to a resource created by current logged-in user.
+    With If-Match, the card is only updated if it is still as the client last
+    fetched it, otherwise 412.
     """
     db_card = crud.card.get(session, card_id)
     if db_card.resource.creator != current_user:
         raise HTTPException(401, f"Not creator of Resource for Card with ID {card_id}.")
-    return crud.card.update(session, db_obj=db_card, obj_in=card_in)
+    check_if_match(request, card_etag(db_card))
+    crud.resource.touch(db_card.resource)
+    card = crud.card.update(session, db_obj=db_card, obj_in=card_in)
+    invalidate_deck(card.resource_id)
+    response.headers[ETAG_HEADER] = card_etag(card)
+    return card
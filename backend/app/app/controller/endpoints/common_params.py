@@ -0,0 +1,244 @@
+import base64
+import binascii
+import codecs
+import csv
+import hashlib
+import io
+import json
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Iterable,
+    Iterator,
+    Optional,
+    Sequence,
+    Type,
+)
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from app.crud.base import KeysetKey
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+CSV_MEDIA_TYPE = "text/csv"
+ETAG_HEADER = "ETag"
+
+
+def encode_cursor(key: KeysetKey) -> str:
+    """Encode a keyset key as an opaque, url-safe cursor token"""
+    raw = json.dumps(list(key), separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(
+    cursor: Optional[str], sort_type: type | tuple[type, ...] = object
+) -> Optional[KeysetKey]:
+    """
+    Decode a cursor token produced by `encode_cursor`. An empty cursor means
+    "start from the beginning". Malformed tokens, and tokens whose sort value
+    is not a `sort_type`, are rejected with a 400.
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, _id = json.loads(raw)
+        if not isinstance(_id, int) or not isinstance(sort_value, sort_type):
+            raise ValueError(_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise HTTPException(400, "Invalid pagination cursor")
+    return sort_value, _id
+
+
+def set_next_cursor(
+    response: Response,
+    page: Sequence[Any],
+    limit: int,
+    key: Callable[[Any], KeysetKey],
+) -> None:
+    """
+    When `page` is full, advertise the cursor of its last row in the
+    X-Next-Cursor header, so the client can request the following page.
+    """
+    if page and len(page) >= limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(key(page[-1]))
+
+
+def wants_ndjson(request: Request) -> bool:
+    """If the client asked for a newline-delimited JSON stream"""
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def ndjson_response(
+    rows: Iterable[Any], response_model: Type[BaseModel], chunk_size: int = 1000
+) -> StreamingResponse:
+    """
+    Stream `rows` as newline-delimited JSON, one `response_model` per line.
+    Rows are validated and serialized as they arrive, so memory use stays
+    bounded by `chunk_size` rather than by the size of the result.
+    """
+
+    def chunks() -> Iterator[str]:
+        lines = []
+        for row in rows:
+            lines.append(response_model.from_orm(row).json())
+            if len(lines) >= chunk_size:
+                yield "\n".join(lines) + "\n"
+                lines.clear()
+        if lines:
+            yield "\n".join(lines) + "\n"
+
+    return StreamingResponse(chunks(), media_type=NDJSON_MEDIA_TYPE)
+
+
+def csv_response(
+    rows: Iterable[Any], columns: Sequence[str], chunk_size: int = 1000
+) -> StreamingResponse:
+    """
+    Stream the `columns` attributes of `rows` as CSV, after a header row,
+    in chunks of `chunk_size` rows.
+    """
+
+    def chunks() -> Iterator[str]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for i, row in enumerate(rows, 1):
+            writer.writerow([getattr(row, c) for c in columns])
+            if i % chunk_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    return StreamingResponse(chunks(), media_type=CSV_MEDIA_TYPE)
+
+
+def _records_end(text: str) -> int:
+    """The end of the last complete CSV record in `text`, 0 if there is none"""
+    start = end = quotes = 0
+    while (newline := text.find("\n", start)) != -1:
+        # a newline between an odd number of quotes is inside a quoted field
+        quotes += text.count('"', start, newline)
+        if quotes % 2 == 0:
+            end = newline + 1
+        start = newline + 1
+    return end
+
+
+async def csv_records(
+    body: AsyncIterator[bytes], columns: Sequence[str]
+) -> AsyncIterator[tuple[str, ...]]:
+    """
+    Parse a CSV request body as it arrives, yielding the `columns` of each
+    row, which its header row names in any order. Only the records of one
+    chunk of the body are held at a time. Malformed rows are rejected with
+    a 422.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    indexes, n_row, buffer = None, 0, ""
+    final = False
+    chunks = body.__aiter__()
+    while not final:
+        try:
+            buffer += decoder.decode(await chunks.__anext__())
+            end = _records_end(buffer)
+        except StopAsyncIteration:
+            buffer += decoder.decode(b"", final=True)
+            end, final = len(buffer), True
+        except UnicodeDecodeError:
+            raise HTTPException(422, "CSV body is not UTF-8")
+        text, buffer = buffer[:end], buffer[end:]
+        for row in csv.reader(io.StringIO(text)):
+            n_row += 1
+            if not row:
+                continue
+            if indexes is None:
+                missing = [c for c in columns if c not in row]
+                if missing:
+                    raise HTTPException(422, f"CSV header lacks columns {missing}")
+                indexes = [row.index(c) for c in columns]
+                continue
+            try:
+                yield tuple(row[i] for i in indexes)
+            except IndexError:
+                raise HTTPException(422, f"CSV row {n_row} has too few columns")
+    if indexes is None:
+        raise HTTPException(422, "CSV body has no header row")
+
+
+async def ndjson_records(
+    body: AsyncIterator[bytes], columns: Sequence[str]
+) -> AsyncIterator[tuple[str, ...]]:
+    """
+    Parse a newline-delimited JSON request body as it arrives, yielding the
+    string `columns` of each object. Malformed lines are rejected with a 422.
+    """
+    buffer, n_line = b"", 0
+
+    def parse(line: bytes) -> tuple[str, ...]:
+        try:
+            obj = json.loads(line)
+            values = tuple(obj[c] for c in columns)
+        except (ValueError, TypeError, KeyError):
+            raise HTTPException(422, f"Line {n_line} is not an object with {columns}")
+        if not all(isinstance(v, str) for v in values):
+            raise HTTPException(422, f"Line {n_line} has non-string {columns}")
+        return values
+
+    async for chunk in body:
+        *lines, buffer = (buffer + chunk).split(b"\n")
+        for line in lines:
+            n_line += 1
+            if line.strip():
+                yield parse(line)
+    if buffer.strip():
+        n_line += 1
+        yield parse(buffer)
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    A strong entity tag for a representation, from everything it is built
+    of: the versions of the rows it shows, and the values of any unversioned
+    ones, such as users.
+    """
+    raw = json.dumps(parts, separators=(",", ":"), default=str)
+    return '"' + hashlib.blake2b(raw.encode(), digest_size=16).hexdigest() + '"'
+
+
+def _listed_etags(header: str) -> list[str]:
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """
+    A 304 response if the client's If-None-Match already names `etag`, so the
+    route can skip building the representation.
+    """
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return None
+    tags = _listed_etags(header)
+    # If-None-Match compares weakly, ignoring a W/ prefix
+    if "*" in tags or etag in (t.removeprefix("W/") for t in tags):
+        return Response(status_code=304, headers={ETAG_HEADER: etag})
+    return None
+
+
+def check_if_match(request: Request, etag: str) -> None:
+    """
+    Reject a write with 412 unless its If-Match names `etag`, the current
+    tag of the target, i.e. unless the client saw the latest version. A
+    write without If-Match is not checked.
+    """
+    header = request.headers.get("if-match")
+    if header is None:
+        return
+    tags = _listed_etags(header)
+    if "*" not in tags and etag not in tags:
+        raise HTTPException(412, "Changed since it was read, fetch it again")
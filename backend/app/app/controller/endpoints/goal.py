@@ -1,22 +1,47 @@
 from typing import Any
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 
 from app import crud
+from app.controller.endpoints.common_params import (
+    ETAG_HEADER,
+    make_etag,
+    not_modified,
+)
+from app.core.serialization import model_response
 from app.deps import get_session, get_current_user, get_current_teacher
 from app.models import (
+    Goal,
+    GoalProgressRead,
     GoalReadWithResources,
     User,
     GoalCreate,
     GoalResourceCreate,
     GoalResourceMultiCreate,
     Role,
+    UserRead,
 )
 
 router = APIRouter()
 
 
+def goal_etag(goal: Goal) -> str:
+    # users and topics have no version, so their values stand in for one
+    return make_etag(
+        "goal",
+        goal.id,
+        goal.version,
+        UserRead.from_orm(goal.teacher).dict(),
+        UserRead.from_orm(goal.student).dict(),
+        goal.standard.id,
+        goal.standard.version,
+        goal.standard.topic.description,
+        # a resource's version counts changes to its cards too
+        [(r.id, r.version) for r in goal.resources],
+    )
+
+
 @router.post("/", status_code=201, response_model=GoalReadWithResources)
 def create_goal(
     *,
@@ -28,7 +53,7 @@ def create_goal(
     stu_id, grp_id, std_id = (goal_in.student_id, goal_in.group_id, goal_in.standard_id)
     student = crud.user.get(session, stu_id)
     group = crud.group.get(session, grp_id)
-    standard = crud.standard.get(session, std_id)
+    standard = crud.catalog.get(session, std_id)
 
     if not student:
         raise HTTPException(404, f"Student with ID {stu_id} not found")
@@ -69,9 +94,7 @@ def add_resource_link(
     if resource.private and current_teacher != resource.creator:
         raise HTTPException(401, f"Not creator of private Resource")
 
-    goal.resources.append(resource)
-    crud.goal.refresh(session, goal)
-    return goal
+    return link_resources(session, goal, [rid])
 
 
 @router.post("/resource-link/multi/", response_model=GoalReadWithResources)
@@ -96,23 +119,61 @@ def add_resource_link(
     if not resources:
         raise HTTPException(404, f"Any Resource with IDs {rids} not found")
 
-    resources = [r for r in resources if r.creator == current_teacher or not r.private]
-    goal.resources.extend(resources)
-    goal = crud.goal.refresh(session, goal)
-    return goal
+    rids = [
+        r.id for r in resources if r.creator_id == current_teacher.id or not r.private
+    ]
+    return link_resources(session, goal, rids)
+
+
+def link_resources(session: Session, goal: Goal, resource_ids: list[int]) -> Goal:
+    """
+    Link resources to a goal, touching the goal if any link is new, and
+    read it back with its resources
+    """
+    if crud.goal_resource.link(session, goal.id, resource_ids):
+        crud.goal.touch(goal)
+    session.commit()
+    return crud.goal.get(session, goal.id, load=GoalReadWithResources)
 
 
 @router.get("/{goal_id}", status_code=200, response_model=GoalReadWithResources)
 def fetch_goal(
     *,
     goal_id: int,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session),
 ) -> Any:
     """Fetch a goal by ID"""
-    goal = crud.goal.get(session, goal_id)
+    goal = crud.goal.get(session, goal_id, load=GoalReadWithResources)
     if not goal:
         raise HTTPException(404, f"Goal with ID {goal_id} not found")
     if current_user != goal.teacher and current_user != goal.student:
         raise HTTPException(401, f"Not a member of Goal with ID {goal_id}")
-    return goal
+    etag = goal_etag(goal)
+    if cached := not_modified(request, etag):
+        return cached
+    response.headers[ETAG_HEADER] = etag
+    return model_response(GoalReadWithResources, goal, response=response)
+
+
+@router.get("/{goal_id}/progress", response_model=GoalProgressRead)
+def fetch_goal_progress(
+    *,
+    goal_id: int,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+) -> Any:
+    """
+    Fetch how a goal's student is doing against it: trials so far, how many
+    were correct, the accuracy and whether the goal is met. Read from the
+    goal's progress summary, without touching its attempts.
+    """
+    found = crud.goal_progress.get_for_goal(session, goal_id)
+    if not found:
+        raise HTTPException(404, f"Goal with ID {goal_id} not found")
+    teacher_id, student_id, progress = found
+    if current_user.id not in (teacher_id, student_id):
+        raise HTTPException(401, f"Not a member of Goal with ID {goal_id}")
+    return progress
@@ -0,0 +1,28 @@
+from typing import Any, Optional
+
+from fastapi import APIRouter, Depends
+
+from app.core.response_cache import get_deck_cache
+from app.database import async_engine, engine
+from app.deps import get_current_active_superuser
+
+router = APIRouter(dependencies=[Depends(get_current_active_superuser)])
+
+
+@router.get("/pool", status_code=200)
+def fetch_pool_stats() -> dict[str, dict]:
+    """
+    Connection pool gauges and statistics of this worker process, for the
+    sync and the async engine.
+    """
+    return {
+        "sync": engine.pool.status_dict(),
+        "async": async_engine.pool.status_dict(),
+    }
+
+
+@router.get("/deck-cache", status_code=200)
+def fetch_deck_cache_stats() -> Optional[dict[str, Any]]:
+    """Hits and misses of this worker's cache of public decks, if it is on"""
+    deck_cache = get_deck_cache()
+    return None if deck_cache is None else deck_cache.stats()
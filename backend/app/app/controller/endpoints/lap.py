@@ -2,9 +2,16 @@ from typing import Any
 
 from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app import crud
-from app.deps import get_session, get_current_student, get_current_user
+from app.core.serialization import model_response
+from app.deps import (
+    get_session,
+    get_async_session,
+    get_current_student,
+    get_current_user_async,
+)
 from app.models import LapRead, LapCreate, User, LapReadWithAttempts
 
 router = APIRouter()
@@ -31,16 +38,16 @@ def create_lap(
 
 
 @router.get("/{lap_id}", response_model=LapReadWithAttempts)
-def get_lap_by_id(
+async def get_lap_by_id(
     *,
     lap_id: int,
-    current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user_async),
+    session: AsyncSession = Depends(get_async_session),
 ) -> Any:
-    lap = crud.lap.get(session, lap_id)
+    lap = await crud.lap.aget(session, lap_id, load=LapReadWithAttempts)
     if not lap:
         raise HTTPException(404, f"Lap with ID {lap_id} not found.")
-    goal = crud.goal.get(session, lap.goal_id)
-    if current_user != goal.student and current_user != goal.teacher:
+    goal = lap.goal
+    if current_user.id not in (goal.student_id, goal.teacher_id):
         raise HTTPException(401, f"Not a member of associated Goal.")
-    return lap
+    return model_response(LapReadWithAttempts, lap)
@@ -1,12 +1,38 @@
 import logging
 from typing import Any, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app import crud
-from app.deps import get_session, get_current_user, BatchQueryParams
+from app.controller.endpoints.common_params import (
+    CSV_MEDIA_TYPE,
+    NDJSON_MEDIA_TYPE,
+    ETAG_HEADER,
+    check_if_match,
+    make_etag,
+    not_modified,
+    decode_cursor,
+    set_next_cursor,
+    wants_ndjson,
+    ndjson_response,
+    csv_response,
+    csv_records,
+    ndjson_records,
+)
+from app.core.response_cache import invalidate_deck
+from app.crud.crud_card import IMPORT_COLUMNS
+from app.deps import (
+    get_session,
+    get_async_session,
+    get_current_user,
+    get_current_user_async,
+    BatchQueryParams,
+)
 from app.models import (
+    CardImportResult,
+    CardRead,
     Resource,
     ResourceRead,
     ResourceReadWithCreator,
@@ -17,6 +43,7 @@ from app.models import (
     ResourceReadWithStandards,
     ResourceStandardsMultiCreate,
     ResourceCreateInternal,
+    UserRead,
 )
 
 logger = logging.getLogger(__name__)
@@ -24,6 +51,12 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+def resource_etag(resource: Resource, viewer: User) -> str:
+    # only the creator is shown the creator
+    creator = UserRead.from_orm(viewer).dict() if resource.creator == viewer else None
+    return make_etag("resource", resource.id, resource.version, creator)
+
+
 @router.post("/", status_code=201, response_model=ResourceReadWithCreator)
 def create_resource(
     *,
@@ -54,14 +87,15 @@ def add_standard_link(
     resource = crud.resource.get(session, rsc_id)
     if not resource:
         raise HTTPException(404, f"Resource with ID {rsc_id} not found")
-    standard = crud.standard.get(session, std_id)
+    standard = crud.catalog.get(session, std_id)
     if not standard:
         raise HTTPException(404, f"Standard with ID {std_id} not found")
     if resource.creator_id != current_user.id:
         raise HTTPException(401, f"Not creator of Resource with ID {resource.id}.")
 
-    resource.standards.append(standard)
-    return crud.resource.refresh(session, resource)
+    crud.standard_resource.link(session, rsc_id, [std_id])
+    session.commit()
+    return crud.resource.get(session, rsc_id, load=ResourceReadWithStandards)
 
 
 @router.post("/standard-link/multi", response_model=ResourceReadWithStandards)
@@ -82,7 +116,7 @@ def add_multi_standard_link(
     """
     rsc_id, std_ids = rsc_stds_in.resource_id, set(rsc_stds_in.standard_ids)
     resource = crud.resource.get(session, rsc_id)
-    standards = crud.standard.get_mult_by_ids(session, std_ids)
+    standards = crud.catalog.get_mult_by_ids(session, std_ids)
 
     if not resource:
         raise HTTPException(404, f"Resource with ID {rsc_id} not found")
@@ -96,16 +130,19 @@ def add_multi_standard_link(
             f" Provide ignore_non_exist_stds=true to force link creation"
             f" to standards that exist in standard_ids list.",
         )
-    if resource.creator != current_user:
+    if resource.creator_id != current_user.id:
         raise HTTPException(401, f"Not creator of Resource with ID {resource.id}.")
-    resource.standards.extend(standards)
-    return crud.resource.refresh(session, resource)
+    crud.standard_resource.link(session, rsc_id, [s.id for s in standards])
+    session.commit()
+    return crud.resource.get(session, rsc_id, load=ResourceReadWithStandards)
 
 
 @router.get("/{resource_id}", status_code=200, response_model=ResourceReadWithCreator)
 def fetch_resource(
     *,
     resource_id: int,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session),
 ) -> Any:
@@ -115,11 +152,15 @@ def fetch_resource(
     not created by the current user, does not return creator info.
     """
     logger.debug(f"fetch_resource({resource_id=}, {current_user=})")
-    resource = crud.resource.get(session, resource_id)
+    resource = crud.resource.get(session, resource_id, load=ResourceReadWithCreator)
     if resource and resource.private and resource.creator != current_user:
         raise HTTPException(401, f"Not creator of Resource with ID {resource_id}.")
     elif not resource:
         raise HTTPException(404, f"Resource with ID {resource_id} not found")
+    etag = resource_etag(resource, current_user)
+    if cached := not_modified(request, etag):
+        return cached
+    response.headers[ETAG_HEADER] = etag
     if resource.creator != current_user:
         return resource.dict(exclude={"creator"})
     return resource
@@ -127,6 +168,8 @@ def fetch_resource(
 
 @router.get("/", status_code=200, response_model=list[ResourceRead])
 def fetch_all_resources(
+    request: Request,
+    response: Response,
     standard_id: Optional[int] = None,
     include_public: Optional[bool] = False,
     batch: BatchQueryParams = Depends(),
@@ -140,21 +183,79 @@ def fetch_all_resources(
     'include_public' is marked as True but no standard id is given, it will
     have no effect and simply all resources created by the user will still be
     returned. Creator info (your info) is only returned if no public resources
-    are requested.
+    are requested. When a page is full, the X-Next-Cursor response header
+    holds the `cursor` for the next page. With `Accept: application/x-ndjson`,
+    every resource after `cursor` is streamed instead, one per line, and
+    skip/limit are ignored.
+
+    With `q`, only resources whose name matches the search query `q` are
+    returned, best match first, and include_public applies with or without
+    a standard_id.
     """
+    if batch.q:
+        return search_resources(
+            request, response, batch, standard_id, include_public, current_user, session
+        )
+    after = decode_cursor(batch.cursor)
+    if standard_id and not crud.catalog.get(session, standard_id):
+        raise HTTPException(404, f"Standard with ID {standard_id} not found")
+
+    if wants_ndjson(request):
+        if not standard_id:
+            stmt = crud.resource.select_by_creator(current_user.id, after=after)
+        else:
+            stmt = crud.resource.select_by_standard(
+                current_user.id, standard_id, include_public=include_public, after=after
+            )
+        return ndjson_response(crud.resource.stream(session, stmt), ResourceRead)
+
     if not standard_id:
-        resources = current_user.resources
+        resources = crud.resource.get_multi_by_creator(
+            session, current_user.id, skip=batch.skip, limit=batch.limit, after=after
+        )
     else:
-        standard = crud.standard.get(session, standard_id)
-        if not standard:
-            raise HTTPException(404, f"Standard with ID {standard_id} not found")
-        resources = [
-            r
-            for r in standard.resources
-            if r.creator == current_user or (include_public and not r.private)
-        ]
+        resources = crud.resource.get_multi_by_standard(
+            session,
+            current_user.id,
+            standard_id,
+            include_public=include_public,
+            skip=batch.skip,
+            limit=batch.limit,
+            after=after,
+        )
+    set_next_cursor(response, resources, batch.limit, crud.resource.keyset_key)
+    return resources
+
 
-    return resources[batch.skip : batch.limit + batch.skip]
+def search_resources(
+    request: Request,
+    response: Response,
+    batch: BatchQueryParams,
+    standard_id: Optional[int],
+    include_public: bool,
+    current_user: User,
+    session: Session,
+) -> Any:
+    after = decode_cursor(batch.cursor, sort_type=(int, float))
+    if standard_id and not crud.catalog.get(session, standard_id):
+        raise HTTPException(404, f"Standard with ID {standard_id} not found")
+    if wants_ndjson(request):
+        stmt = crud.resource.select_by_search(
+            current_user.id, batch.q, standard_id, include_public, after=after
+        )
+        return ndjson_response(crud.resource.stream(session, stmt), ResourceRead)
+    page = crud.resource.get_multi_by_search(
+        session,
+        current_user.id,
+        batch.q,
+        standard_id,
+        include_public=include_public,
+        skip=batch.skip,
+        limit=batch.limit,
+        after=after,
+    )
+    set_next_cursor(response, page, batch.limit, lambda row: (row[1], row[0].id))
+    return [resource for resource, _ in page]
 
 
 @router.patch("/{resource_id}", status_code=200, response_model=ResourceRead)
@@ -162,11 +263,82 @@ def update_resource(
     *,
     resource_id: int,
     resource_in: ResourceUpdate,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session),
 ) -> Any:
-    """Update a resource that belongs to logged-in user"""
+    """
+    Update a resource that belongs to logged-in user. With If-Match, the
+    resource is only updated if it is still as the client last fetched it,
+    otherwise 412.
+    """
     db_resource = session.get(Resource, resource_id)
     if db_resource.creator != current_user:
         raise HTTPException(401, f"Not creator of Resource with ID {resource_id}.")
-    return crud.resource.update(session, db_obj=db_resource, obj_in=resource_in)
+    check_if_match(request, resource_etag(db_resource, current_user))
+    resource = crud.resource.update(session, db_obj=db_resource, obj_in=resource_in)
+    invalidate_deck(resource_id)
+    response.headers[ETAG_HEADER] = resource_etag(resource, current_user)
+    return resource
+
+
+@router.post(
+    "/{resource_id}/cards/import", status_code=201, response_model=CardImportResult
+)
+async def import_cards(
+    *,
+    resource_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_user_async),
+    session: AsyncSession = Depends(get_async_session),
+) -> Any:
+    """
+    Add cards to a resource of the logged-in user from a CSV body, with a
+    header row naming the 'question' and 'answer' columns, or a
+    newline-delimited JSON body of {"question", "answer"} objects. The body
+    is read as it is uploaded, and the cards are all added, or none if any
+    row is malformed.
+    """
+    resource = await crud.resource.aget(session, resource_id)
+    if not resource:
+        raise HTTPException(404, f"Resource with ID {resource_id} not found")
+    if resource.creator_id != current_user.id:
+        raise HTTPException(401, f"Not creator of Resource with ID {resource_id}.")
+
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith(CSV_MEDIA_TYPE):
+        rows = csv_records(request.stream(), IMPORT_COLUMNS)
+    elif content_type.startswith(NDJSON_MEDIA_TYPE):
+        rows = ndjson_records(request.stream(), IMPORT_COLUMNS)
+    else:
+        raise HTTPException(
+            415, f"Cards are imported from {CSV_MEDIA_TYPE} or {NDJSON_MEDIA_TYPE}"
+        )
+    imported = await crud.card.aimport(session, resource, rows)
+    invalidate_deck(resource_id)
+    return CardImportResult(resource_id=resource_id, imported=imported)
+
+
+@router.get("/{resource_id}/cards/export", status_code=200)
+def export_cards(
+    *,
+    resource_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+) -> Any:
+    """
+    Stream the cards of a resource as CSV, or as newline-delimited JSON
+    with `Accept: application/x-ndjson`, in the order they were added. A
+    private resource can only be exported by its creator.
+    """
+    resource = crud.resource.get(session, resource_id)
+    if not resource:
+        raise HTTPException(404, f"Resource with ID {resource_id} not found")
+    if resource.private and resource.creator_id != current_user.id:
+        raise HTTPException(401, f"Not creator of Resource with ID {resource_id}.")
+    cards = crud.card.stream(session, crud.card.select_by_resource(resource_id))
+    if wants_ndjson(request):
+        return ndjson_response(cards, CardRead)
+    return csv_response(cards, ("id", *IMPORT_COLUMNS))
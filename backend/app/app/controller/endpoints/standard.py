@@ -1,11 +1,20 @@
-from typing import Any
+from typing import Any, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlmodel import Session
 
 from app import crud, deps
 from app.deps import BatchQueryParams
-from app.models import StandardRead
+from app.controller.endpoints.common_params import (
+    ETAG_HEADER,
+    make_etag,
+    not_modified,
+    decode_cursor,
+    set_next_cursor,
+    wants_ndjson,
+    ndjson_response,
+)
+from app.models import StandardRead, Subject
 
 router = APIRouter()
 
@@ -16,14 +25,24 @@ router = APIRouter()
     dependencies=[Depends(deps.get_current_user)],
 )
 def fetch_standard(
-    *, standard_id: int, session: Session = Depends(deps.get_session)
+    *,
+    standard_id: int,
+    request: Request,
+    response: Response,
+    session: Session = Depends(deps.get_session),
 ) -> Any:
     """
-    Fetch a standard by ID.
+    Fetch a standard by ID. Served from the catalog cache.
     """
-    standard = crud.standard.get(session, standard_id)
+    standard = crud.catalog.get(session, standard_id)
     if not standard:
         raise HTTPException(404, f"Standard with ID {standard_id} not found")
+    etag = make_etag(
+        "standard", standard.id, standard.version, standard.topic.description
+    )
+    if cached := not_modified(request, etag):
+        return cached
+    response.headers[ETAG_HEADER] = etag
     return standard
 
 
@@ -33,9 +52,34 @@ def fetch_standard(
     dependencies=[Depends(deps.get_current_user)],
 )
 def fetch_all_standards(
-    *, batch: BatchQueryParams = Depends(), session: Session = Depends(deps.get_session)
+    *,
+    request: Request,
+    response: Response,
+    grade: Optional[int] = None,
+    subject: Optional[Subject] = None,
+    batch: BatchQueryParams = Depends(),
+    session: Session = Depends(deps.get_session),
 ) -> Any:
     """
-    Fetch all standards. Must be a logged-in user.
+    Fetch all standards, optionally only those of a grade and/or subject.
+    Must be a logged-in user. Served from the catalog cache. When a page is
+    full, the X-Next-Cursor response header holds the `cursor` for the next
+    page. With `Accept: application/x-ndjson`, every standard after `cursor`
+    is streamed instead, one per line, and skip/limit are ignored.
     """
-    return crud.standard.get_multi(session, skip=batch.skip, limit=batch.limit)
+    after = decode_cursor(batch.cursor)
+    if wants_ndjson(request):
+        rows = crud.catalog.get_multi(
+            session, limit=None, after=after, grade=grade, subject=subject
+        )
+        return ndjson_response(rows, StandardRead)
+    standards = crud.catalog.get_multi(
+        session,
+        skip=batch.skip,
+        limit=batch.limit,
+        after=after,
+        grade=grade,
+        subject=subject,
+    )
+    set_next_cursor(response, standards, batch.limit, crud.standard.keyset_key)
+    return standards
@@ -1,7 +1,15 @@
-from fastapi import APIRouter, Depends
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query, Request, Response
 from sqlmodel import Session
 
 from app import deps, crud
+from app.controller.endpoints.common_params import (
+    decode_cursor,
+    set_next_cursor,
+    wants_ndjson,
+    ndjson_response,
+)
 from app.models import User, UserRead, UserUpdate
 
 router = APIRouter()
@@ -13,12 +21,25 @@ router = APIRouter()
     dependencies=[Depends(deps.get_current_active_superuser)],
 )
 def fetch_all_user(
-    skip: int = 0, limit: int = 100, session: Session = Depends(deps.get_session)
+    request: Request,
+    response: Response,
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=100, ge=1, le=5000),
+    cursor: Optional[str] = None,
+    session: Session = Depends(deps.get_session),
 ) -> list[UserRead]:
     """
-    Retrieve all users. Must have superuser auth.
+    Retrieve all users. Must have superuser auth. When a page is full, the
+    X-Next-Cursor response header holds the `cursor` for the next page.
+    With `Accept: application/x-ndjson`, every user after `cursor` is
+    streamed instead, one per line, and skip/limit are ignored.
     """
-    return crud.user.get_multi(session, skip=skip, limit=limit)
+    after = decode_cursor(cursor)
+    if wants_ndjson(request):
+        return ndjson_response(crud.user.stream_multi(session, after=after), UserRead)
+    users = crud.user.get_multi(session, skip=skip, limit=limit, after=after)
+    set_next_cursor(response, users, limit, crud.user.keyset_key)
+    return users
 
 
 @router.get("/me", response_model=UserRead)
@@ -38,6 +59,7 @@ def update_user_me(
     """
     Update the current logged-in user.
     """
+    deps.load_claimed_user(session, current_user)
     merge_kwargs = dict(current_user.dict(), **user_in.dict(exclude_none=True))
     user_in_merge = UserUpdate(**merge_kwargs)
     return crud.user.update(session, db_obj=current_user, obj_in=user_in_merge)
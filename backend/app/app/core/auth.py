@@ -7,7 +7,7 @@ from pydantic import SecretStr
 from sqlmodel import Session
 
 from app import crud
-from app.core.security import verify_password
+from app.core.security import verify_and_update_password
 from app.models import User
 
 JWTPayloadMapping = MutableMapping[str, (datetime | bool | str | list[str] | list[int])]
@@ -33,16 +33,41 @@ def authenticate(
     :return: If password is correct, the User object with that email.
     If password is not correct, or email/username does not exist in database,
      returns None.
+
+    A correct password whose hash was made with outdated settings is
+    re-hashed and stored.
     """
     user: User = crud.user.get_by_email(session, email=email)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    verified, new_hash = verify_and_update_password(password, user.hashed_password)
+    if not verified:
         return None
+    if new_hash:
+        user.hashed_password = new_hash
+        session.add(user)
+        session.commit()
+        session.refresh(user)
     return user
 
 
-def create_access_token(*, subject: str, exp: int, key: SecretStr, algo: str) -> str:
+def role_claims(user: User, version: int) -> JWTPayloadMapping:
+    """
+    Claims that let requests be authorized without reading the users table.
+    They hold until the token expires, so a role change is only seen by
+    tokens issued after it, or once `version` no longer matches.
+    """
+    return {"role": user.role, "is_superuser": user.is_superuser, "ver": version}
+
+
+def create_access_token(
+    *,
+    subject: str,
+    exp: int,
+    key: SecretStr,
+    algo: str,
+    claims: Optional[JWTPayloadMapping] = None,
+) -> str:
     """
     Encode a subject into a JWT token that has some preset claims.
 
@@ -50,6 +75,7 @@ def create_access_token(*, subject: str, exp: int, key: SecretStr, algo: str) ->
     :param exp: When the access token will expire
     :param key: The JWT secret key used to encode token
     :param algo: The algorithm used to encode token
+    :param claims: Extra claims to embed, such as `role_claims`
 
     :return: A JWT token as a string
     """
@@ -68,6 +94,7 @@ def create_access_token(*, subject: str, exp: int, key: SecretStr, algo: str) ->
             "exp": datetime.utcnow() + timedelta(minutes=exp),
             "iat": datetime.utcnow(),
             "sub": str(subject),
+            **(claims or {}),
         },
         key=str(key),
         algorithm=algo,
@@ -1,6 +1,6 @@
 import os
 import pathlib
-from typing import Optional, Any
+from typing import Any, Literal, Optional
 
 from pydantic import (
     AnyHttpUrl,
@@ -26,6 +26,51 @@ class Settings(BaseSettings):
     JWT_SECRET: SecretStr
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8  # 8 days
+    # Version stamped on the role claims of access tokens. Tokens with another
+    # version are authorized from the users table, so bumping it retires
+    # every outstanding set of claims. None stops embedding claims at all.
+    ROLE_CLAIMS_VERSION: Optional[int] = 1
+    # bcrypt cost; hashes of another cost are replaced at their user's next login
+    PASSWORD_HASH_ROUNDS: int = 12
+    # processes that hash passwords, and how many hashes may queue for them
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 16
+    # Connection pool of each engine, sync and async, in every worker process.
+    # A worker may hold up to 2 * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections,
+    # which times the number of workers must stay under max_connections.
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    # seconds a checkout waits for a free connection before failing
+    DB_POOL_TIMEOUT: float = 30
+    # seconds after which a connection is replaced, -1 for never
+    DB_POOL_RECYCLE: int = 1800
+    # test each connection on checkout, replacing it if it was dropped
+    DB_POOL_PRE_PING: bool = True
+    # requests over either limit are logged along with their SQL statements
+    SLOW_REQUEST_QUERIES: int = 25
+    SLOW_REQUEST_MS: float = 1000
+    # encode responses with orjson, see app.core.serialization
+    FAST_JSON_RESPONSES: bool = False
+    # Cache of public decks, see app.core.response_cache: "memory" in each
+    # worker, "socket" shared by the workers through a cache server, or "none"
+    DECK_CACHE_BACKEND: Literal["none", "memory", "socket"] = "memory"
+    DECK_CACHE_MAX_MB: int = 64
+    DECK_CACHE_SOCKET: str = "/tmp/jksa-deck-cache.sock"
+    # Server, see app.server. Worker processes, by default one per CPU the
+    # server may run on; each has connection pools of its own, see above.
+    WEB_CONCURRENCY: Optional[int] = None
+    # import the app once, before forking, so workers share its memory
+    WEB_PRELOAD: bool = True
+    # requests after which a worker is replaced, 0 for never, plus up to the
+    # jitter, so that the workers are not all replaced at once
+    WEB_MAX_REQUESTS: int = 10000
+    WEB_MAX_REQUESTS_JITTER: int = 1000
+    # seconds a worker may go silent before it is killed, and seconds it has
+    # to finish its requests when restarted or shut down
+    WEB_TIMEOUT: int = 60
+    WEB_GRACEFUL_TIMEOUT: int = 30
+    # seconds an idle keep-alive connection is held open
+    WEB_KEEPALIVE: int = 5
 
     ########################
     # ENVIRONMENT SPECIFIC #
@@ -77,6 +122,20 @@ class Settings(BaseSettings):
             path=f"/{values.get('POSTGRES_DB') or ''}",
         )
 
+    # Same database, through the asyncpg driver, for AsyncSession routes
+    SQLALCHEMY_ASYNC_DATABASE_URI: Optional[PostgresDsn] = None
+
+    @validator("SQLALCHEMY_ASYNC_DATABASE_URI", pre=True)
+    def assemble_async_db_connection(
+        cls, v: Optional[str], values: dict[str, Any]
+    ) -> Any:
+        if isinstance(v, str):
+            return v
+        sync_uri = values.get("SQLALCHEMY_DATABASE_URI")
+        if not sync_uri:
+            return None
+        return sync_uri.replace(sync_uri.scheme, "postgresql+asyncpg", 1)
+
     FIRST_SUPERUSER: EmailStr = ""
     FIRST_SUPERUSER_PW: SecretStr = ""
     EMAIL_TEST_USER: EmailStr = "test@example.com"
@@ -0,0 +1,153 @@
+import threading
+import time
+from typing import Any
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+"""
+Connection pools that keep running statistics of their own use, so that a
+worker which is short of connections shows it rather than queueing silently.
+
+Checkout latency is the time spent in `Pool.connect()`, including any
+pre-ping. A checkout waits when the pool has no idle connection and can not
+open another one, because pool_size + max_overflow are already checked out;
+its latency is then also counted as wait time. Checkouts that wait longer than
+the pool timeout raise and are counted as timeouts.
+
+Statistics are per process: under gunicorn, each worker reports its own pools.
+"""
+
+
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_seconds = 0.0
+        self.checkout_seconds_max = 0.0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.wait_seconds_max = 0.0
+        self.timeouts = 0
+        self.peak_overflow = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.soft_invalidations = 0
+
+    def listen(self, pool: QueuePool) -> None:
+        event.listen(pool, "connect", self.on_connect)
+        event.listen(pool, "invalidate", self.on_invalidate)
+        event.listen(pool, "soft_invalidate", self.on_soft_invalidate)
+
+    def on_connect(self, dbapi_connection: Any, connection_record: Any) -> None:
+        with self._lock:
+            self.connects += 1
+
+    def on_invalidate(
+            self, dbapi_connection: Any, connection_record: Any, exception: Any
+    ) -> None:
+        with self._lock:
+            self.invalidations += 1
+
+    def on_soft_invalidate(
+            self, dbapi_connection: Any, connection_record: Any, exception: Any
+    ) -> None:
+        with self._lock:
+            self.soft_invalidations += 1
+
+    def record_checkout(self, seconds: float, waited: bool, overflow: int) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.checkout_seconds += seconds
+            self.checkout_seconds_max = max(self.checkout_seconds_max, seconds)
+            self.peak_overflow = max(self.peak_overflow, overflow)
+            if waited:
+                self.waits += 1
+                self.wait_seconds += seconds
+                self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def record_timeout(self, seconds: float) -> None:
+        with self._lock:
+            self.timeouts += 1
+            self.waits += 1
+            self.wait_seconds += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def as_dict(self) -> dict[str, Any]:
+        with self._lock:
+            mean = self.checkout_seconds / self.checkouts if self.checkouts else 0.0
+            return {
+                "checkouts": self.checkouts,
+                "checkout_ms_avg": _ms(mean),
+                "checkout_ms_max": _ms(self.checkout_seconds_max),
+                "waits": self.waits,
+                "wait_ms_total": _ms(self.wait_seconds),
+                "wait_ms_max": _ms(self.wait_seconds_max),
+                "timeouts": self.timeouts,
+                "peak_overflow": self.peak_overflow,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "soft_invalidations": self.soft_invalidations,
+            }
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+class _InstrumentedPoolMixin:
+    stats: PoolStats
+
+    def __init__(self, *args, max_overflow: int = 10, **kw):
+        super().__init__(*args, max_overflow=max_overflow, **kw)
+        # -1 lets the pool overflow without limit, so it never waits
+        self.capacity = None if max_overflow < 0 else self.size() + max_overflow
+        # a recreated pool inherits its predecessor's listeners, see recreate()
+        if "_dispatch" not in kw:
+            self.stats = PoolStats()
+            self.stats.listen(self)
+
+    def recreate(self):
+        """Engine.dispose() replaces the pool; its statistics carry over"""
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def connect(self):
+        # read without the pool's lock, so a checkout racing others may be
+        # counted as waiting when it did not, or the other way around
+        waited = (
+            self.capacity is not None
+            and self.checkedin() == 0
+            and self.checkedout() >= self.capacity
+        )
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.stats.record_timeout(time.perf_counter() - start)
+            raise
+        self.stats.record_checkout(
+            time.perf_counter() - start, waited, max(self.overflow(), 0)
+        )
+        return connection
+
+    def status_dict(self) -> dict[str, Any]:
+        """Current gauges of the pool together with its running statistics"""
+        return {
+            "size": self.size(),
+            "capacity": self.capacity,
+            "timeout": self.timeout(),
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            **self.stats.as_dict(),
+        }
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
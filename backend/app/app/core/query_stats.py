@@ -0,0 +1,142 @@
+import logging
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+"""
+Counts the SQL statements each request executes and the time they take.
+
+Cursor hooks on every Engine, including the sync engine behind an
+AsyncEngine, add to the RequestQueries of the current request, which the
+middleware keeps in a context variable. Sync routes run in the threadpool
+and async sessions in greenlets, and both get a copy of the request's
+context, so they see the same RequestQueries.
+
+Each response gets a Server-Timing header splitting its time between the
+database and the app, and requests over either threshold are logged with
+their statements, most executed first, which is how an N+1 shows itself.
+"""
+
+logger = logging.getLogger(__name__)
+
+_current: ContextVar[Optional["RequestQueries"]] = ContextVar(
+    "request_queries", default=None
+)
+
+_STARTED = "query_stats_started"
+
+# distinct statements kept per request for the log
+_MAX_STATEMENTS = 200
+
+
+class RequestQueries:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        # statement -> [times executed, total seconds]
+        self.statements: dict[str, list] = {}
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        tally = self.statements.get(statement)
+        if tally is None:
+            if len(self.statements) >= _MAX_STATEMENTS:
+                return
+            tally = self.statements[statement] = [0, 0.0]
+        tally[0] += 1
+        tally[1] += seconds
+
+    def server_timing(self, elapsed: float) -> str:
+        db_ms = self.seconds * 1000
+        total_ms = elapsed * 1000
+        return (
+            f'db;dur={db_ms:.1f};desc="{self.count} queries", '
+            f"app;dur={max(total_ms - db_ms, 0):.1f}, "
+            f"total;dur={total_ms:.1f}"
+        )
+
+    def most_executed(self, n: int = 10) -> list[tuple[str, int, float]]:
+        ranked = sorted(self.statements.items(), key=lambda item: -item[1][0])
+        return [(sql, count, seconds) for sql, (count, seconds) in ranked[:n]]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault(_STARTED, []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    queries = _current.get()
+    started = conn.info.get(_STARTED)
+    if queries is not None and started:
+        queries.record(statement, time.perf_counter() - started.pop())
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get(_STARTED):
+        conn.info[_STARTED].pop()
+
+
+def listen() -> None:
+    """Install the cursor hooks on every Engine, once per process"""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+
+
+class QueryStatsMiddleware:
+    def __init__(self, app: ASGIApp, *, max_queries: int, max_ms: float):
+        self.app = app
+        self.max_queries = max_queries
+        self.max_ms = max_ms
+        listen()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        queries = RequestQueries()
+        token = _current.set(queries)
+        start = time.perf_counter()
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - start
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", queries.server_timing(elapsed))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            self.log_if_slow(scope, queries, time.perf_counter() - start)
+
+    def log_if_slow(
+            self, scope: Scope, queries: RequestQueries, elapsed: float
+    ) -> None:
+        elapsed_ms = elapsed * 1000
+        if queries.count <= self.max_queries and elapsed_ms <= self.max_ms:
+            return
+        lines = [
+            f"{count} x {seconds * 1000:.1f} ms: {sql}"
+            for sql, count, seconds in queries.most_executed()
+        ]
+        logger.warning(
+            "%s %s took %.1f ms with %d queries (%.1f ms in the database):\n%s",
+            scope["method"],
+            scope["path"],
+            elapsed_ms,
+            queries.count,
+            queries.seconds * 1000,
+            "\n".join(lines),
+        )
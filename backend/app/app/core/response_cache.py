@@ -0,0 +1,284 @@
+import argparse
+import logging
+import os
+import socket
+import socketserver
+import struct
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Optional, Protocol
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import Settings
+
+"""
+Encoded response bodies, cached by key, each stored with the version of the
+row it was built from. A read names the version it expects, so an entry
+that is out of date is never served; writes delete the entry as well, to
+free its memory straight away. The decks of public resources, read by every
+student they are assigned to, are cached by resource id.
+
+The backend is either an LRU in process memory, bounded in bytes, or a cache
+server on a Unix socket, shared by every gunicorn worker on the host:
+
+    python -m app.core.response_cache --socket /tmp/jksa-deck-cache.sock
+
+A cache server that is down or slow only costs misses, never a failed
+request.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend(Protocol):
+    # if calls wait on I/O, so async code must make them from a thread
+    blocking: bool
+
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    def set(self, key: str, value: bytes) -> None:
+        ...
+
+    def delete(self, key: str) -> None:
+        ...
+
+
+class LRUBackend:
+    """Least recently used entries are evicted past `max_bytes` in total"""
+
+    blocking = False
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._pop(key)
+
+    def _pop(self, key: str) -> None:
+        value = self._entries.pop(key, None)
+        if value is not None:
+            self.size -= len(value)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Requests are an op byte, a length-prefixed key and, for SET, a
+# length-prefixed value. GET answers with a length-prefixed value, or
+# MISSING; SET and DELETE with a single OK byte.
+GET, SET, DELETE, OK = b"G", b"S", b"D", b"K"
+_LENGTH = struct.Struct("!I")
+MISSING = 0xFFFFFFFF
+
+
+def _recv_exactly(sock: socket.socket, n: int) -> bytes:
+    data = bytearray()
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        if not chunk:
+            raise ConnectionError("connection closed")
+        data += chunk
+    return bytes(data)
+
+
+def _recv_frame(sock: socket.socket) -> Optional[bytes]:
+    (length,) = _LENGTH.unpack(_recv_exactly(sock, _LENGTH.size))
+    if length == MISSING:
+        return None
+    return _recv_exactly(sock, length)
+
+
+def _frame(data: bytes) -> bytes:
+    return _LENGTH.pack(len(data)) + data
+
+
+class SocketBackend:
+    """
+    Client of a cache server. Each thread keeps a connection of its own,
+    opened on first use and reopened after an error.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, timeout: float = 0.25):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.path)
+            except OSError:
+                sock.close()
+                raise
+            self._local.sock = sock
+        return sock
+
+    def _call(self, request: bytes, reply) -> Optional[bytes]:
+        try:
+            sock = self._connection()
+            sock.sendall(request)
+            return reply(sock)
+        except OSError as e:
+            logger.warning("Response cache at %s unavailable: %s", self.path, e)
+            sock = getattr(self._local, "sock", None)
+            if sock is not None:
+                sock.close()
+                self._local.sock = None
+            return None
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._call(GET + _frame(key.encode()), _recv_frame)
+
+    def set(self, key: str, value: bytes) -> None:
+        request = SET + _frame(key.encode()) + _frame(value)
+        self._call(request, lambda sock: _recv_exactly(sock, 1))
+
+    def delete(self, key: str) -> None:
+        self._call(DELETE + _frame(key.encode()), lambda sock: _recv_exactly(sock, 1))
+
+
+class _CacheRequestHandler(socketserver.BaseRequestHandler):
+    def handle(self) -> None:
+        backend: LRUBackend = self.server.backend
+        sock = self.request
+        while True:
+            try:
+                op = sock.recv(1)
+                if not op:
+                    return
+                key = _recv_frame(sock).decode()
+                if op == GET:
+                    value = backend.get(key)
+                    sock.sendall(
+                        _LENGTH.pack(MISSING) if value is None else _frame(value)
+                    )
+                elif op == SET:
+                    backend.set(key, _recv_frame(sock))
+                    sock.sendall(OK)
+                elif op == DELETE:
+                    backend.delete(key)
+                    sock.sendall(OK)
+                else:
+                    return
+            except (ConnectionError, struct.error):
+                return
+
+
+class CacheServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, max_bytes: int):
+        if os.path.exists(path):
+            os.unlink(path)
+        self.backend = LRUBackend(max_bytes)
+        super().__init__(path, _CacheRequestHandler)
+
+
+class ResponseCache:
+    """Response bodies by key and version, counting hits and misses"""
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, version: int) -> Optional[bytes]:
+        entry = self.backend.get(key)
+        if entry is not None:
+            stored, _, body = entry.partition(b"\n")
+            if int(stored) == version:
+                self.hits += 1
+                return body
+        self.misses += 1
+        return None
+
+    def set(self, key: str, version: int, body: bytes) -> None:
+        self.backend.set(key, b"%d\n" % version + body)
+
+    async def aget(self, key: str, version: int) -> Optional[bytes]:
+        if self.backend.blocking:
+            return await run_in_threadpool(self.get, key, version)
+        return self.get(key, version)
+
+    async def aset(self, key: str, version: int, body: bytes) -> None:
+        if self.backend.blocking:
+            return await run_in_threadpool(self.set, key, version, body)
+        self.set(key, version, body)
+
+    def invalidate(self, key: str) -> None:
+        self.backend.delete(key)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+@lru_cache()
+def get_deck_cache() -> Optional[ResponseCache]:
+    """The cache of public decks set up by Settings, None if it is off"""
+    settings = Settings()
+    if settings.DECK_CACHE_BACKEND == "none":
+        return None
+    if settings.DECK_CACHE_BACKEND == "socket":
+        return ResponseCache(SocketBackend(settings.DECK_CACHE_SOCKET))
+    return ResponseCache(LRUBackend(settings.DECK_CACHE_MAX_MB * 2**20))
+
+
+def deck_key(resource_id: int) -> str:
+    return f"deck:{resource_id}"
+
+
+def invalidate_deck(resource_id: int) -> None:
+    """Drop the cached deck of a resource, after a write to it or its cards"""
+    deck_cache = get_deck_cache()
+    if deck_cache is not None:
+        deck_cache.invalidate(deck_key(resource_id))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a shared response cache")
+    parser.add_argument("--socket", default=None, help="default DECK_CACHE_SOCKET")
+    parser.add_argument("--max-mb", type=int, default=None)
+    args = parser.parse_args()
+    path = args.socket or Settings().DECK_CACHE_SOCKET
+    max_mb = args.max_mb or Settings().DECK_CACHE_MAX_MB
+    logging.basicConfig(level=logging.INFO)
+    with CacheServer(path, max_mb * 2**20) as server:
+        logger.info("Response cache of %d MB on %s", max_mb, path)
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,86 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Optional
+
 from passlib.context import CryptContext
 from pydantic import SecretStr
 
-password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.core.config import Settings
+
+"""
+bcrypt is deliberately slow, and holds the GIL while it runs. Hashing and
+verification are therefore done in a small pool of worker processes, and at
+most PASSWORD_HASH_MAX_PENDING calls may be queued or running at once. A call
+over that limit fails fast with PasswordHashingBusy, so a burst of logins
+can only tie up that many request threads, never the whole thread pool.
+"""
+
+
+class PasswordHashingBusy(Exception):
+    """Too many password hashes are already queued"""
+
+
+@lru_cache()
+def get_password_context(rounds: int) -> CryptContext:
+    """
+    The app's CryptContext for a bcrypt cost. Hashes of any other cost are
+    reported by `needs_update`, so they are replaced on the next login.
+    """
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+
+# These run in the worker processes, so they take and return plain strings
+
+def _hash(secret: str, rounds: int) -> str:
+    return get_password_context(rounds).hash(secret)
+
+
+def _verify_and_update(secret: str, hashed: str, rounds: int) -> tuple[bool, Optional[str]]:
+    return get_password_context(rounds).verify_and_update(secret, hashed)
+
+
+class PasswordHasher:
+    def __init__(self, *, rounds: int, workers: int, max_pending: int):
+        self.rounds = rounds
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def _run(self, fn: Callable, *args: Any) -> Any:
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHashingBusy()
+        try:
+            return self._executor.submit(fn, *args, self.rounds).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, secret: str) -> str:
+        return self._run(_hash, secret)
+
+    def verify_and_update(self, secret: str, hashed: str) -> tuple[bool, Optional[str]]:
+        return self._run(_verify_and_update, secret, hashed)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown()
+
+
+@lru_cache()
+def get_password_hasher() -> PasswordHasher:
+    settings = Settings()
+    return PasswordHasher(
+        rounds=settings.PASSWORD_HASH_ROUNDS,
+        workers=settings.PASSWORD_HASH_WORKERS,
+        max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    )
 
 
 def verify_password(plain_password: SecretStr, hashed_password: SecretStr) -> bool:
@@ -9,10 +88,22 @@ def verify_password(plain_password: SecretStr, hashed_password: SecretStr) -> bo
     Verify a plain text password against a hash, based on the app's
     CryptoContext algorithm.
     """
-    return password_context.verify(
-        secret=plain_password.get_secret_value(),
-        hash=hashed_password.get_secret_value(),
+    verified, _ = verify_and_update_password(plain_password, hashed_password)
+    return verified
+
+
+def verify_and_update_password(
+    plain_password: SecretStr, hashed_password: SecretStr
+) -> tuple[bool, Optional[SecretStr]]:
+    """
+    Verify a plain text password against a hash. If it matches but the hash
+    was made with outdated settings, e.g. another bcrypt cost, also returns
+    a replacement hash, to be stored in place of the old one.
+    """
+    verified, new_hash = get_password_hasher().verify_and_update(
+        plain_password.get_secret_value(), hashed_password.get_secret_value()
     )
+    return verified, SecretStr(new_hash) if new_hash else None
 
 
 def get_password_hash(password: SecretStr | str) -> SecretStr:
@@ -26,4 +117,4 @@ def get_password_hash(password: SecretStr | str) -> SecretStr:
 
     if not isinstance(password, SecretStr):
         password = SecretStr(password)
-    return SecretStr(password_context.hash(password.get_secret_value()))
+    return SecretStr(get_password_hasher().hash(password.get_secret_value()))
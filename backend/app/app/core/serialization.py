@@ -0,0 +1,70 @@
+from functools import lru_cache
+from typing import Any, Optional, Sequence, Type
+
+import orjson
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+from app.core.config import Settings
+
+"""
+For a route with a response_model, FastAPI validates what the route returns
+into the model, walks the result again with jsonable_encoder to build plain
+dicts and lists, and only then encodes those with the json module. For a
+resource with thousands of cards, the second and third passes cost more than
+the query.
+
+With FAST_JSON_RESPONSES on, routes that return `model_response(...)` build
+their response model once and orjson encodes it straight to bytes, and every
+other route's plain content is encoded by orjson too.
+"""
+
+
+@lru_cache()
+def fast_json_enabled() -> bool:
+    return Settings().FAST_JSON_RESPONSES
+
+
+def _default(obj: Any) -> Any:
+    # orjson encodes dates, enums and the containers itself; a model is
+    # handed back shallowly, and orjson calls this again for nested ones
+    if isinstance(obj, BaseModel):
+        return dict(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default)
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def model_response(
+        model: Type[BaseModel],
+        content: Any,
+        *,
+        status_code: int = 200,
+        response: Optional[Response] = None,
+) -> Any:
+    """
+    Validate `content`, an ORM object or a list of them, into `model` once
+    and encode it directly. Keep `model` as the route's response_model, so
+    the schema is unchanged. With the fast path off, `content` is returned
+    as is, for FastAPI to serialize as usual. Headers set on the route's
+    injected `response` are carried over either way.
+    """
+    if not fast_json_enabled():
+        return content
+    if isinstance(content, Sequence):
+        data = [model.from_orm(c) for c in content]
+    else:
+        data = model.from_orm(content)
+    return Response(
+        dumps(data),
+        status_code=status_code,
+        headers=None if response is None else dict(response.headers),
+        media_type="application/json",
+    )
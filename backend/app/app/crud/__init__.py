@@ -2,10 +2,12 @@ from .crud_user import user
 from .crud_resource import resource
 from .crud_card import card
 from .crud_standard import standard
+from .crud_catalog import catalog
 from .crud_standard_resource import standard_resource
 from .crud_topic import topic
 from .crud_goal import goal
 from .crud_goal_resource import goal_resource
+from .crud_goal_progress import goal_progress
 from .crud_group import group
 from .crud_lap import lap
 from .crud_attempt import attempt
@@ -1,34 +1,241 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union, Sequence
+from typing import (
+    Any,
+    Dict,
+    Generic,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Type,
+    TypeVar,
+    Union,
+    Sequence,
+)
 
 from fastapi.encoders import jsonable_encoder
+from sqlalchemy import (
+    Integer,
+    and_,
+    bindparam,
+    cast,
+    func,
+    insert,
+    inspect,
+    literal,
+    or_,
+    tuple_,
+)
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import DOUBLE_PRECISION
+from sqlalchemy.orm.strategy_options import Load
+from sqlalchemy.sql.base import Executable
 from sqlmodel import Session, SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel.sql.expression import SelectOfScalar
+
+from app.models import SEARCH_CONFIG
+
+# PostgreSQL caps a single statement at 65535 bind parameters
+MAX_BIND_PARAMS = 65535
 
 ModelType = TypeVar("ModelType", bound=SQLModel)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=SQLModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=SQLModel)
 
+# (sort key value, id) of the last row on a page
+KeysetKey = tuple[Any, int]
+
+# (rank, id) of the last row on a page of search results
+RankedKey = tuple[float, int]
+
+# Read model -> loader options that fetch everything the read model serializes
+LoaderProfiles = dict[Type[SQLModel], Sequence[Load]]
+
+
+def link_statement(
+        link_model: Type[ModelType],
+        key_col: Any,
+        key_id: int,
+        other_col: Any,
+        other_ids: Iterable[int],
+) -> SelectOfScalar[ModelType]:
+    """
+    Insert the rows of the junction `link_model` linking `key_id` to each of
+    `other_ids`, skipping those that exist, and select the inserted rows.
+    The ids are bound as one array, so the statement is the same size for
+    any number of links, and inserted in order, so concurrent links can not
+    deadlock on each other.
+    """
+    ids = sorted(set(other_ids))
+    rows = select(
+        literal(key_id, Integer),
+        func.unnest(bindparam("other_ids", ids, type_=postgresql.ARRAY(Integer))),
+    )
+    stmt = (
+        postgresql.insert(link_model)
+        .from_select([key_col.key, other_col.key], rows)
+        .on_conflict_do_nothing()
+        .returning(*link_model.__table__.c)
+    )
+    return select(link_model).from_statement(stmt)
+
 
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
-    def __init__(self, model: Type[ModelType]):
+    def __init__(
+            self, model: Type[ModelType], profiles: Optional[LoaderProfiles] = None
+    ):
         """
         CRUD object with default methods to Create, Read, Update, Delete.
         **Parameters**
         * `model`: A SQLAlchemy model class
         * `schema`: A Pydantic model (schema) class
+        * `profiles`: Eager loader options for each read model, selected by
+          passing the read model as `load` to the read methods
         """
         self.model = model
+        self.profiles = profiles or {}
+
+    def loader_options(self, load: Optional[Type[SQLModel]]) -> Sequence[Load]:
+        if load is None:
+            return ()
+        try:
+            return self.profiles[load]
+        except KeyError:
+            raise ValueError(f"No loader profile for {load.__name__}")
 
-    def get(self, session: Session, _id: Any) -> Optional[ModelType]:
-        return session.get(self.model, _id)
+    def get(
+            self,
+            session: Session,
+            _id: Any,
+            *,
+            load: Optional[Type[SQLModel]] = None,
+    ) -> Optional[ModelType]:
+        """
+        Get an object by primary key. With `load`, the relationships that the
+        `load` read model serializes are fetched up front by its loader profile,
+        rather than lazily, one query per object, during serialization.
+        """
+        return session.get(self.model, _id, options=self.loader_options(load))
 
-    def get_mult_by_ids(self, session: Session, ids: Sequence[int]) -> list[ModelType]:
-        return session.exec(select(self.model).where(self.model.id.in_(ids))).all()
+    def get_mult_by_ids(
+            self,
+            session: Session,
+            ids: Sequence[int],
+            *,
+            load: Optional[Type[SQLModel]] = None,
+    ) -> list[ModelType]:
+        stmt = select(self.model).where(self.model.id.in_(ids))
+        return session.exec(stmt.options(*self.loader_options(load))).all()
 
     def get_multi(
-            self, session: Session, *, skip: int = 0, limit: int = 5000
+            self,
+            session: Session,
+            *,
+            skip: int = 0,
+            limit: int = 5000,
+            after: Optional[KeysetKey] = None,
+            sort_key: str = "id",
+            load: Optional[Type[SQLModel]] = None,
     ) -> List[ModelType]:
-        stmt = select(self.model).order_by(self.model.id).offset(skip).limit(limit)
-        return session.exec(stmt).all()
+        """
+        Read a page of objects ordered by `(sort_key, id)`. Passing `after`,
+        the `keyset_key` of the last object of the previous page, seeks past
+        it through the index instead of counting `skip` rows from the start.
+        """
+        stmt = self.keyset(select(self.model), after=after, sort_key=sort_key)
+        stmt = stmt.options(*self.loader_options(load))
+        return session.exec(stmt.offset(skip).limit(limit)).all()
+
+    def keyset(
+            self,
+            stmt: SelectOfScalar[ModelType],
+            *,
+            after: Optional[KeysetKey] = None,
+            sort_key: str = "id",
+    ) -> SelectOfScalar[ModelType]:
+        """Order `stmt` by `(sort_key, id)` and start it after the given key"""
+        id_col = self.model.id
+        if sort_key == "id":
+            if after is not None:
+                stmt = stmt.where(id_col > after[1])
+            return stmt.order_by(id_col)
+        sort_col = getattr(self.model, sort_key)
+        if after is not None:
+            stmt = stmt.where(tuple_(sort_col, id_col) > tuple_(*after))
+        return stmt.order_by(sort_col, id_col)
+
+    def stream_multi(
+            self,
+            session: Session,
+            *,
+            after: Optional[KeysetKey] = None,
+            sort_key: str = "id",
+            yield_per: int = 1000,
+            load: Optional[Type[SQLModel]] = None,
+    ) -> Iterator[ModelType]:
+        """Iterate every object after `after`, ordered by `(sort_key, id)`"""
+        stmt = self.keyset(select(self.model), after=after, sort_key=sort_key)
+        stmt = stmt.options(*self.loader_options(load))
+        return self.stream(session, stmt, yield_per=yield_per)
+
+    @staticmethod
+    def stream(
+            session: Session, stmt: SelectOfScalar[ModelType], *, yield_per: int = 1000
+    ) -> Iterator[ModelType]:
+        """
+        Iterate the results of `stmt` through a server-side cursor, holding at
+        most `yield_per` rows in memory at a time.
+        """
+        yield from session.exec(stmt.execution_options(yield_per=yield_per))
+
+    @staticmethod
+    def keyset_key(db_obj: ModelType, sort_key: str = "id") -> KeysetKey:
+        return getattr(db_obj, sort_key), db_obj.id
+
+    def search_rank(self, q: str):
+        """How well the `search` vector of each row matches the query `q`"""
+        query = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+        # as a double, which round trips through a cursor exactly, unlike
+        # the real that ts_rank returns
+        return cast(func.ts_rank(self.model.search, query), DOUBLE_PRECISION)
+
+    def ranked(
+            self,
+            stmt: SelectOfScalar[ModelType],
+            q: str,
+            *,
+            after: Optional[RankedKey] = None,
+    ) -> SelectOfScalar[ModelType]:
+        """
+        Keep the rows of `stmt` that match `q`, a web search style query
+        ("quoted phrase", or, -word), best ranked first, then by id. The match
+        is answered by the GIN index on the `search` column; only matching
+        rows are ranked.
+        """
+        query = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+        rank, id_col = self.search_rank(q), self.model.id
+        stmt = stmt.where(self.model.search.op("@@")(query))
+        if after is not None:
+            stmt = stmt.where(
+                or_(rank < after[0], and_(rank == after[0], id_col > after[1]))
+            )
+        return stmt.order_by(rank.desc(), id_col)
+
+    def get_multi_ranked(
+            self,
+            session: Session,
+            stmt: SelectOfScalar[ModelType],
+            q: str,
+            *,
+            skip: int = 0,
+            limit: int = 5000,
+            after: Optional[RankedKey] = None,
+            load: Optional[Type[SQLModel]] = None,
+    ) -> list[tuple[ModelType, float]]:
+        """A page of `ranked` search results, each with its rank"""
+        stmt = self.ranked(stmt, q, after=after).add_columns(self.search_rank(q))
+        stmt = stmt.options(*self.loader_options(load))
+        return session.execute(stmt.offset(skip).limit(limit)).all()
 
     def create(
             self,
@@ -43,15 +250,86 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         session.refresh(db_obj)
         return db_obj
 
-    def create_multi(self, session: Session, *, objs_in: list[CreateSchemaType]
-                     ) -> list[ModelType]:
+    def create_multi(
+            self,
+            session: Session,
+            *,
+            objs_in: list[CreateSchemaType],
+            bulk: bool = False
+    ) -> list[ModelType]:
+        """
+        Create many objects in a single commit.
+
+        By default, each object is added through the unit of work and
+        refreshed afterwards, costing one SELECT per row. With `bulk=True`,
+        rows are written with multi-row `INSERT ... RETURNING` statements and
+        the returned rows hydrate the ORM objects directly, so no per-row
+        refresh is issued.
+        """
         db_objs = [self.model.from_orm(obj_in) for obj_in in objs_in]
+        if bulk:
+            return self._bulk_insert(session, db_objs)
         session.add_all(db_objs)
         session.commit()
         for db_obj in db_objs:
             session.refresh(db_obj)
         return db_objs
 
+    def _bulk_insert(
+            self, session: Session, db_objs: list[ModelType]
+    ) -> list[ModelType]:
+        """
+        Insert `db_objs` with as few `INSERT ... RETURNING` statements as the
+        bind parameter limit allows, returning persistent ORM objects in
+        insertion order.
+        """
+        created = []
+        for stmt in self._bulk_insert_statements(db_objs):
+            created.extend(session.execute(stmt).scalars().all())
+
+        # A plain commit would expire the returned objects, and the next
+        # attribute access on each would cost the refresh we set out to avoid.
+        # Everything else in the session is expired as a commit normally would.
+        expire_on_commit = session.expire_on_commit
+        session.expire_on_commit = False
+        try:
+            session.commit()
+        finally:
+            session.expire_on_commit = expire_on_commit
+        if expire_on_commit:
+            created_ids = {id(o) for o in created}
+            for obj in list(session.identity_map.values()):
+                if id(obj) not in created_ids:
+                    session.expire(obj)
+        return created
+
+    def _bulk_insert_statements(self, db_objs: list[ModelType]) -> Iterator[Executable]:
+        """
+        ORM-enabled `INSERT ... RETURNING` statements covering `db_objs`, each
+        as large as the bind parameter limit allows.
+        """
+        if not db_objs:
+            return
+        table = self.model.__table__
+        # leave generated columns and unset autoincrement keys out, so the
+        # database assigns them
+        columns = [
+            c.name
+            for c in table.columns
+            if c.computed is None
+            and (
+                not c.primary_key
+                or c.autoincrement is False
+                or any(getattr(o, c.name) is not None for o in db_objs)
+            )
+        ]
+        returned = [c for c in table.columns if c.computed is None]
+        rows = [{name: getattr(o, name) for name in columns} for o in db_objs]
+        batch_size = max(1, MAX_BIND_PARAMS // len(columns))
+        for i in range(0, len(rows), batch_size):
+            stmt = insert(table).values(rows[i: i + batch_size]).returning(*returned)
+            yield select(self.model).from_statement(stmt)
+
     @staticmethod
     def update(
             session: Session,
@@ -78,6 +356,15 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         session.commit()
         return obj
 
+    @staticmethod
+    def touch(db_obj: ModelType) -> None:
+        """
+        Bump the version of `db_obj`, a `Versioned` row, at the next flush,
+        for a change that is part of its representation without being in its
+        row, e.g. a new card in a resource.
+        """
+        db_obj.version += 1
+
     @staticmethod
     def refresh(session: Session, db_obj: ModelType) -> ModelType:
         """Add, commit, and refresh object in Session"""
@@ -85,3 +372,79 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         session.commit()
         session.refresh(db_obj)
         return db_obj
+
+    # Async counterparts, for routes running on an AsyncSession. Relationships
+    # can not be lazy loaded there, so everything a route serializes must be
+    # fetched through `load`.
+
+    async def aget(
+            self,
+            session: AsyncSession,
+            _id: Any,
+            *,
+            load: Optional[Type[SQLModel]] = None,
+            populate_existing: bool = False,
+    ) -> Optional[ModelType]:
+        """
+        With `populate_existing`, an object already in the session is read
+        again, e.g. to fetch what `load` adds to one read without it.
+        """
+        return await session.get(
+            self.model,
+            _id,
+            options=self.loader_options(load),
+            populate_existing=populate_existing,
+        )
+
+    async def aget_mult_by_ids(
+            self,
+            session: AsyncSession,
+            ids: Sequence[int],
+            *,
+            load: Optional[Type[SQLModel]] = None,
+    ) -> list[ModelType]:
+        stmt = select(self.model).where(self.model.id.in_(ids))
+        return (await session.exec(stmt.options(*self.loader_options(load)))).all()
+
+    async def aget_multi(
+            self,
+            session: AsyncSession,
+            *,
+            skip: int = 0,
+            limit: int = 5000,
+            after: Optional[KeysetKey] = None,
+            sort_key: str = "id",
+            load: Optional[Type[SQLModel]] = None,
+    ) -> List[ModelType]:
+        stmt = self.keyset(select(self.model), after=after, sort_key=sort_key)
+        stmt = stmt.options(*self.loader_options(load))
+        return (await session.exec(stmt.offset(skip).limit(limit))).all()
+
+    async def acreate(
+            self,
+            session: AsyncSession,
+            *,
+            obj_in: CreateSchemaType,
+            extras: Optional[dict[str, Any]] = None,
+            load: Optional[Type[SQLModel]] = None,
+    ) -> ModelType:
+        """
+        Create an object, then read it back with the `load` profile in place
+        of a plain refresh.
+        """
+        db_obj = self.model.from_orm(obj_in, update=extras)
+        session.add(db_obj)
+        await session.commit()
+        return await session.get(
+            self.model,
+            inspect(db_obj).identity,
+            options=self.loader_options(load),
+            populate_existing=True,
+        )
+
+    async def acreate_multi(
+            self, session: AsyncSession, *, objs_in: list[CreateSchemaType]
+    ) -> list[ModelType]:
+        """Create many objects with multi-row `INSERT ... RETURNING`"""
+        db_objs = [self.model.from_orm(obj_in) for obj_in in objs_in]
+        return await session.run_sync(self._bulk_insert, db_objs)
@@ -1,9 +1,83 @@
+from collections import Counter
+from typing import Iterable
+
+from sqlalchemy.orm import joinedload
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
 from app.crud.base import CRUDBase
-from app.models import Attempt, AttemptCreateInternal, AttemptUpdate
+from app.crud.crud_goal_progress import goal_progress as crud_goal_progress
+from app.crud.crud_lap import lap as crud_lap
+from app.models import Attempt, AttemptCreateInternal, AttemptUpdate, AttemptReadWithLap
+
+
+def tally_by_lap(attempts: Iterable[AttemptCreateInternal]) -> list[tuple[int, int, int]]:
+    """(lap_id, attempted, correct) for each lap, in lap ID order"""
+    attempted, correct = Counter(), Counter()
+    for a in attempts:
+        attempted[a.lap_id] += 1
+        correct[a.lap_id] += bool(a.correct)
+    return [(i, attempted[i], correct[i]) for i in sorted(attempted)]
 
 
 class CRUDAttempt(CRUDBase[Attempt, AttemptCreateInternal, AttemptUpdate]):
-    ...
+    """
+    Every create also adds to the counters of its laps and their goals'
+    progress, before the commit that inserts the attempts, so all of it
+    lands in one transaction.
+    """
+
+    def create(
+            self, session: Session, *, obj_in: AttemptCreateInternal, **kwargs
+    ) -> Attempt:
+        self.count(session, [obj_in])
+        return super().create(session, obj_in=obj_in, **kwargs)
+
+    def create_multi(
+            self, session: Session, *, objs_in: list[AttemptCreateInternal], **kwargs
+    ) -> list[Attempt]:
+        self.count(session, objs_in)
+        return super().create_multi(session, objs_in=objs_in, **kwargs)
+
+    async def acreate(
+            self, session: AsyncSession, *, obj_in: AttemptCreateInternal, **kwargs
+    ) -> Attempt:
+        await session.run_sync(self.count, [obj_in])
+        return await super().acreate(session, obj_in=obj_in, **kwargs)
+
+    async def acreate_multi(
+            self, session: AsyncSession, *, objs_in: list[AttemptCreateInternal]
+    ) -> list[Attempt]:
+        await session.run_sync(self.count, objs_in)
+        return await super().acreate_multi(session, objs_in=objs_in)
+
+    @staticmethod
+    def count(session: Session, objs_in: list[AttemptCreateInternal]) -> None:
+        """
+        Add attempts about to be inserted to the lap counters, then to goal
+        progress. Rows are locked in ID order, laps before goals, so
+        concurrent submissions can not deadlock on each other.
+        """
+        goal_attempted, goal_correct = Counter(), Counter()
+        for lap_id, attempted, correct in tally_by_lap(objs_in):
+            counted = session.execute(
+                crud_lap.count_attempts(lap_id, attempted, correct)
+            ).first()
+            if counted is None:
+                continue
+            goal_attempted[counted.goal_id] += attempted
+            goal_correct[counted.goal_id] += correct
+        for goal_id in sorted(goal_attempted):
+            session.execute(
+                crud_goal_progress.count_trials(
+                    goal_id, goal_attempted[goal_id], goal_correct[goal_id]
+                )
+            )
 
 
-attempt = CRUDAttempt(Attempt)
+attempt = CRUDAttempt(
+    Attempt,
+    profiles={
+        AttemptReadWithLap: (joinedload(Attempt.card), joinedload(Attempt.lap)),
+    },
+)
@@ -1,9 +1,101 @@
-from app.crud.base import CRUDBase
-from app.models import Card, CardCreate, CardUpdate
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import joinedload
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel.sql.expression import SelectOfScalar
+
+from app.crud.base import CRUDBase, RankedKey
+from app.crud.crud_resource import visible_to
+from app.models import Card, CardCreate, CardUpdate, CardReadWithResource, Resource
+
+IMPORT_COLUMNS = ("question", "answer")
 
 
 class CRUDCard(CRUDBase[Card, CardCreate, CardUpdate]):
-    ...
+    def select_by_resource(self, resource_id: int) -> SelectOfScalar[Card]:
+        stmt = select(Card).where(Card.resource_id == resource_id)
+        return self.keyset(stmt)
+
+    def get_multi_by_search(
+            self,
+            session: Session,
+            user_id: int,
+            q: str,
+            *,
+            resource_id: Optional[int] = None,
+            skip: int = 0,
+            limit: int = 5000,
+            after: Optional[RankedKey] = None,
+    ) -> list[tuple[Card, float]]:
+        """
+        Cards matching `q`, best first, with their ranks, among the cards of
+        the user's own and of public resources, optionally of one resource
+        """
+        stmt = select(Card).join(Resource).where(visible_to(user_id))
+        if resource_id is not None:
+            stmt = stmt.where(Card.resource_id == resource_id)
+        return self.get_multi_ranked(
+            session,
+            stmt,
+            q,
+            skip=skip,
+            limit=limit,
+            after=after,
+            load=CardReadWithResource,
+        )
+
+    async def aimport(
+            self,
+            session: AsyncSession,
+            resource: Resource,
+            rows: AsyncIterator[tuple[str, str]],
+            *,
+            chunk_rows: int = 5000,
+    ) -> int:
+        """
+        Add the `(question, answer)` rows to the cards of `resource`, in one
+        transaction, holding at most `chunk_rows` of them in memory. Rows are
+        copied into a temporary staging table with COPY as they arrive, and
+        moved into the card table by one INSERT ... SELECT at the end, in
+        the order they came.
+        """
+        await session.execute(
+            text(
+                "CREATE TEMPORARY TABLE card_import "
+                "(n bigserial, question text NOT NULL, answer text NOT NULL) "
+                "ON COMMIT DROP"
+            )
+        )
+        # COPY through asyncpg itself, inside the transaction just begun
+        connection = await session.connection()
+        raw = (await connection.get_raw_connection()).driver_connection
+
+        async def copy(chunk: list[tuple[str, str]]) -> None:
+            await raw.copy_records_to_table(
+                "card_import", records=chunk, columns=IMPORT_COLUMNS
+            )
+
+        chunk = []
+        async for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_rows:
+                await copy(chunk)
+                chunk = []
+        if chunk:
+            await copy(chunk)
+
+        result = await session.execute(
+            text(
+                "INSERT INTO card (question, answer, resource_id) "
+                "SELECT question, answer, :resource_id FROM card_import ORDER BY n"
+            ),
+            {"resource_id": resource.id},
+        )
+        self.touch(resource)
+        await session.commit()
+        return result.rowcount
 
 
-card = CRUDCard(Card)
+card = CRUDCard(Card, profiles={CardReadWithResource: (joinedload(Card.resource),)})
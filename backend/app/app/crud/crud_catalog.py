@@ -0,0 +1,148 @@
+import threading
+from bisect import bisect_right
+from collections import defaultdict
+from typing import Iterable, Optional
+
+from sqlalchemy.orm import joinedload
+from sqlmodel import Session, select
+
+from app.crud.base import KeysetKey, CRUDBase
+from app.models import Standard, Subject
+
+"""
+Standards and their Topics are written once when the database is seeded, and
+afterwards only by superusers, yet most requests need one. The catalog keeps
+every Standard with its Topic resolved in process memory, so reads of them
+never reach the database.
+
+Cached Standards are detached from any session and shared between requests;
+treat them as read-only. To attach one to a session without a query, e.g. to
+link it to a Resource, use `session.merge(standard, load=False)`.
+
+Writes through `crud.standard` and `crud.topic` bump the catalog version, and
+the next read rebuilds the snapshot. Writes made by another process (another
+worker, or the seed script) are not seen until this process restarts or calls
+`catalog.invalidate()`.
+"""
+
+
+def _id_of(standard: Standard) -> int:
+    return standard.id
+
+
+class CatalogSnapshot:
+    """Every Standard at one catalog version, indexed by id, grade and subject"""
+
+    def __init__(self, version: int, standards: list[Standard]):
+        self.version = version
+        self.standards = sorted(standards, key=_id_of)
+        self.by_id = {s.id: s for s in self.standards}
+        self.by_grade: dict[int, list[Standard]] = defaultdict(list)
+        self.by_subject: dict[Subject, list[Standard]] = defaultdict(list)
+        for s in self.standards:
+            self.by_grade[s.grade].append(s)
+            self.by_subject[s.subject].append(s)
+
+
+class StandardCatalog:
+    def __init__(self):
+        self.version = 0
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        self.version += 1
+
+    def snapshot(self, session: Session) -> CatalogSnapshot:
+        """
+        The current snapshot, rebuilt first if the catalog changed since it
+        was taken. `session` only lends its connection settings; the load runs
+        in a session of its own, so the cached objects stay out of the
+        caller's identity map and are never expired by its commits.
+        """
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == self.version:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.version == self.version:
+                return snapshot
+            # a bump while loading leaves this snapshot stale, to be rebuilt
+            version = self.version
+            with Session(session.get_bind()) as load_session:
+                stmt = select(Standard).options(joinedload(Standard.topic))
+                standards = load_session.exec(stmt).all()
+            self._snapshot = CatalogSnapshot(version, standards)
+            return self._snapshot
+
+    def get(self, session: Session, _id: int) -> Optional[Standard]:
+        return self.snapshot(session).by_id.get(_id)
+
+    def get_mult_by_ids(self, session: Session, ids: Iterable[int]) -> list[Standard]:
+        by_id = self.snapshot(session).by_id
+        return [by_id[i] for i in sorted(set(ids)) if i in by_id]
+
+    def get_multi(
+            self,
+            session: Session,
+            *,
+            skip: int = 0,
+            limit: Optional[int] = 5000,
+            after: Optional[KeysetKey] = None,
+            grade: Optional[int] = None,
+            subject: Optional[Subject] = None,
+    ) -> list[Standard]:
+        """
+        Standards in id order, optionally filtered by grade and subject, with
+        the same skip/limit and id keyset semantics as `CRUDBase.get_multi`.
+        """
+        snapshot = self.snapshot(session)
+        if grade is not None:
+            standards = snapshot.by_grade.get(grade, [])
+            if subject is not None:
+                standards = [s for s in standards if s.subject == subject]
+        elif subject is not None:
+            standards = snapshot.by_subject.get(subject, [])
+        else:
+            standards = snapshot.standards
+        if after is not None:
+            standards = standards[bisect_right(standards, after[1], key=_id_of):]
+        stop = None if limit is None else skip + limit
+        return standards[skip:stop]
+
+
+catalog = StandardCatalog()
+
+
+class CatalogWriteMixin(CRUDBase):
+    """Bumps the catalog version after each committed write"""
+
+    def create(self, *args, **kwargs):
+        db_obj = super().create(*args, **kwargs)
+        catalog.invalidate()
+        return db_obj
+
+    def create_multi(self, *args, **kwargs):
+        db_objs = super().create_multi(*args, **kwargs)
+        catalog.invalidate()
+        return db_objs
+
+    def update(self, *args, **kwargs):
+        db_obj = super().update(*args, **kwargs)
+        catalog.invalidate()
+        return db_obj
+
+    def remove(self, *args, **kwargs):
+        db_obj = super().remove(*args, **kwargs)
+        catalog.invalidate()
+        return db_obj
+
+    async def acreate(self, *args, **kwargs):
+        db_obj = await super().acreate(*args, **kwargs)
+        catalog.invalidate()
+        return db_obj
+
+    async def acreate_multi(self, *args, **kwargs):
+        db_objs = await super().acreate_multi(*args, **kwargs)
+        catalog.invalidate()
+        return db_objs
@@ -1,9 +1,34 @@
+from sqlalchemy.orm import joinedload, selectinload
+
 from app.crud.base import CRUDBase
-from app.models import Goal, GoalCreate, GoalUpdate
+from app.crud.crud_standard import STANDARD_READ
+from app.models import (
+    Goal,
+    GoalCreate,
+    GoalUpdate,
+    GoalRead,
+    GoalReadWithResources,
+    Resource,
+)
 
 
 class CRUDGoal(CRUDBase[Goal, GoalCreate, GoalUpdate]):
     ...
 
 
-goal = CRUDGoal(Goal)
+GOAL_READ = (
+    joinedload(Goal.teacher),
+    joinedload(Goal.student),
+    joinedload(Goal.standard).options(*STANDARD_READ),
+)
+
+goal = CRUDGoal(
+    Goal,
+    profiles={
+        GoalRead: GOAL_READ,
+        GoalReadWithResources: (
+            *GOAL_READ,
+            selectinload(Goal.resources).selectinload(Resource.cards),
+        ),
+    },
+)
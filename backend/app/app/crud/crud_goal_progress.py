@@ -0,0 +1,108 @@
+from typing import Any, Optional, Sequence
+
+from sqlalchemy import and_, func, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.sql.expression import Insert
+from sqlmodel import Session, select
+
+from app.crud.base import CRUDBase
+from app.models import Attempt, Goal, GoalProgress, GoalProgressRead, Lap
+
+
+def _progress(n_trials: Any, n_correct: Any, target_trials: Any, target_accuracy: Any):
+    """
+    Column values for a goal's progress from its trial counts and targets.
+    A goal without an accuracy or n_trials target has no requirement for it.
+    """
+    accuracy = 100.0 * n_correct / func.nullif(n_trials, 0)
+    met = and_(
+        n_trials >= func.coalesce(target_trials, 0),
+        accuracy >= func.coalesce(target_accuracy, 0),
+    )
+    return dict(
+        n_trials=n_trials,
+        n_correct=n_correct,
+        accuracy=accuracy,
+        met=func.coalesce(met, False),
+        updated_at=func.now(),
+    )
+
+
+class CRUDGoalProgress(CRUDBase[GoalProgress, GoalProgress, GoalProgress]):
+    @staticmethod
+    def count_trials(goal_id: int, attempted: int, correct: int) -> Insert:
+        """
+        Add attempts to a goal's progress, creating its row with the first of
+        them. Like `crud.lap.count_attempts`, run it in the transaction that
+        inserts the attempts.
+        """
+        target = select(Goal).where(Goal.id == goal_id)
+        target_trials = target.with_only_columns(Goal.n_trials).scalar_subquery()
+        target_accuracy = target.with_only_columns(Goal.accuracy).scalar_subquery()
+        first = _progress(attempted, correct, target_trials, target_accuracy)
+        added = _progress(
+            GoalProgress.n_trials + attempted,
+            GoalProgress.n_correct + correct,
+            target_trials,
+            target_accuracy,
+        )
+        return (
+            insert(GoalProgress)
+            .values(goal_id=goal_id, **first)
+            .on_conflict_do_update(index_elements=[GoalProgress.goal_id], set_=added)
+        )
+
+    @staticmethod
+    def get_for_goal(
+            session: Session, goal_id: int
+    ) -> Optional[tuple[int, int, GoalProgressRead]]:
+        """
+        A goal's teacher_id and student_id along with its progress, in one
+        query. A goal without attempts yet has empty progress.
+        """
+        stmt = (
+            select(Goal.teacher_id, Goal.student_id, GoalProgress)
+            .outerjoin(GoalProgress, GoalProgress.goal_id == Goal.id)
+            .where(Goal.id == goal_id)
+        )
+        row = session.exec(stmt).first()
+        if row is None:
+            return None
+        teacher_id, student_id, progress = row
+        return teacher_id, student_id, progress or GoalProgressRead(goal_id=goal_id)
+
+    @staticmethod
+    def reconcile(
+            session: Session, goal_ids: Optional[Sequence[int]] = None
+    ) -> list[int]:
+        """
+        Recompute progress from the attempts themselves, for every goal with
+        laps or just `goal_ids`, fixing rows that drifted or are missing.
+        Returns the IDs of the goals that were corrected.
+        """
+        n_trials = func.count(Attempt.id)
+        n_correct = func.count(Attempt.id).filter(Attempt.correct)
+        values = _progress(n_trials, n_correct, Goal.n_trials, Goal.accuracy)
+        tally = (
+            select(Goal.id, *values.values())
+            .join(Lap, Lap.goal_id == Goal.id)
+            .outerjoin(Attempt, Attempt.lap_id == Lap.id)
+            .group_by(Goal.id)
+        )
+        if goal_ids is not None:
+            tally = tally.where(Goal.id.in_(goal_ids))
+        stmt = insert(GoalProgress).from_select(["goal_id", *values], tally)
+        columns = ["n_trials", "n_correct", "met"]
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[GoalProgress.goal_id],
+            set_={name: stmt.excluded[name] for name in values},
+            where=tuple_(*(GoalProgress.__table__.c[c] for c in columns)).is_distinct_from(
+                tuple_(*(stmt.excluded[c] for c in columns))
+            ),
+        ).returning(GoalProgress.goal_id)
+        corrected = session.execute(stmt).scalars().all()
+        session.commit()
+        return sorted(corrected)
+
+
+goal_progress = CRUDGoalProgress(GoalProgress)
@@ -1,8 +1,8 @@
-from typing import Optional
+from typing import Iterable, Optional
 
 from sqlmodel import Session, select
 
-from app.crud.base import CRUDBase
+from app.crud.base import CRUDBase, link_statement
 from app.models import GoalResource, GoalResourceCreate, GoalResourceUpdate
 
 
@@ -18,5 +18,23 @@ class CRUDGoalResource(CRUDBase[GoalResource, GoalResourceCreate, GoalResourceUp
         )
         return session.exec(statement).first()
 
+    @staticmethod
+    def link(
+        session: Session, goal_id: int, resource_ids: Iterable[int]
+    ) -> list[GoalResource]:
+        """
+        Link resources to a goal, skipping links that already exist, and
+        return only the new links. Does not commit, so the goal's version
+        can be bumped in the same transaction.
+        """
+        stmt = link_statement(
+            GoalResource,
+            GoalResource.goal_id,
+            goal_id,
+            GoalResource.resource_id,
+            resource_ids,
+        )
+        return session.exec(stmt).all()
+
 
 goal_resource = CRUDGoalResource(GoalResource)
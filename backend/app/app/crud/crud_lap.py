@@ -1,9 +1,101 @@
+from typing import Optional, Sequence
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.sql.expression import Update
+from sqlmodel import Session, select
+
 from app.crud.base import CRUDBase
-from app.models import Lap, LapCreate, LapUpdate
+from app.crud.crud_goal import GOAL_READ
+from app.models import (
+    Attempt,
+    Lap,
+    LapCreate,
+    LapUpdate,
+    LapRead,
+    LapReadWithAttempts,
+    Resource,
+)
 
 
 class CRUDLap(CRUDBase[Lap, LapCreate, LapUpdate]):
-    ...
+    @staticmethod
+    def count_attempts(lap_id: int, attempted: int, correct: int) -> Update:
+        """
+        Add to a lap's attempt counters and recompute its score, the percent
+        correct, returning the lap's goal_id and the new values. Run it in the transaction that
+        inserts the attempts; it also locks the lap row until the commit, so
+        concurrent submissions to one lap are counted one after another.
+        """
+        n_attempted = Lap.n_attempted + attempted
+        n_correct = Lap.n_correct + correct
+        return (
+            update(Lap)
+            .where(Lap.id == lap_id)
+            .values(
+                n_attempted=n_attempted,
+                n_correct=n_correct,
+                score=100.0 * n_correct / n_attempted,
+            )
+            .returning(Lap.goal_id, Lap.n_attempted, Lap.n_correct, Lap.score)
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def reconcile_counters(
+            session: Session, lap_ids: Optional[Sequence[int]] = None
+    ) -> list[int]:
+        """
+        Recompute counters and score from the attempts themselves, for every
+        lap or just `lap_ids`, fixing any that drifted. Returns the IDs of the
+        laps that were corrected.
+        """
+        tally = (
+            select(
+                Lap.id.label("lap_id"),
+                func.count(Attempt.id).label("n_attempted"),
+                func.count(Attempt.id).filter(Attempt.correct).label("n_correct"),
+            )
+            .outerjoin(Attempt, Attempt.lap_id == Lap.id)
+            .group_by(Lap.id)
+        )
+        if lap_ids is not None:
+            tally = tally.where(Lap.id.in_(lap_ids))
+        tally = tally.subquery()
+        score = 100.0 * tally.c.n_correct / func.nullif(tally.c.n_attempted, 0)
+        stmt = (
+            update(Lap)
+            .where(Lap.id == tally.c.lap_id)
+            .where(
+                (Lap.n_attempted != tally.c.n_attempted)
+                | (Lap.n_correct != tally.c.n_correct)
+                | Lap.score.is_distinct_from(score)
+            )
+            .values(
+                n_attempted=tally.c.n_attempted,
+                n_correct=tally.c.n_correct,
+                score=score,
+            )
+            .returning(Lap.id)
+            .execution_options(synchronize_session=False)
+        )
+        corrected = session.execute(stmt).scalars().all()
+        session.commit()
+        return corrected
+
 
+LAP_READ = (
+    joinedload(Lap.goal).options(*GOAL_READ),
+    joinedload(Lap.resource).selectinload(Resource.cards),
+)
 
-lap = CRUDLap(Lap)
+lap = CRUDLap(
+    Lap,
+    profiles={
+        LapRead: LAP_READ,
+        LapReadWithAttempts: (
+            *LAP_READ,
+            selectinload(Lap.attempts).joinedload(Attempt.card),
+        ),
+    },
+)
@@ -1,46 +1,137 @@
+from typing import Optional
+
+from sqlalchemy.orm import joinedload, selectinload
 from sqlmodel import Session, select, or_, and_, not_
 from sqlmodel.sql.expression import SelectOfScalar
 
-from app.crud.base import CRUDBase
+from app.crud.base import CRUDBase, KeysetKey, RankedKey
+from app.crud.crud_standard import STANDARD_READ
 from app.models import (
     Resource,
     ResourceCreateInternal,
     ResourceUpdate,
     StandardResource,
+    ResourceReadWithCards,
+    ResourceReadWithCreator,
+    ResourceReadWithStandards,
 )
 
 SelectOfScalar.inherit_cache = True
 
 
+def visible_to(user_id: int, include_public: bool = True):
+    """Resources created by the user, and public ones if `include_public`"""
+    return or_(
+        Resource.creator_id == user_id, and_(include_public, not_(Resource.private))
+    )
+
+
 class CRUDResource(CRUDBase[Resource, ResourceCreateInternal, ResourceUpdate]):
-    @staticmethod
+    def get_multi_by_creator(
+        self,
+        session: Session,
+        user_id: int,
+        skip: int = 0,
+        limit: int = 5000,
+        after: Optional[KeysetKey] = None,
+    ) -> list[Resource]:
+        stmt = self.select_by_creator(user_id, after=after)
+        return session.exec(stmt.offset(skip).limit(limit)).all()
+
     def get_multi_by_standard(
+        self,
         session: Session,
         user_id: int,
         standard_id: int,
         include_public: bool = False,
         skip: int = 0,
         limit: int = 5000,
+        after: Optional[KeysetKey] = None,
     ) -> list[Resource]:
         """
         Always include where creator is user.
         Only include non-private if include_public is True
         """
+        stmt = self.select_by_standard(
+            user_id, standard_id, include_public=include_public, after=after
+        )
+        return session.exec(stmt.offset(skip).limit(limit)).all()
+
+    def select_by_creator(
+        self, user_id: int, after: Optional[KeysetKey] = None
+    ) -> SelectOfScalar[Resource]:
+        stmt = select(Resource).where(Resource.creator_id == user_id)
+        return self.keyset(stmt, after=after)
+
+    def select_by_standard(
+        self,
+        user_id: int,
+        standard_id: int,
+        include_public: bool = False,
+        after: Optional[KeysetKey] = None,
+    ) -> SelectOfScalar[Resource]:
         stmt = (
             select(Resource)
             .join(StandardResource)
             .where(StandardResource.standard_id == standard_id)
-            .where(
-                or_(
-                    Resource.creator_id == user_id,
-                    and_(include_public, not_(Resource.private)),
-                )
-            )
-            .order_by(Resource.id)
-            .offset(skip)
-            .limit(limit)
+            .where(visible_to(user_id, include_public))
         )
-        return session.exec(stmt).all()
+        if after is not None:
+            # the same bound on the link, so its index is entered at the
+            # cursor rather than scanned from the standard's first link
+            stmt = stmt.where(StandardResource.resource_id > after[1])
+        return self.keyset(stmt, after=after)
 
+    def get_multi_by_search(
+        self,
+        session: Session,
+        user_id: int,
+        q: str,
+        standard_id: Optional[int] = None,
+        include_public: bool = False,
+        skip: int = 0,
+        limit: int = 5000,
+        after: Optional[RankedKey] = None,
+    ) -> list[tuple[Resource, float]]:
+        stmt = self._select_searchable(user_id, standard_id, include_public)
+        return self.get_multi_ranked(
+            session, stmt, q, skip=skip, limit=limit, after=after
+        )
 
-resource = CRUDResource(Resource)
+    def select_by_search(
+        self,
+        user_id: int,
+        q: str,
+        standard_id: Optional[int] = None,
+        include_public: bool = False,
+        after: Optional[RankedKey] = None,
+    ) -> SelectOfScalar[Resource]:
+        """
+        Resources matching `q`, best first, among those of the user and, if
+        `include_public`, public ones, optionally only those of a standard
+        """
+        stmt = self._select_searchable(user_id, standard_id, include_public)
+        return self.ranked(stmt, q, after=after)
+
+    @staticmethod
+    def _select_searchable(
+        user_id: int, standard_id: Optional[int], include_public: bool
+    ) -> SelectOfScalar[Resource]:
+        stmt = select(Resource).where(visible_to(user_id, include_public))
+        if standard_id is not None:
+            stmt = stmt.join(StandardResource).where(
+                StandardResource.standard_id == standard_id
+            )
+        return stmt
+
+
+resource = CRUDResource(
+    Resource,
+    profiles={
+        ResourceReadWithCards: (selectinload(Resource.cards),),
+        ResourceReadWithCreator: (joinedload(Resource.creator),),
+        ResourceReadWithStandards: (
+            selectinload(Resource.standards).options(*STANDARD_READ),
+        ),
+    },
+)
@@ -1,9 +1,16 @@
+from sqlalchemy.orm import joinedload
+
 from app.crud.base import CRUDBase
-from app.models import Standard, StandardCreate, StandardUpdate
+from app.crud.crud_catalog import CatalogWriteMixin
+from app.models import Standard, StandardCreate, StandardUpdate, StandardRead
 
 
-class CRUDStandard(CRUDBase[Standard, StandardCreate, StandardUpdate]):
+class CRUDStandard(
+    CatalogWriteMixin, CRUDBase[Standard, StandardCreate, StandardUpdate]
+):
     ...
 
 
-standard = CRUDStandard(Standard)
+STANDARD_READ = (joinedload(Standard.topic),)
+
+standard = CRUDStandard(Standard, profiles={StandardRead: STANDARD_READ})
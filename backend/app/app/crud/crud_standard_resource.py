@@ -1,17 +1,30 @@
-from app.crud.base import CRUDBase
-from app.models import StandardResource, StandardResourceCreate, StandardResourceUpdate
+from typing import Iterable
+
+from sqlmodel import Session
 
-"""
-There's really no reason for this class. It's used in tests,
-but the endpoints themselves use the implicit relationship "magic" of 
-sqlmodel/sqlalchemy. It's just easier that way.
-"""
+from app.crud.base import CRUDBase, link_statement
+from app.models import StandardResource, StandardResourceCreate, StandardResourceUpdate
 
 
 class CRUDStandardResource(
     CRUDBase[StandardResource, StandardResourceCreate, StandardResourceUpdate]
 ):
-    ...
+    @staticmethod
+    def link(
+        session: Session, resource_id: int, standard_ids: Iterable[int]
+    ) -> list[StandardResource]:
+        """
+        Link standards to a resource, skipping links that already exist, and
+        return only the new links. Does not commit.
+        """
+        stmt = link_statement(
+            StandardResource,
+            StandardResource.resource_id,
+            resource_id,
+            StandardResource.standard_id,
+            standard_ids,
+        )
+        return session.exec(stmt).all()
 
 
 standard_resource = CRUDStandardResource(StandardResource)
@@ -1,8 +1,9 @@
 from app.crud.base import CRUDBase
+from app.crud.crud_catalog import CatalogWriteMixin
 from app.models import Topic
 
 
-class CRUDTopic(CRUDBase[Topic, Topic, Topic]):
+class CRUDTopic(CatalogWriteMixin, CRUDBase[Topic, Topic, Topic]):
     ...
 
 
@@ -1,13 +1,15 @@
 import logging
-from typing import Iterable
+from typing import Any, Iterable
 
 from sqlalchemy import Table
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlmodel import SQLModel, create_engine
 
 # from app.deps import get_settings
 
 from app.core.config import Settings
+from app.core.pool import InstrumentedAsyncQueuePool, InstrumentedQueuePool
 
 settings = Settings()
 logging.basicConfig(level=logging.INFO)
@@ -30,7 +32,29 @@ logger = logging.getLogger(__name__)
 #     engine = create_engine(url=uri, echo=False)
 #     return engine
 
-engine = create_engine(url=settings.SQLALCHEMY_DATABASE_URI, echo=False)
+
+def pool_options(settings: Settings) -> dict[str, Any]:
+    return dict(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+
+
+engine = create_engine(
+    url=settings.SQLALCHEMY_DATABASE_URI,
+    echo=False,
+    poolclass=InstrumentedQueuePool,
+    **pool_options(settings),
+)
+async_engine = create_async_engine(
+    url=settings.SQLALCHEMY_ASYNC_DATABASE_URI,
+    echo=False,
+    poolclass=InstrumentedAsyncQueuePool,
+    **pool_options(settings),
+)
 
 
 def get_local_session():
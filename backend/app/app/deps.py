@@ -1,14 +1,20 @@
 from functools import lru_cache
-from typing import Generator, Optional
+from typing import AsyncGenerator, Callable, Generator, Optional
 
 from fastapi import Depends, HTTPException, status, Query
 from jose import jwt, JWTError
 from pydantic import BaseModel
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.instrumentation import manager_of_class
+from sqlalchemy.orm.util import identity_key
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from .core.auth import oauth2_scheme
 from .core.config import Settings
-from .database import engine
+from .database import engine, async_engine
 from .models import User, Role
 
 
@@ -24,12 +30,17 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     username: Optional[str] = None
+    # set only for role claims stamped with the current ROLE_CLAIMS_VERSION
+    role_claims: bool = False
+    role: Optional[Role] = None
+    is_superuser: bool = False
 
 
 class BatchQueryParams(BaseModel):
     q: Optional[str] = Query(default="")
-    skip: Optional[int] = Query(default=0)
-    limit: Optional[int] = Query(default=5000)
+    skip: Optional[int] = Query(default=0, ge=0)
+    limit: Optional[int] = Query(default=5000, ge=1, le=5000)
+    cursor: Optional[str] = Query(default=None)  # X-Next-Cursor of previous page
 
 
 def get_session() -> Generator:
@@ -37,11 +48,17 @@ def get_session() -> Generator:
         yield session
 
 
-async def get_current_user(
-    session: Session = Depends(get_session),
-    token: str = Depends(oauth2_scheme),
-    settings: Settings = Depends(get_settings),
-) -> User:
+async def get_async_session() -> AsyncGenerator:
+    """
+    Session for `async def` routes. Lazy loading is not possible on an
+    AsyncSession, so reads must fetch what they serialize through a CRUD
+    loader profile, and objects are not expired on commit.
+    """
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+
+def decode_token(token: str, settings: Settings) -> TokenData:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -58,9 +75,70 @@ async def get_current_user(
         if username is None:
             raise credentials_exception
         token_data = TokenData(username=username)
+        version = settings.ROLE_CLAIMS_VERSION
+        if version is not None and payload.get("ver") == version and username.isdigit():
+            token_data.role_claims = True
+            token_data.role = payload.get("role")
+            token_data.is_superuser = payload.get("is_superuser", False)
     except JWTError:
         raise credentials_exception
+    return token_data
+
+
+def user_from_claims(session: Session | AsyncSession, token_data: TokenData) -> User:
+    """
+    A persistent User holding only what the token claims. Its other columns
+    are selected on first access, so routes that only use `id`, `role` and
+    `is_superuser` never read the users table. An AsyncSession can not load
+    lazily, so async routes must stick to those three.
+    """
+    _id = int(token_data.username)
+    user = session.identity_map.get(identity_key(User, _id))
+    if user is not None:
+        return user
+    user = manager_of_class(User).new_instance()
+    set_committed_value(user, "id", _id)
+    set_committed_value(user, "role", token_data.role)
+    set_committed_value(user, "is_superuser", token_data.is_superuser)
+    make_transient_to_detached(user)
+    session.add(user)
+    return user
+
+
+def is_from_claims(user: User) -> bool:
+    return "email" in inspect(user).unloaded
 
+
+def load_claimed_user(session: Session, user: User) -> None:
+    """
+    Select the row behind a User built from token claims, e.g. before its
+    fields are copied with `.dict()`, which does not trigger lazy loads.
+    """
+    if is_from_claims(user):
+        session.refresh(user)
+
+
+def user_passes(session: Session, user: User, check: Callable[[User], bool]) -> bool:
+    """
+    Apply `check` to the user. Claims may predate a role change, so a User
+    built from them that fails is checked again against its row.
+    """
+    if check(user):
+        return True
+    if not is_from_claims(user):
+        return False
+    session.refresh(user)
+    return check(user)
+
+
+async def get_current_user(
+    session: Session = Depends(get_session),
+    token: str = Depends(oauth2_scheme),
+    settings: Settings = Depends(get_settings),
+) -> User:
+    token_data = decode_token(token, settings)
+    if token_data.role_claims:
+        return user_from_claims(session, token_data)
     user = session.get(User, token_data.username)
     if user is None:
         # raise credentials_exception
@@ -70,19 +148,53 @@ async def get_current_user(
 
 def get_current_active_superuser(
     current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
 ) -> User:
-    if not current_user.is_superuser:
+    if not user_passes(session, current_user, lambda u: u.is_superuser):
         raise HTTPException(400, "The user doesn't have enough privileges")
     return current_user
 
 
-def get_current_teacher(current_user: User = Depends(get_current_user)) -> User:
-    if not current_user.role == Role.teacher:
+def get_current_teacher(
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+) -> User:
+    if not user_passes(session, current_user, lambda u: u.role == Role.teacher):
         raise HTTPException(400, "The user is not a teacher")
     return current_user
 
 
-def get_current_student(current_user: User = Depends(get_current_user)) -> User:
+def get_current_student(
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+) -> User:
+    if not user_passes(session, current_user, lambda u: u.role == Role.student):
+        raise HTTPException(400, "The user is not a student")
+    return current_user
+
+
+async def get_current_user_async(
+    session: AsyncSession = Depends(get_async_session),
+    token: str = Depends(oauth2_scheme),
+    settings: Settings = Depends(get_settings),
+) -> User:
+    token_data = decode_token(token, settings)
+    if token_data.role_claims:
+        return user_from_claims(session, token_data)
+    user = None
+    if token_data.username.isdigit():
+        user = await session.get(User, int(token_data.username))
+    if user is None:
+        raise HTTPException(401, "No user with that name")
+    return user
+
+
+async def get_current_student_async(
+    current_user: User = Depends(get_current_user_async),
+    session: AsyncSession = Depends(get_async_session),
+) -> User:
+    if current_user.role != Role.student and is_from_claims(current_user):
+        await session.refresh(current_user)
     if not current_user.role == Role.student:
         raise HTTPException(400, "The user is not a student")
     return current_user
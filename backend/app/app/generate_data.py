@@ -0,0 +1,369 @@
+"""
+Fills the database with a synthetic school at production scale, for capacity
+testing. Rows are streamed with COPY, so millions of them take minutes:
+
+    python -m app.generate_data --students 1000000
+
+Teachers each get a class of students and a shelf of resources; students get
+goals on some of their teacher's resources, and laps of attempts towards
+them. Class sizes, shelf and deck sizes, and laps per goal are drawn from
+skewed distributions, and each student answers correctly at a rate of their
+own. Lap counters and goal progress are written consistent with the
+attempts, as crud.attempt would keep them. Every generated user has the
+password PASSWORD.
+
+Standards must already exist, e.g. from `python -m app.initial_data`.
+
+Ids are taken from each table's sequence up front, so nothing else should
+write to the database while this runs. With a driver that can not COPY, or
+`--method insert`, rows are written with executemany instead.
+"""
+import argparse
+import io
+import logging
+import math
+import random
+import time
+from datetime import date, datetime, timedelta
+from typing import Any
+
+from sqlalchemy import column, func, select, table, text
+from sqlalchemy.engine import Connection
+
+from app.core.security import get_password_hash
+from app.database import engine
+from app.models import (
+    Attempt,
+    Card,
+    Goal,
+    GoalProgress,
+    GoalResource,
+    Group,
+    Lap,
+    Resource,
+    ResourceFormat,
+    Role,
+    Standard,
+    StandardResource,
+    User,
+    UserGroup,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("app.generate_data")
+
+PASSWORD = "generated1"
+
+# Columns written per table, in the order rows are generated
+COLUMNS = {
+    User: ("id", "email", "hashed_password", "role", "is_active", "is_superuser"),
+    Group: ("id", "label"),
+    UserGroup: ("user_id", "group_id"),
+    Resource: ("id", "name", "private", "format", "creator_id"),
+    Card: ("id", "question", "answer", "resource_id"),
+    StandardResource: ("standard_id", "resource_id"),
+    Goal: (
+        "id", "start_date", "end_date", "accuracy", "n_trials",
+        "teacher_id", "student_id", "standard_id",
+    ),
+    GoalResource: ("goal_id", "resource_id"),
+    Lap: (
+        "id", "start_ts", "end_ts", "score", "goal_id", "resource_id",
+        "n_attempted", "n_correct",
+    ),
+    Attempt: ("id", "submission", "lap_id", "card_id", "correct"),
+    GoalProgress: (
+        "goal_id", "n_trials", "n_correct", "accuracy", "met", "updated_at",
+    ),
+}
+
+
+def _copy_text(value: Any) -> str:
+    """A value in COPY's text format"""
+    if value is None:
+        return "\\N"
+    if value is True:
+        return "t"
+    if value is False:
+        return "f"
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, str):
+        return (
+            value.replace("\\", "\\\\")
+            .replace("\t", "\\t")
+            .replace("\n", "\\n")
+            .replace("\r", "\\r")
+        )
+    return str(value)
+
+
+class Writer:
+    """Buffers generated rows per table and writes them all at once"""
+
+    def __init__(self, connection: Connection, method: str):
+        self.connection = connection
+        self.method = method
+        self.rows: dict[Any, list[tuple]] = {model: [] for model in COLUMNS}
+        self.written: dict[str, int] = {model.__tablename__: 0 for model in COLUMNS}
+
+    def __len__(self) -> int:
+        return sum(map(len, self.rows.values()))
+
+    def flush(self) -> None:
+        # COLUMNS is in foreign key order
+        for model, rows in self.rows.items():
+            if rows:
+                write = self.copy if self.method == "copy" else self.insert
+                write(model.__tablename__, COLUMNS[model], rows)
+                self.written[model.__tablename__] += len(rows)
+                rows.clear()
+
+    def copy(self, table_name: str, columns: tuple[str, ...], rows: list[tuple]):
+        buffer = io.StringIO()
+        buffer.writelines(
+            "\t".join([_copy_text(v) for v in row]) + "\n" for row in rows
+        )
+        buffer.seek(0)
+        quote = engine.dialect.identifier_preparer.quote
+        stmt = f"COPY {quote(table_name)} ({', '.join(columns)}) FROM STDIN"
+        with self.connection.connection.cursor() as cursor:
+            cursor.copy_expert(stmt, buffer)
+
+    def insert(self, table_name: str, columns: tuple[str, ...], rows: list[tuple]):
+        # an untyped table, so values go to the driver as they are
+        target = table(table_name, *map(column, columns))
+        self.connection.execute(
+            target.insert(), [dict(zip(columns, row)) for row in rows]
+        )
+
+
+class Ids:
+    """
+    Ids handed out from a table's own sequence, which is advanced past them
+    with `sync`, so rows added later by the app do not collide.
+    """
+
+    def __init__(self, connection: Connection, model: Any):
+        quote = engine.dialect.identifier_preparer.quote
+        self.sequence = connection.execute(
+            select(func.pg_get_serial_sequence(quote(model.__tablename__), "id"))
+        ).scalar_one()
+        self.next = connection.execute(
+            select(func.nextval(self.sequence))
+        ).scalar_one()
+
+    def take(self) -> int:
+        self.next += 1
+        return self.next - 1
+
+    def sync(self, connection: Connection) -> None:
+        # not yet called: the next nextval() returns self.next itself
+        connection.execute(select(func.setval(self.sequence, self.next, False)))
+
+
+def _lognormal(
+        rng: random.Random, median: float, sigma: float, lo: int, hi: int
+) -> int:
+    """A skewed count: most near `median`, a long tail above it"""
+    return min(hi, max(lo, round(rng.lognormvariate(math.log(median), sigma))))
+
+
+class Generator:
+    def __init__(
+            self, connection: Connection, args, rng: random.Random, password_hash: str
+    ):
+        self.args = args
+        self.rng = rng
+        self.password_hash = password_hash
+        self.writer = Writer(connection, args.method)
+        self.ids = {
+            model: Ids(connection, model)
+            for model in (User, Group, Resource, Card, Goal, Lap, Attempt)
+        }
+        self.standards = connection.execute(select(Standard.id)).scalars().all()
+        self.now = datetime.utcnow()
+        self.today = self.now.date()
+
+    def add(self, model: Any, *row: Any) -> None:
+        self.writer.rows[model].append(row)
+
+    def user(self, role: Role) -> int:
+        user_id = self.ids[User].take()
+        email = f"{role.value}{user_id}@generated.example.com"
+        self.add(User, user_id, email, self.password_hash, role.value, True, False)
+        return user_id
+
+    def teacher(self, n_students: int) -> None:
+        """A teacher and their class, resources, goals, laps and attempts"""
+        rng, args = self.rng, self.args
+        teacher_id = self.user(Role.teacher)
+        group_id = self.ids[Group].take()
+        self.add(Group, group_id, f"Class of teacher {teacher_id}")
+        self.add(UserGroup, teacher_id, group_id)
+
+        decks = []  # (resource_id, [(card_id, answer)])
+        for _ in range(_lognormal(rng, args.resources, 0.7, 1, 200)):
+            resource_id = self.ids[Resource].take()
+            pdf = rng.random() < 0.1
+            self.add(
+                Resource,
+                resource_id,
+                f"Resource {resource_id}",
+                rng.random() < 0.7,
+                (ResourceFormat.pdf if pdf else ResourceFormat.flashcard).value,
+                teacher_id,
+            )
+            n_standards = min(rng.randint(1, 3), len(self.standards))
+            for standard_id in rng.sample(self.standards, n_standards):
+                self.add(StandardResource, standard_id, resource_id)
+            if pdf:
+                continue
+            cards = []
+            for _ in range(_lognormal(rng, args.cards, 0.8, 1, 1000)):
+                card_id = self.ids[Card].take()
+                answer = f"answer {card_id}"
+                self.add(Card, card_id, f"question {card_id}", answer, resource_id)
+                cards.append((card_id, answer))
+            decks.append((resource_id, cards))
+
+        for _ in range(n_students):
+            student_id = self.user(Role.student)
+            self.add(UserGroup, student_id, group_id)
+            skill = rng.betavariate(6, 2)
+            n_goals = rng.choices((1, 2, 3, 4, 5), (40, 30, 15, 10, 5))[0]
+            for _ in range(n_goals if decks else 0):
+                self.goal(teacher_id, student_id, decks, skill)
+
+    def goal(self, teacher_id: int, student_id: int, decks: list, skill: float) -> None:
+        rng = self.rng
+        goal_id = self.ids[Goal].take()
+        start = self.today - timedelta(days=rng.randint(0, 180))
+        target_accuracy = rng.choice((None, 70.0, 80.0, 90.0))
+        target_trials = rng.choice((None, 10, 20, 50, 100))
+        self.add(
+            Goal,
+            goal_id,
+            start,
+            start + timedelta(days=rng.randint(30, 270)),
+            target_accuracy,
+            target_trials,
+            teacher_id,
+            student_id,
+            rng.choice(self.standards),
+        )
+        goal_decks = rng.sample(decks, min(rng.randint(1, 3), len(decks)))
+        for resource_id, _ in goal_decks:
+            self.add(GoalResource, goal_id, resource_id)
+
+        n_laps = int(rng.expovariate(1 / self.args.laps))
+        trials = correct = 0
+        for _ in range(n_laps):
+            resource_id, cards = rng.choice(goal_decks)
+            attempted, right = self.lap(goal_id, resource_id, cards, start, skill)
+            trials, correct = trials + attempted, correct + right
+            # practice pays off, a little
+            skill = min(0.99, skill + 0.01)
+        if n_laps:
+            accuracy = 100.0 * correct / trials if trials else None
+            met = (
+                accuracy is not None
+                and trials >= (target_trials or 0)
+                and accuracy >= (target_accuracy or 0)
+            )
+            self.add(GoalProgress, goal_id, trials, correct, accuracy, met, self.now)
+
+    def lap(
+            self, goal_id: int, resource_id: int, cards: list, start: date, skill: float
+    ) -> tuple[int, int]:
+        rng = self.rng
+        lap_id = self.ids[Lap].take()
+        finished = rng.random() < 0.6
+        n_cards = len(cards) if finished else rng.randint(0, len(cards))
+        right = 0
+        for card_id, answer in rng.sample(cards, n_cards):
+            ok = rng.random() < skill
+            right += ok
+            submission = answer if ok else "?"
+            attempt_id = self.ids[Attempt].take()
+            self.add(Attempt, attempt_id, submission, lap_id, card_id, ok)
+        start_ts = datetime.combine(
+            start + timedelta(days=rng.randint(0, 60)), datetime.min.time()
+        ) + timedelta(seconds=rng.randint(7 * 3600, 21 * 3600))
+        end_ts = start_ts + timedelta(seconds=20 * n_cards) if finished else None
+        score = 100.0 * right / n_cards if n_cards else None
+        self.add(
+            Lap, lap_id, start_ts, end_ts, score, goal_id, resource_id, n_cards, right
+        )
+        return n_cards, right
+
+    def sync_ids(self, connection: Connection) -> None:
+        for ids in self.ids.values():
+            ids.sync(connection)
+
+
+def generate(args) -> dict[str, int]:
+    rng = random.Random(args.seed)
+    password_hash = get_password_hash(PASSWORD).get_secret_value()
+    with engine.connect() as connection:
+        if args.method is None:
+            cursor = connection.connection.cursor()
+            args.method = "copy" if hasattr(cursor, "copy_expert") else "insert"
+            cursor.close()
+        with connection.begin():
+            generator = Generator(connection, args, rng, password_hash)
+            generator.sync_ids(connection)
+        if not generator.standards:
+            raise SystemExit("No standards to set goals on, seed them first")
+
+        start, n_students = time.perf_counter(), 0
+        while n_students < args.students:
+            class_size = max(1, round(rng.gauss(args.class_size, args.class_size / 4)))
+            class_size = min(class_size, args.students - n_students)
+            generator.teacher(class_size)
+            n_students += class_size
+            if len(generator.writer) >= args.batch_rows or n_students == args.students:
+                with connection.begin():
+                    generator.writer.flush()
+                    generator.sync_ids(connection)
+                elapsed = time.perf_counter() - start
+                n_rows = sum(generator.writer.written.values())
+                logger.info(
+                    f"{n_students}/{args.students} students, {n_rows} rows"
+                    f" in {elapsed:.0f}s ({n_rows / elapsed:.0f} rows/s)"
+                )
+        quote = engine.dialect.identifier_preparer.quote
+        for model in COLUMNS:
+            connection.execute(text(f"ANALYZE {quote(model.__tablename__)}"))
+        connection.commit()
+    return generator.writer.written
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--students", type=int, default=10_000)
+    parser.add_argument(
+        "--class-size", type=int, default=25, help="mean students per teacher"
+    )
+    parser.add_argument("--resources", type=int, default=8, help="median per teacher")
+    parser.add_argument("--cards", type=int, default=25, help="median per resource")
+    parser.add_argument("--laps", type=float, default=3, help="mean per goal")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument(
+        "--batch-rows", type=int, default=500_000,
+        help="rows generated between writes, bounding memory",
+    )
+    parser.add_argument(
+        "--method", choices=("copy", "insert"),
+        help="COPY, or executemany; by default COPY when the driver has it",
+    )
+    args = parser.parse_args()
+    written = generate(args)
+    logger.info(f"Generated rows: {written}")
+    logger.info(f"Every generated user's password is {PASSWORD!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,17 @@
 import logging
 from functools import lru_cache
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm.exc import StaleDataError
 
 from .core.config import Settings
+from .core.query_stats import QueryStatsMiddleware
+from .core.serialization import ORJSONResponse
+from .core.security import PasswordHashingBusy, get_password_hasher
 from .controller.api import api_router
+from .controller.endpoints.common_params import ETAG_HEADER, NEXT_CURSOR_HEADER
 
 
 settings = Settings()
@@ -13,7 +19,12 @@ settings = Settings()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="JKSA Learning")
+app = FastAPI(
+    title="JKSA Learning",
+    default_response_class=(
+        ORJSONResponse if settings.FAST_JSON_RESPONSES else JSONResponse
+    ),
+)
 app.include_router(api_router)
 app.add_middleware(
     CORSMiddleware,
@@ -21,6 +32,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, ETAG_HEADER],
+)
+app.add_middleware(
+    QueryStatsMiddleware,
+    max_queries=settings.SLOW_REQUEST_QUERIES,
+    max_ms=settings.SLOW_REQUEST_MS,
 )
 
 
@@ -29,6 +46,30 @@ def on_startup():
     logger.info("Completed app startup")
 
 
+@app.on_event("shutdown")
+def on_shutdown():
+    if get_password_hasher.cache_info().currsize:
+        get_password_hasher().shutdown()
+
+
+@app.exception_handler(PasswordHashingBusy)
+def password_hashing_busy_handler(request: Request, exc: PasswordHashingBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many logins at once, try again shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.exception_handler(StaleDataError)
+def stale_data_handler(request: Request, exc: StaleDataError):
+    # another request changed the row between this one's read and its write
+    return JSONResponse(
+        status_code=412 if "if-match" in request.headers else 409,
+        content={"detail": "Changed by another request, fetch it again"},
+    )
+
+
 @app.get("/", status_code=200)
 def root():
     return {"root": "success"}
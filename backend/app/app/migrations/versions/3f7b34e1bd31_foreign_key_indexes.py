@@ -0,0 +1,184 @@
+"""foreign key indexes
+
+Revision ID: 3f7b34e1bd31
+Revises: e5b9c3a1d7f2
+Create Date: 2026-10-17 15:30:20.828184
+
+Proposed by app.benchmarks.index_advisor:
+ix_attempt_lap_id: foreign key attempt_lap_id_fkey, workload, 369 calls, 10511.67 ms
+ix_card_resource_id_id: foreign key card_resource_id_fkey, workload, 374 calls, 4014.71 ms
+ix_attempt_card_id: foreign key attempt_card_id_fkey
+ix_goal_standard_id: foreign key goal_standard_id_fkey
+ix_goal_student_id: foreign key goal_student_id_fkey
+ix_goal_teacher_id: foreign key goal_teacher_id_fkey
+ix_goal_resource_resource_id: foreign key goal_resource_resource_id_fkey
+ix_lap_goal_id_resource_id: foreign key lap_goal_id_resource_id_fkey
+ix_standard_topic_id: foreign key standard_topic_id_fkey
+ix_standard_resource_resource_id: foreign key standard_resource_resource_id_fkey
+ix_user_group_group_id: foreign key user_group_group_id_fkey
+card_id_resource_id_key: redundant with card_pkey
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "3f7b34e1bd31"
+down_revision = "e5b9c3a1d7f2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY can not run inside a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_attempt_lap_id",
+            "attempt",
+            ["lap_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_card_resource_id_id",
+            "card",
+            ["resource_id", "id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_attempt_card_id",
+            "attempt",
+            ["card_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_goal_standard_id",
+            "goal",
+            ["standard_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_goal_student_id",
+            "goal",
+            ["student_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_goal_teacher_id",
+            "goal",
+            ["teacher_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_goal_resource_resource_id",
+            "goal_resource",
+            ["resource_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_lap_goal_id_resource_id",
+            "lap",
+            ["goal_id", "resource_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_standard_topic_id",
+            "standard",
+            ["topic_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_standard_resource_resource_id",
+            "standard_resource",
+            ["resource_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_user_group_group_id",
+            "user_group",
+            ["group_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_constraint("card_id_resource_id_key", "card", type_="unique")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_unique_constraint(
+            "card_id_resource_id_key", "card", ["id", "resource_id"]
+        )
+        op.drop_index(
+            "ix_user_group_group_id",
+            table_name="user_group",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            "ix_standard_resource_resource_id",
+            table_name="standard_resource",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            "ix_standard_topic_id",
+            table_name="standard",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            "ix_lap_goal_id_resource_id",
+            table_name="lap",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            "ix_goal_resource_resource_id",
+            table_name="goal_resource",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            "ix_goal_teacher_id",
+            table_name="goal",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            "ix_goal_student_id",
+            table_name="goal",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            "ix_goal_standard_id",
+            table_name="goal",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            "ix_attempt_card_id",
+            table_name="attempt",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            "ix_card_resource_id_id",
+            table_name="card",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            "ix_attempt_lap_id",
+            table_name="attempt",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,46 @@
+"""lap attempt counters
+
+Revision ID: 5f0c2a9d8e41
+Revises: 2125517549ec
+Create Date: 2026-10-17 14:02:11.518302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "5f0c2a9d8e41"
+down_revision = "2125517549ec"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "lap", sa.Column("n_attempted", sa.Integer(), server_default="0", nullable=False)
+    )
+    op.add_column(
+        "lap", sa.Column("n_correct", sa.Integer(), server_default="0", nullable=False)
+    )
+    # backfill from existing attempts
+    op.execute(
+        """
+        UPDATE lap
+        SET n_attempted = t.n_attempted,
+            n_correct = t.n_correct,
+            score = 100.0 * t.n_correct / t.n_attempted
+        FROM (
+            SELECT lap_id, count(*) AS n_attempted,
+                   count(*) FILTER (WHERE correct) AS n_correct
+            FROM attempt
+            GROUP BY lap_id
+        ) AS t
+        WHERE lap.id = t.lap_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("lap", "n_correct")
+    op.drop_column("lap", "n_attempted")
@@ -0,0 +1,58 @@
+"""goal progress
+
+Revision ID: 9b3e71c04d5a
+Revises: 5f0c2a9d8e41
+Create Date: 2026-10-17 15:21:46.904137
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "9b3e71c04d5a"
+down_revision = "5f0c2a9d8e41"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "goal_progress",
+        sa.Column("n_trials", sa.Integer(), nullable=False),
+        sa.Column("n_correct", sa.Integer(), nullable=False),
+        sa.Column("accuracy", sa.Float(), nullable=True),
+        sa.Column("met", sa.Boolean(), nullable=False),
+        sa.Column("goal_id", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["goal_id"], ["goal.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("goal_id"),
+    )
+    # backfill from existing attempts
+    op.execute(
+        """
+        INSERT INTO goal_progress
+            (goal_id, n_trials, n_correct, accuracy, met, updated_at)
+        SELECT goal_id, n_trials, n_correct, accuracy,
+               coalesce(n_trials >= coalesce(target_trials, 0)
+                        AND accuracy >= coalesce(target_accuracy, 0), false),
+               now()
+        FROM (
+            SELECT goal.id AS goal_id,
+                   goal.n_trials AS target_trials,
+                   goal.accuracy AS target_accuracy,
+                   count(attempt.id) AS n_trials,
+                   count(attempt.id) FILTER (WHERE attempt.correct) AS n_correct,
+                   100.0 * count(attempt.id) FILTER (WHERE attempt.correct)
+                       / nullif(count(attempt.id), 0) AS accuracy
+            FROM goal
+            JOIN lap ON lap.goal_id = goal.id
+            LEFT JOIN attempt ON attempt.lap_id = lap.id
+            GROUP BY goal.id
+        ) AS t
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("goal_progress")
@@ -0,0 +1,31 @@
+"""row versions
+
+Revision ID: c4d81f6e2a97
+Revises: 9b3e71c04d5a
+Create Date: 2026-10-17 17:08:33.240918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "c4d81f6e2a97"
+down_revision = "9b3e71c04d5a"
+branch_labels = None
+depends_on = None
+
+VERSIONED = ("resource", "card", "goal", "standard")
+
+
+def upgrade() -> None:
+    for table in VERSIONED:
+        op.add_column(
+            table,
+            sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+        )
+
+
+def downgrade() -> None:
+    for table in VERSIONED:
+        op.drop_column(table, "version")
@@ -0,0 +1,44 @@
+"""search vectors
+
+Revision ID: d2a6f0b83c15
+Revises: c4d81f6e2a97
+Create Date: 2026-10-17 19:42:10.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "d2a6f0b83c15"
+down_revision = "c4d81f6e2a97"
+branch_labels = None
+depends_on = None
+
+# table -> generated search vector, as in app.models.add_search
+SEARCHABLE = {
+    "resource": "setweight(to_tsvector('english', coalesce(name, '')), 'A')",
+    "card": (
+        "setweight(to_tsvector('english', coalesce(question, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(answer, '')), 'B')"
+    ),
+}
+
+
+def upgrade() -> None:
+    # adding a stored generated column rewrites the table
+    for table, vector in SEARCHABLE.items():
+        op.add_column(
+            table,
+            sa.Column("search", postgresql.TSVECTOR(), sa.Computed(vector)),
+        )
+        op.create_index(
+            f"ix_{table}_search", table, ["search"], postgresql_using="gin"
+        )
+
+
+def downgrade() -> None:
+    for table in SEARCHABLE:
+        op.drop_index(f"ix_{table}_search", table_name=table)
+        op.drop_column(table, "search")
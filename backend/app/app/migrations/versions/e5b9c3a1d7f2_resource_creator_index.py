@@ -0,0 +1,25 @@
+"""resource creator index
+
+Revision ID: e5b9c3a1d7f2
+Revises: d2a6f0b83c15
+Create Date: 2026-10-17 22:15:47.902311
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "e5b9c3a1d7f2"
+down_revision = "d2a6f0b83c15"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_resource_creator_id_id", "resource", ["creator_id", "id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_resource_creator_id_id", table_name="resource")
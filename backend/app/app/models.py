@@ -13,13 +13,59 @@ from pydantic import (
 )
 from sqlalchemy import (
     Column,
+    Computed,
+    ForeignKey,
+    Index,
+    Integer,
     String,
     TypeDecorator,
     ForeignKeyConstraint,
-    UniqueConstraint,
 )
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import declared_attr, deferred
 from sqlmodel import SQLModel, Field, Relationship
 
+"""
+Versions
+
+Each committed change to a versioned row increments its version, and an
+UPDATE only applies while the row still has the version it was read at;
+otherwise it raises StaleDataError. A Resource's version also counts changes
+to its cards and a Goal's changes to its links, see `CRUDBase.touch`.
+"""
+
+
+class Versioned(SQLModel):
+    version: int = Field(default=1, sa_column_kwargs=dict(server_default="1"))
+
+    @declared_attr
+    def __mapper_args__(cls):
+        return {"version_id_col": cls.__table__.c.version}
+
+
+"""
+Search
+
+Searchable tables have a `search` tsvector column, generated by Postgres
+from their text columns and GIN indexed. It is deferred, so it is only ever
+read by the queries that filter and rank on it, see `CRUDBase.ranked`.
+"""
+
+SEARCH_CONFIG = "english"
+
+
+def add_search(model: type[SQLModel], **weights: str) -> None:
+    """Make `model` searchable over its columns in `weights`, e.g. name="A" """
+    vector = " || ".join(
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce({name}, '')), '{weight}')"
+        for name, weight in weights.items()
+    )
+    model.search = deferred(Column("search", TSVECTOR, Computed(vector)))
+    Index(
+        f"ix_{model.__tablename__}_search", model.search, postgresql_using="gin"
+    )
+
+
 """
 Junction Standard<>Resource
 """
@@ -32,6 +78,7 @@ class StandardResourceBase(SQLModel):
 
 class StandardResource(StandardResourceBase, table=True):
     __tablename__ = "standard_resource"
+    __table_args__ = (Index("ix_standard_resource_resource_id", "resource_id"),)
 
 
 class StandardResourceCreate(StandardResourceBase):
@@ -65,6 +112,7 @@ class GoalResourceBase(SQLModel):
 class GoalResource(GoalResourceBase, table=True):
     __tablename__ = "goal_resource"
     laps: list["Lap"] = Relationship(back_populates="goal_resource")
+    __table_args__ = (Index("ix_goal_resource_resource_id", "resource_id"),)
 
 
 class GoalResourceCreate(GoalResourceBase):
@@ -96,6 +144,7 @@ class UserGroupBase(SQLModel):
 
 class UserGroup(UserGroupBase, table=True):
     __tablename__ = "user_group"
+    __table_args__ = (Index("ix_user_group_group_id", "group_id"),)
 
 
 class UserGroupCreate(UserGroupBase):
@@ -242,7 +291,7 @@ class ResourceBase(SQLModel):
     format: ResourceFormat = ResourceFormat.flashcard
 
 
-class Resource(ResourceBase, table=True):
+class Resource(ResourceBase, Versioned, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     creator_id: Optional[int] = Field(default=None, foreign_key="users.id")
     creator: Optional[User] = Relationship(back_populates="resources")
@@ -250,10 +299,17 @@ class Resource(ResourceBase, table=True):
         back_populates="resources",
         link_model=StandardResource,
     )
-    cards: list["Card"] = Relationship(back_populates="resource")
+    cards: list["Card"] = Relationship(
+        back_populates="resource", sa_relationship_kwargs=dict(order_by="Card.id")
+    )
     goals: list["Goal"] = Relationship(
         back_populates="resources", link_model=GoalResource
     )
+    # the listings of a creator's resources, in keyset order
+    __table_args__ = (Index("ix_resource_creator_id_id", "creator_id", "id"),)
+
+
+add_search(Resource, name="A")
 
 
 class ResourceCreateExternal(ResourceBase):
@@ -297,14 +353,18 @@ class CardBase(SQLModel):
     answer: str
 
 
-class Card(CardBase, table=True):
+class Card(CardBase, Versioned, table=True):
     id: Optional[int] = Field(
         default=None, primary_key=True, sa_column_kwargs=dict(autoincrement=True)
     )
     resource_id: Optional[int] = Field(default=None, foreign_key="resource.id")
     resource: Resource = Relationship(back_populates="cards")
     # attempts: list['Attempt'] = Relationship(back_populates='card')
-    __table_args__ = (UniqueConstraint("id", "resource_id"),)
+    # the cards of a resource, in keyset order
+    __table_args__ = (Index("ix_card_resource_id_id", "resource_id", "id"),)
+
+
+add_search(Card, question="A", answer="B")
 
 
 class CardCreate(CardBase):
@@ -323,6 +383,11 @@ class CardReadWithResource(CardRead):
     resource: ResourceRead
 
 
+class CardImportResult(SQLModel):
+    resource_id: int
+    imported: int
+
+
 class ResourceReadWithCards(ResourceRead):
     cards: list[CardRead] = []
 
@@ -364,7 +429,7 @@ class StandardBase(SQLModel):
     subject: Subject
 
 
-class Standard(StandardBase, table=True):
+class Standard(StandardBase, Versioned, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     topic_id: int = Field(foreign_key="topic.id")
     topic: Topic = Relationship(back_populates="standards")
@@ -372,6 +437,7 @@ class Standard(StandardBase, table=True):
         back_populates="standards", link_model=StandardResource
     )
     goals: list["Goal"] = Relationship(back_populates="standard")
+    __table_args__ = (Index("ix_standard_topic_id", "topic_id"),)
 
 
 class StandardCreate(StandardBase):
@@ -408,7 +474,7 @@ class GoalBase(SQLModel):
         return v
 
 
-class Goal(GoalBase, table=True):
+class Goal(GoalBase, Versioned, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     teacher_id: Optional[int] = Field(foreign_key="users.id")
     student_id: Optional[int] = Field(foreign_key="users.id")
@@ -424,6 +490,12 @@ class Goal(GoalBase, table=True):
         back_populates="goals",
         link_model=GoalResource,
         # sa_relationship_kwargs=dict(passive_deletes='all')
+        sa_relationship_kwargs=dict(order_by="Resource.id"),
+    )
+    __table_args__ = (
+        Index("ix_goal_standard_id", "standard_id"),
+        Index("ix_goal_student_id", "student_id"),
+        Index("ix_goal_teacher_id", "teacher_id"),
     )
 
 
@@ -449,6 +521,38 @@ class GoalReadWithResources(GoalRead):
     resources: list[ResourceReadWithCards]
 
 
+"""
+Goal progress
+
+A summary of every attempt made towards a goal, kept up to date by
+crud.attempt as attempts are created, so checking a goal never needs its
+attempts.
+"""
+
+
+class GoalProgressBase(SQLModel):
+    n_trials: int = 0
+    n_correct: int = 0
+    accuracy: Optional[float] = None  # percent correct over all trials
+    met: bool = False  # at least n_trials trials, at the goal's accuracy
+
+
+class GoalProgress(GoalProgressBase, table=True):
+    __tablename__ = "goal_progress"
+    goal_id: Optional[int] = Field(
+        default=None,
+        sa_column=Column(
+            Integer, ForeignKey("goal.id", ondelete="CASCADE"), primary_key=True
+        ),
+    )
+    updated_at: Optional[datetime] = Field(default_factory=datetime.utcnow)
+
+
+class GoalProgressRead(GoalProgressBase):
+    goal_id: int
+    updated_at: Optional[datetime] = None
+
+
 """
 Laps
 """
@@ -466,6 +570,9 @@ class Lap(LapBase, table=True):
     )
     goal_id: Optional[int] = Field(default=None)  # part of composite FK
     resource_id: Optional[int] = Field(default=None)  # part of composite FK
+    # running totals over the lap's attempts, kept by crud.attempt
+    n_attempted: int = Field(default=0, sa_column_kwargs=dict(server_default="0"))
+    n_correct: int = Field(default=0, sa_column_kwargs=dict(server_default="0"))
     goal_resource: GoalResource = Relationship(back_populates="laps")
     goal: Goal = Relationship(
         sa_relationship_kwargs=dict(
@@ -483,8 +590,9 @@ class Lap(LapBase, table=True):
         ForeignKeyConstraint(
             ["goal_id", "resource_id"],
             ["goal_resource.goal_id", "goal_resource.resource_id"],
-        ),
-    )  # makes a goal resource un-deletable unless not in use on lap.
+        ),  # makes a goal resource un-deletable unless not in use on lap.
+        Index("ix_lap_goal_id_resource_id", "goal_id", "resource_id"),
+    )
 
 
 class LapCreate(LapBase):
@@ -498,6 +606,8 @@ class LapUpdate(LapBase):
 
 class LapRead(LapBase):
     id: int
+    n_attempted: int = 0
+    n_correct: int = 0
     goal: GoalRead
     resource: ResourceReadWithCards
 
@@ -506,6 +616,8 @@ class LapReadMinimal(LapBase):
     id: int
     goal_id: int
     resource_id: int
+    n_attempted: int = 0
+    n_correct: int = 0
 
 
 """
@@ -530,6 +642,10 @@ class Attempt(AttemptBase, table=True):
     card: "Card" = Relationship(
         sa_relationship_kwargs=dict(primaryjoin="Attempt.card_id==Card.id")
     )
+    __table_args__ = (
+        Index("ix_attempt_lap_id", "lap_id"),
+        Index("ix_attempt_card_id", "card_id"),
+    )
 
 
 class AttemptCreateExternal(AttemptBase):
@@ -541,6 +657,15 @@ class AttemptCreateInternal(AttemptCreateExternal):
     correct: Optional[bool]
 
 
+class AttemptBatchItem(AttemptBase):
+    card_id: int
+
+
+class AttemptBatchCreate(SQLModel):
+    lap_id: int
+    attempts: list[AttemptBatchItem] = Field(min_items=1, max_items=5000)
+
+
 class AttemptUpdate(AttemptBase):
     pass
 
@@ -0,0 +1,33 @@
+import logging
+
+from sqlmodel import Session
+
+from app import crud
+from app.database import engine
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("app.reconcile_counters")
+
+"""
+Lap counters and goal progress are kept up to date as attempts are created
+through crud.attempt, but writes that bypass it (manual SQL, restores,
+deleted attempts) or changes to a goal's targets leave them behind. Run periodically, e.g. from cron:
+
+    python -m app.reconcile_counters
+"""
+
+
+def main():
+    with Session(engine) as session:
+        laps = crud.lap.reconcile_counters(session)
+        goals = crud.goal_progress.reconcile(session)
+    if laps:
+        logger.warning(f"Corrected attempt counters of {len(laps)} laps: {laps}")
+    if goals:
+        logger.warning(f"Corrected progress of {len(goals)} goals: {goals}")
+    if not laps and not goals:
+        logger.info("All lap counters and goal progress match their attempts")
+
+
+if __name__ == "__main__":
+    main()
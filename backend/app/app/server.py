@@ -0,0 +1,151 @@
+import argparse
+import gc
+import importlib.util
+import logging
+import os
+from typing import Any
+
+from gunicorn import util
+from gunicorn.app.base import BaseApplication
+
+from app.core.config import Settings
+
+"""
+Serves the API.
+
+    python -m app.server
+
+In LOCAL and DEV, uvicorn serves the app in a single process and reloads it
+when the code changes. In any other environment, gunicorn serves it with
+uvicorn workers: WEB_CONCURRENCY of them, by default one per CPU. Each
+worker is replaced after about WEB_MAX_REQUESTS requests, which bounds the
+memory any one of them can grow to.
+
+With WEB_PRELOAD the app is imported in the gunicorn master before the
+workers are forked, so the workers share the pages holding its modules,
+models and table metadata, copy-on-write. The garbage collector is off
+while the app is imported, so that it frees nothing in between those
+pages, and the objects made are then frozen. Frozen objects are out of
+the collector's reach, so collections in the workers never write to
+their pages.
+
+The workers run on uvloop and parse HTTP with httptools when these are
+installed, e.g. by `uvicorn[standard]`, and fall back on asyncio and h11.
+"""
+
+logger = logging.getLogger(__name__)
+
+APP = "app.main:app"
+RELOAD_ENVS = ("LOCAL", "DEV")
+
+
+def cpu_count() -> int:
+    """The CPUs this process may run on, which a container may limit"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def worker_count(settings: Settings) -> int:
+    return settings.WEB_CONCURRENCY or cpu_count()
+
+
+def installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def post_fork(server, worker) -> None:
+    # a preloaded app may have connected before the fork; the worker must
+    # open connections of its own, and leave the master's alone
+    from app.database import async_engine, engine
+
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+
+
+def gunicorn_options(settings: Settings, bind: str, log_level: str) -> dict[str, Any]:
+    options = dict(
+        bind=bind,
+        worker_class="uvicorn.workers.UvicornWorker",
+        workers=worker_count(settings),
+        preload_app=settings.WEB_PRELOAD,
+        max_requests=settings.WEB_MAX_REQUESTS,
+        max_requests_jitter=settings.WEB_MAX_REQUESTS_JITTER,
+        timeout=settings.WEB_TIMEOUT,
+        graceful_timeout=settings.WEB_GRACEFUL_TIMEOUT,
+        keepalive=settings.WEB_KEEPALIVE,
+        loglevel=log_level,
+        post_fork=post_fork,
+    )
+    # the workers' heartbeat files, in memory rather than on a disk that
+    # may stall them into a timeout
+    if os.path.isdir("/dev/shm"):
+        options["worker_tmp_dir"] = "/dev/shm"
+    return options
+
+
+class Server(BaseApplication):
+    """gunicorn, configured from `options` rather than its command line"""
+
+    def __init__(self, app_uri: str, options: dict[str, Any]):
+        self.app_uri = app_uri
+        self.options = options
+        super().__init__()
+
+    def load_config(self) -> None:
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        if not self.cfg.preload_app:
+            return util.import_app(self.app_uri)
+        gc.disable()
+        try:
+            app = util.import_app(self.app_uri)
+        finally:
+            gc.freeze()
+            gc.enable()
+        logger.info(
+            "Preloaded %s, froze %d objects", self.app_uri, gc.get_freeze_count()
+        )
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the API")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "info"))
+    parser.add_argument("--app", default=os.getenv("APP_MODULE", APP))
+    args = parser.parse_args()
+    settings = Settings()
+    logging.basicConfig(level=logging.INFO)
+
+    if settings.API_ENV in RELOAD_ENVS:
+        import uvicorn
+
+        logger.info("Serving %s with reload, in %s", args.app, settings.API_ENV)
+        uvicorn.run(
+            args.app,
+            host=args.host,
+            port=args.port,
+            log_level=args.log_level,
+            reload=True,
+            reload_excludes=["test_*.py"],
+        )
+        return
+
+    options = gunicorn_options(settings, f"{args.host}:{args.port}", args.log_level)
+    logger.info(
+        "Serving %s with %d workers on %s and %s",
+        args.app,
+        options["workers"],
+        "uvloop" if installed("uvloop") else "asyncio",
+        "httptools" if installed("httptools") else "h11",
+    )
+    Server(args.app, options).run()
+
+
+if __name__ == "__main__":
+    main()
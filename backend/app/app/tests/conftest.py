@@ -6,10 +6,14 @@ from pytest_postgresql.executor_noop import NoopExecutor
 from pytest_postgresql.factories import postgresql_noproc
 from pytest_postgresql.janitor import DatabaseJanitor
 from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import NullPool
 from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app import crud
 from app.core.config import Settings
-from app.deps import get_session
+from app.deps import get_session, get_async_session
 from app.initial_data import create_first_superuser
 from app.main import app
 from app.tests.tools.mock_user import (
@@ -57,6 +61,17 @@ def engine(request: FixtureRequest):
     engine.dispose()
 
 
+@pytest.fixture(scope="session")
+def async_engine(engine: Engine) -> AsyncEngine:
+    """
+    Async engine on the testing db. TestClient runs each request on its own
+    event loop, and asyncpg connections can not outlive their loop, so
+    connections are not pooled.
+    """
+    url = engine.url.set(drivername="postgresql+asyncpg")
+    return create_async_engine(url, poolclass=NullPool)
+
+
 def db_setup(db_engine: Engine) -> None:
     """Perform all necessary table creation.
     Could probably use Alembic as well
@@ -70,16 +85,23 @@ def session_fixture(engine: Engine):
         for table in reversed(SQLModel.metadata.sorted_tables):
             session.execute(table.delete())
         session.commit()
+        # the wipe bypasses the CRUD layer, so drop whatever the catalog holds
+        crud.catalog.invalidate()
         create_first_superuser(settings, session)
         yield session
 
 
 @pytest.fixture(name="client", scope="function")
-def client_fixture(session: Session):
+def client_fixture(session: Session, async_engine: AsyncEngine):
     def get_session_override():
         return session
 
+    async def get_async_session_override():
+        async with AsyncSession(async_engine, expire_on_commit=False) as a_session:
+            yield a_session
+
     app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_async_session] = get_async_session_override
     client = TestClient(app)
     yield client
     app.dependency_overrides.clear()
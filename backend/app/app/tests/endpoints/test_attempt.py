@@ -29,6 +29,8 @@ def test_create_attempt_correct(client, session):
     pprint_dict(data)
     assert response.status_code == 201
     assert data["lap"]["id"] == lap.id
+    assert data["lap"]["n_attempted"] == 1
+    assert data["lap"]["score"] == 100.0
     assert data["submission"] == submission
     assert data["correct"]
 
@@ -134,3 +136,76 @@ def test_create_attempt_non_exist_card(client, session):
     pprint_dict(data)
     assert response.status_code == 404
     assert "card" in data["detail"].lower()
+
+
+def test_create_attempts_batch(client, session):
+    goal = create_random_goals_with_resources(session, n_cards_per=5)
+    resource = goal.resources[0]
+    lap = create_random_laps(session, goal, resource)
+    cards = resource.cards
+    attempts_in = [
+        {"card_id": card.id, "submission": card.answer if i % 2 else "wrong"}
+        for i, card in enumerate(cards)
+    ]
+    student_headers = authentication_token_from_email(
+        client, session, goal.student.email
+    )
+    response = client.post(
+        "/attempt/batch",
+        json={"lap_id": lap.id, "attempts": attempts_in},
+        headers=student_headers,
+    )
+    data = response.json()
+    assert response.status_code == 201
+    assert [a["card"]["id"] for a in data] == [c.id for c in cards]
+    assert [a["correct"] for a in data] == [bool(i % 2) for i in range(len(cards))]
+    session.refresh(lap)
+    assert len(lap.attempts) == len(cards)
+    assert (lap.n_attempted, lap.n_correct) == (5, 2)
+    assert lap.score == 40.0
+
+
+def test_create_attempts_batch_student_not_member(client, session):
+    goal = create_random_goals_with_resources(session)
+    resource = goal.resources[0]
+    lap = create_random_laps(session, goal, resource)
+    card = resource.cards[0]
+    other_student = create_random_user(session, Role.student)
+    other_student_headers = authentication_token_from_email(
+        client, session, other_student.email
+    )
+    response = client.post(
+        "/attempt/batch",
+        json={
+            "lap_id": lap.id,
+            "attempts": [{"card_id": card.id, "submission": card.answer}],
+        },
+        headers=other_student_headers,
+    )
+    assert response.status_code == 401
+
+
+def test_create_attempts_batch_non_exist_card(client, session):
+    goal = create_random_goals_with_resources(session)
+    resource = goal.resources[0]
+    lap = create_random_laps(session, goal, resource)
+    card = resource.cards[0]
+    student_headers = authentication_token_from_email(
+        client, session, goal.student.email
+    )
+    response = client.post(
+        "/attempt/batch",
+        json={
+            "lap_id": lap.id,
+            "attempts": [
+                {"card_id": card.id, "submission": card.answer},
+                {"card_id": 999999, "submission": "x"},
+            ],
+        },
+        headers=student_headers,
+    )
+    data = response.json()
+    assert response.status_code == 404
+    assert "999999" in data["detail"]
+    session.refresh(lap)
+    assert lap.attempts == []
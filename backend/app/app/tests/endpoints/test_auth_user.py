@@ -1,8 +1,15 @@
+import json
+
+from jose import jwt
+from pydantic import SecretStr
+
 from app import crud
+from app.core import security
 from app.models import Role, UserCreate, UserRead
 from app.tests.tools.mock_data import create_random_user, pprint_dict
 from app.tests.tools.mock_params import random_email
 from app.tests.tools.mock_user import get_user_from_token_headers, random_password
+from app.tests.tools.query_count import count_queries
 
 
 def test_auth_non_exist_user():
@@ -96,6 +103,60 @@ def test_login(client, session):
     assert data["token_type"] == "bearer"
 
 
+def test_login_role_claims(client, session, test_settings):
+    user_in = UserCreate(
+        email=random_email(), password=random_password(), role=Role.teacher
+    )
+    user = crud.user.create(session, obj_in=user_in)
+    response = client.post(
+        "/auth/login",
+        data={"username": user.email, "password": user_in.password.get_secret_value()},
+    )
+    claims = jwt.get_unverified_claims(response.json()["access_token"])
+    assert claims["sub"] == str(user.id)
+    assert claims["role"] == Role.teacher
+    assert claims["is_superuser"] is False
+    assert claims["ver"] == test_settings.ROLE_CLAIMS_VERSION
+
+
+def test_login_rehashes_outdated_hash(client, session, test_settings):
+    user_in = UserCreate(email=random_email(), password=random_password())
+    user = crud.user.create(session, obj_in=user_in)
+    password = user_in.password.get_secret_value()
+    old_rounds = test_settings.PASSWORD_HASH_ROUNDS - 1
+    old_hash = security.get_password_context(old_rounds).hash(password)
+    crud.user.update(session, db_obj=user, obj_in={"hashed_password": SecretStr(old_hash)})
+    response = client.post(
+        "/auth/login", data={"username": user.email, "password": password}
+    )
+    assert response.status_code == 200
+    session.refresh(user)
+    new_hash = user.hashed_password.get_secret_value()
+    assert new_hash != old_hash
+    assert new_hash.startswith(f"$2b${test_settings.PASSWORD_HASH_ROUNDS}$")
+
+
+def test_login_hashing_busy(client, session, monkeypatch):
+    user_in = UserCreate(email=random_email(), password=random_password())
+    user = crud.user.create(session, obj_in=user_in)
+    busy = security.PasswordHasher(rounds=4, workers=1, max_pending=1)
+    busy._slots.acquire()
+    monkeypatch.setattr(security, "get_password_hasher", lambda: busy)
+    response = client.post(
+        "/auth/login",
+        data={"username": user.email, "password": user_in.password.get_secret_value()},
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_authorize_from_claims(client, session, normal_user_token_headers):
+    with count_queries(session) as statements:
+        response = client.get("/standard/999999", headers=normal_user_token_headers)
+    assert response.status_code == 404
+    assert not [s for s in statements if "FROM users" in s]
+
+
 def test_login_incorrect_password(client, session):
     user_in = UserCreate(email=random_email(), password=random_password())
     user = crud.user.create(session, obj_in=user_in)
@@ -142,12 +203,30 @@ def test_get_all_users(client, session, superuser_token_headers):
     assert data == [UserRead.from_orm(u).dict() for u in users]
 
 
+def test_get_all_users_ndjson(client, session, superuser_token_headers):
+    superuser = get_user_from_token_headers(client, superuser_token_headers)
+    users = [superuser] + [create_random_user(session) for _ in range(5)]
+    headers = dict(superuser_token_headers, Accept="application/x-ndjson")
+    response = client.get("/user/", headers=headers)
+    assert response.status_code == 200
+    data = [json.loads(line) for line in response.text.splitlines()]
+    assert data == [json.loads(UserRead.from_orm(u).json()) for u in users]
+
+
 def test_get_all_users_as_non_superuser(client, session, normal_user_token_headers):
     _ = [create_random_user(session) for _ in range(2)]
     response = client.get("/user/", headers=normal_user_token_headers)
     assert response.status_code == 400
 
 
+def test_get_all_users_after_promotion(client, session, normal_user_token_headers):
+    # the token's claims predate the promotion, so the row is checked
+    user = get_user_from_token_headers(client, normal_user_token_headers)
+    crud.user.make_superuser(session, db_obj=crud.user.get(session, user.id))
+    response = client.get("/user/", headers=normal_user_token_headers)
+    assert response.status_code == 200
+
+
 def test_update_me_normal_user(client, session, normal_user_token_headers,
                                test_settings):
     og_user_db = get_user_from_token_headers(client, normal_user_token_headers)
@@ -1,5 +1,7 @@
 from app import crud
-from app.models import ResourceRead, CardRead
+from app.core import serialization
+from app.core.response_cache import get_deck_cache
+from app.models import ResourceRead, CardCreate, CardRead
 from app.tests.tools.mock_data import (
     create_random_user,
     create_random_resources,
@@ -184,6 +186,70 @@ def test_get_cards_by_resource(client, session, normal_user_token_headers):
     assert data["id"] == resource.id
 
 
+def test_get_cards_by_resource_fast_json(
+        client, session, normal_user_token_headers, monkeypatch
+):
+    user = get_user_from_token_headers(client, normal_user_token_headers)
+    resource = create_random_resources(session, user)
+    create_random_cards(session, resource, 10)
+    url = f"/card/?resource_id={resource.id}"
+    default = client.get(url, headers=normal_user_token_headers)
+    monkeypatch.setattr(serialization, "fast_json_enabled", lambda: True)
+    fast = client.get(url, headers=normal_user_token_headers)
+    assert fast.status_code == 200
+    assert fast.headers["content-type"] == "application/json"
+    assert fast.json() == default.json()
+
+
+def test_get_cards_by_resource_not_modified(client, session, normal_user_token_headers):
+    user = get_user_from_token_headers(client, normal_user_token_headers)
+    resource = create_random_resources(session, user)
+    create_random_cards(session, resource, 3)
+    url = f"/card/?resource_id={resource.id}"
+    etag = client.get(url, headers=normal_user_token_headers).headers["ETag"]
+    response = client.get(
+        url, headers={**normal_user_token_headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert not response.content
+
+    client.post(
+        "/card/",
+        json={"question": "New?", "answer": "Yes", "resource_id": resource.id},
+        headers=normal_user_token_headers,
+    )
+    response = client.get(
+        url, headers={**normal_user_token_headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert len(response.json()["cards"]) == 4
+
+
+def test_get_cards_by_resource_cached(client, session, normal_user_token_headers):
+    user = get_user_from_token_headers(client, normal_user_token_headers)
+    resource = create_random_resources(session, user, 1, all_public=True)
+    card = create_random_cards(session, resource, 3)[0]
+    url = f"/card/?resource_id={resource.id}"
+    deck_cache = get_deck_cache()
+    first = client.get(url, headers=normal_user_token_headers)
+    hits = deck_cache.stats()["hits"]
+    second = client.get(url, headers=normal_user_token_headers)
+    assert deck_cache.stats()["hits"] == hits + 1
+    assert second.json() == first.json()
+    assert second.headers["ETag"] == first.headers["ETag"]
+
+    client.patch(
+        f"/card/{card.id}",
+        json={"question": "Changed?", "answer": "Yes"},
+        headers=normal_user_token_headers,
+    )
+    response = client.get(url, headers=normal_user_token_headers)
+    assert deck_cache.stats()["hits"] == hits + 1
+    assert response.json()["cards"][0]["question"] == "Changed?"
+
+
 def test_get_cards_by_resource_non_exist(client, session, normal_user_token_headers):
     user = get_user_from_token_headers(client, normal_user_token_headers)
     resource = create_random_resources(session, user)
@@ -239,6 +305,33 @@ def test_update_card(client, session, normal_user_token_headers):
     assert data["id"] == card.id
 
 
+def test_update_card_if_match(client, session, normal_user_token_headers):
+    user = get_user_from_token_headers(client, normal_user_token_headers)
+    resource = create_random_resources(session, user, n=1)
+    card = create_random_cards(session, resource, 1)
+    etag = client.get(f"/card/{card.id}", headers=normal_user_token_headers).headers[
+        "ETag"
+    ]
+    card_up_dict = {"question": random_lower_string(), "answer": random_lower_string()}
+    response = client.patch(
+        f"/card/{card.id}",
+        json=card_up_dict,
+        headers={**normal_user_token_headers, "If-Match": etag},
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+    # the first update changed the card since etag was read
+    response = client.patch(
+        f"/card/{card.id}",
+        json={"question": "Stale?", "answer": "Yes"},
+        headers={**normal_user_token_headers, "If-Match": etag},
+    )
+    assert response.status_code == 412
+    session.refresh(card)
+    assert card.question == card_up_dict["question"]
+
+
 # It shouldn't matter if the card's resource is public or not. If you didn't
 # create the resource, you can't edit a card.
 # Will test both scenarios anyway.
@@ -262,3 +355,45 @@ def test_update_public_card_non_creator(client, session, normal_user_token_heade
         f"/card/{card.id}", json=card_up_dict, headers=normal_user_token_headers
     )
     assert response.status_code == 401
+
+
+def test_search_cards(client, session, normal_user_token_headers):
+    user = get_user_from_token_headers(client, normal_user_token_headers)
+    other = create_random_user(session)
+    mine = create_random_resources(session, user, 1)
+    public = create_random_resources(session, other, 1, all_public=True)
+    private = create_random_resources(session, other, 1, all_private=True)
+    cards = {}
+    for resource, question, answer in [
+        (mine, "What does a cell membrane do?", "Controls what enters the cell"),
+        (mine, "Where is energy made?", "In the mitochondria of cells"),
+        (public, "Name a cell organelle", "Ribosome"),
+        (private, "Cells have their own what?", "DNA"),
+        (mine, "What is osmosis?", "Diffusion of water"),
+    ]:
+        card_in = CardCreate(question=question, answer=answer, resource_id=resource.id)
+        cards[question] = crud.card.create(session, obj_in=card_in).id
+
+    response = client.get("/card/search?q=cells", headers=normal_user_token_headers)
+    assert response.status_code == 200
+    data = response.json()
+    # question matches rank above answer matches, private resources are hidden
+    assert [c["id"] for c in data] == [
+        cards["What does a cell membrane do?"],
+        cards["Name a cell organelle"],
+        cards["Where is energy made?"],
+    ]
+    assert data[1]["resource"]["id"] == public.id
+
+    response = client.get(
+        f"/card/search?q=cells&resource_id={public.id}",
+        headers=normal_user_token_headers,
+    )
+    assert [c["id"] for c in response.json()] == [cards["Name a cell organelle"]]
+    response = client.get(
+        f"/card/search?q=cells&resource_id={private.id}",
+        headers=normal_user_token_headers,
+    )
+    assert response.status_code == 401
+    response = client.get("/card/search", headers=normal_user_token_headers)
+    assert response.status_code == 422
@@ -9,10 +9,16 @@ from app.tests.tools.mock_data import (
     create_random_cards,
     update_user,
     create_random_groups,
+    create_random_goals_with_resources,
+    create_random_laps,
+    create_random_attempts,
     pprint_dict,
 )
 from app.tests.tools.mock_params import local_today
-from app.tests.tools.mock_user import get_user_from_token_headers
+from app.tests.tools.mock_user import (
+    get_user_from_token_headers,
+    authentication_token_from_email,
+)
 
 
 def test_create_goal(client, session, normal_user_token_headers):
@@ -366,6 +372,32 @@ def test_get_goal_teacher(client, session, normal_user_token_headers):
     assert data["resources"] == [ResourceReadWithCards.from_orm(resource).dict()]
 
 
+def test_get_goal_not_modified(client, session, normal_user_token_headers):
+    user = get_user_from_token_headers(client, normal_user_token_headers)
+    teacher = update_user(session, user, {"role": Role.teacher})
+    student = create_random_user(session)
+    group = create_random_groups(session, 1)
+    group.users.extend([teacher, student])
+    topic = create_topics(session)
+    standard = create_random_standards(session, topic, 1)
+    goal = create_random_goals(session, teacher, student, group, standard, n=1)
+    url = f"/goal/{goal.id}"
+    etag = client.get(url, headers=normal_user_token_headers).headers["ETag"]
+    headers = {**normal_user_token_headers, "If-None-Match": etag}
+    assert client.get(url, headers=headers).status_code == 304
+
+    resource = create_random_resources(session, teacher, 1)
+    response = client.post(
+        "/goal/resource-link/",
+        json={"goal_id": goal.id, "resource_id": resource.id},
+        headers=normal_user_token_headers,
+    )
+    assert response.status_code == 200
+    response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    assert [r["id"] for r in response.json()["resources"]] == [resource.id]
+
+
 def test_get_goal_non_exist(client, session, normal_user_token_headers):
     user = get_user_from_token_headers(client, normal_user_token_headers)
     teacher = update_user(session, user, {"role": Role.teacher})
@@ -732,3 +764,84 @@ def test_add_multi_resources_not_goal_teacher(
     data = response.json()
     pprint_dict(data)
     assert response.status_code == 401
+
+
+def test_get_goal_progress(client, session):
+    goal = create_random_goals_with_resources(session, n_rsc_per=2, n_cards_per=4)
+    attempts = []
+    for resource in goal.resources:
+        lap = create_random_laps(session, goal, resource)
+        attempts.extend(create_random_attempts(session, lap))
+    n_correct = sum(a.correct for a in attempts)
+    accuracy = 100 * n_correct / 8
+    student_headers = authentication_token_from_email(
+        client, session, goal.student.email
+    )
+    response = client.get(f"/goal/{goal.id}/progress", headers=student_headers)
+    data = response.json()
+    assert response.status_code == 200
+    assert data["goal_id"] == goal.id
+    assert data["n_trials"] == 8
+    assert data["n_correct"] == n_correct
+    assert data["accuracy"] == accuracy
+    assert data["met"] == (8 >= goal.n_trials and accuracy >= goal.accuracy)
+
+
+def test_get_goal_progress_no_attempts(client, session):
+    goal = create_random_goals_with_resources(session)
+    teacher_headers = authentication_token_from_email(
+        client, session, goal.teacher.email
+    )
+    response = client.get(f"/goal/{goal.id}/progress", headers=teacher_headers)
+    data = response.json()
+    assert response.status_code == 200
+    assert (data["n_trials"], data["accuracy"], data["met"]) == (0, None, False)
+
+
+def test_get_goal_progress_not_on_goal(client, session, normal_user_token_headers):
+    goal = create_random_goals_with_resources(session)
+    response = client.get(
+        f"/goal/{goal.id}/progress", headers=normal_user_token_headers
+    )
+    assert response.status_code == 401
+
+
+def test_get_goal_progress_non_exist(client, normal_user_token_headers):
+    response = client.get("/goal/999999/progress", headers=normal_user_token_headers)
+    assert response.status_code == 404
+
+
+def test_add_multi_resources_again(client, session, normal_user_token_headers):
+    user = get_user_from_token_headers(client, normal_user_token_headers)
+    teacher = update_user(session, user, {"role": Role.teacher})
+    student = create_random_user(session, role=Role.student)
+    group = create_random_groups(session, 1)
+    group.users.extend([teacher, student])
+    topic = create_topics(session)
+    standard = create_random_standards(session, topic, 1)
+    goal = create_random_goals(session, teacher, student, group, standard, n=1)
+    resources = create_random_resources(session, teacher, n=3, all_public=True)
+    resource_ids = [r.id for r in resources]
+
+    def link(rids):
+        response = client.post(
+            "/goal/resource-link/multi/",
+            json={"goal_id": goal.id, "resource_ids": rids},
+            headers=normal_user_token_headers,
+        )
+        assert response.status_code == 200
+        return response
+
+    link(resource_ids[:2])
+    session.refresh(goal)
+    version = goal.version
+    response = link(resource_ids[1:])
+    assert [r["id"] for r in response.json()["resources"]] == resource_ids
+    session.refresh(goal)
+    assert goal.version == version + 1
+
+    # linking only what is already linked leaves the goal as it was
+    response = link(resource_ids)
+    assert [r["id"] for r in response.json()["resources"]] == resource_ids
+    session.refresh(goal)
+    assert goal.version == version + 1
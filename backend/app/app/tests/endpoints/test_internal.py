@@ -0,0 +1,14 @@
+def test_get_pool_stats(client, superuser_token_headers):
+    response = client.get("/internal/pool", headers=superuser_token_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert set(data) == {"sync", "async"}
+    for status in data.values():
+        assert {"size", "checked_out", "checkouts", "waits", "invalidations"} <= set(
+            status
+        )
+
+
+def test_get_pool_stats_not_superuser(client, normal_user_token_headers):
+    response = client.get("/internal/pool", headers=normal_user_token_headers)
+    assert response.status_code == 400
@@ -1,3 +1,6 @@
+import base64
+import json
+
 from starlette import status
 
 from app import crud
@@ -13,6 +16,7 @@ from app.tests.tools.mock_data import (
 )
 from app.tests.tools.mock_params import random_lower_string
 from app.tests.tools.mock_user import get_user_from_token_headers
+from app.tests.tools.query_count import count_queries
 
 """ Create """
 
@@ -205,6 +209,24 @@ def test_get_public_resource_as_not_creator(client, session, normal_user_token_h
     assert data["creator"] is None
 
 
+def test_get_resource_not_modified(client, session, normal_user_token_headers):
+    user = get_user_from_token_headers(client, normal_user_token_headers)
+    resource = create_random_resource(session, user)
+    url = f"/resource/{resource.id}"
+    etag = client.get(url, headers=normal_user_token_headers).headers["ETag"]
+    response = client.get(
+        url, headers={**normal_user_token_headers, "If-None-Match": f"W/{etag}"}
+    )
+    assert response.status_code == 304
+
+    crud.resource.update(session, db_obj=resource, obj_in={"private": False})
+    response = client.get(
+        url, headers={**normal_user_token_headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
 def test_get_resource_does_not_exist(client, normal_user_token_headers):
     response = client.get(f"/resource/1", headers=normal_user_token_headers)
     assert response.status_code == 404
@@ -219,7 +241,42 @@ def test_get_resources(client, session, normal_user_token_headers):
     data = response.json()  # list of dicts
     response.json()
     assert len(data) == len(resources)
-    assert data == [rsc.dict(exclude={"creator_id"}) for rsc in resources]
+    assert data == [rsc.dict(exclude={"creator_id", "version"}) for rsc in resources]
+
+
+def test_get_resources_cursor(client, session, normal_user_token_headers):
+    test_user = get_user_from_token_headers(client, normal_user_token_headers)
+    resources = create_random_resources(session, test_user, 7)
+
+    data, cursor = [], None
+    for _ in range(3):
+        params = {"limit": 3, "cursor": cursor} if cursor else {"limit": 3}
+        response = client.get(
+            "/resource/", params=params, headers=normal_user_token_headers
+        )
+        assert response.status_code == 200
+        data.extend(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+    assert cursor is None
+    assert data == [rsc.dict(exclude={"creator_id", "version"}) for rsc in resources]
+
+
+def test_get_resources_invalid_cursor(client, normal_user_token_headers):
+    response = client.get(
+        "/resource/?cursor=not-a-cursor", headers=normal_user_token_headers
+    )
+    assert response.status_code == 400
+
+
+def test_get_resources_ndjson(client, session, normal_user_token_headers):
+    test_user = get_user_from_token_headers(client, normal_user_token_headers)
+    resources = create_random_resources(session, test_user, 12)
+    headers = dict(normal_user_token_headers, Accept="application/x-ndjson")
+    response = client.get("/resource/?limit=5", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    data = [json.loads(line) for line in response.text.splitlines()]
+    assert data == [rsc.dict(exclude={"creator_id", "version"}) for rsc in resources]
 
 
 def test_get_resources_standard(client, session, normal_user_token_headers):
@@ -238,7 +295,7 @@ def test_get_resources_standard(client, session, normal_user_token_headers):
     data = response.json()  # list of dicts
     assert response.status_code == 200
     assert len(data) == len(resources1)
-    assert data == [rsc.dict(exclude={"creator_id"}) for rsc in resources1]
+    assert data == [rsc.dict(exclude={"creator_id", "version"}) for rsc in resources1]
 
 
 def test_get_resources_include_public_no_standard(
@@ -257,7 +314,7 @@ def test_get_resources_include_public_no_standard(
     data = response.json()
     assert response.status_code == 200
     assert len(data) == len(resources1)
-    assert data == [rsc.dict(exclude={"creator_id"}) for rsc in resources1]
+    assert data == [rsc.dict(exclude={"creator_id", "version"}) for rsc in resources1]
 
 
 def test_get_resources_standard_include_public(
@@ -278,7 +335,37 @@ def test_get_resources_standard_include_public(
     assert response.status_code == 200
     exp_resources = resources1 + [rsc for rsc in resources2 if not rsc.private]
     assert len(data) == len(exp_resources)
-    assert data == [rsc.dict(exclude={"creator_id"}) for rsc in exp_resources]
+    assert data == [rsc.dict(exclude={"creator_id", "version"}) for rsc in exp_resources]
+
+
+def test_get_resources_standard_cursor(client, session, normal_user_token_headers):
+    user1 = get_user_from_token_headers(client, normal_user_token_headers)
+    user2 = create_random_user(session)
+    resources = create_random_resources(session, user2, 10, all_public=True)
+    resources += create_random_resources(session, user1, 4)
+    topic = create_topics(session, 1)
+    standard = create_random_standards(session, topic, 1)
+    standard.resources.extend(resources)
+    session.commit()
+
+    data, cursor = [], None
+    with count_queries(session) as statements:
+        for _ in range(4):
+            params = {"standard_id": standard.id, "include_public": True, "limit": 4}
+            if cursor:
+                params["cursor"] = cursor
+            response = client.get(
+                "/resource/", params=params, headers=normal_user_token_headers
+            )
+            assert response.status_code == 200
+            data.extend(response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+    assert cursor is None
+    assert data == [rsc.dict(exclude={"creator_id", "version"}) for rsc in resources]
+    # one bounded query per page, whatever the size of the standard
+    listings = [s for s in statements if "FROM resource JOIN standard_resource" in s]
+    assert len(listings) == 4
+    assert all("LIMIT" in s for s in listings)
 
 
 def test_get_resources_standard_non_exist(client, session, normal_user_token_headers):
@@ -296,6 +383,62 @@ def test_get_resources_standard_non_exist(client, session, normal_user_token_hea
     assert "standard" in data["detail"].lower()
 
 
+def test_search_resources(client, session, normal_user_token_headers):
+    user = get_user_from_token_headers(client, normal_user_token_headers)
+    other = create_random_user(session)
+    names = [
+        (user, "Fractions and decimals", True),
+        (user, "Fractions: adding fractions", True),
+        (user, "Photosynthesis", True),
+        (other, "Fractions for fun", False),
+        (other, "Fractions, secretly", True),
+    ]
+    ids = {}
+    for creator, name, private in names:
+        resource_in = ResourceCreateInternal(
+            name=name, private=private, creator_id=creator.id
+        )
+        ids[name] = crud.resource.create(session, obj_in=resource_in).id
+
+    response = client.get("/resource/?q=fraction", headers=normal_user_token_headers)
+    assert response.status_code == 200
+    assert [r["id"] for r in response.json()] == [
+        ids["Fractions: adding fractions"],
+        ids["Fractions and decimals"],
+    ]
+    response = client.get(
+        "/resource/?q=fraction&include_public=true&limit=2",
+        headers=normal_user_token_headers,
+    )
+    page = [r["id"] for r in response.json()]
+    cursor = response.headers["X-Next-Cursor"]
+    response = client.get(
+        f"/resource/?q=fraction&include_public=true&limit=2&cursor={cursor}",
+        headers=normal_user_token_headers,
+    )
+    page += [r["id"] for r in response.json()]
+    assert page[0] == ids["Fractions: adding fractions"]
+    assert sorted(page) == sorted(
+        ids[n] for n in ("Fractions and decimals", "Fractions: adding fractions")
+    ) + [ids["Fractions for fun"]]
+
+    response = client.get(
+        "/resource/?q=fraction -decimals&include_public=true",
+        headers=dict(normal_user_token_headers, Accept="application/x-ndjson"),
+    )
+    data = [json.loads(line) for line in response.text.splitlines()]
+    assert ids["Fractions and decimals"] not in [r["id"] for r in data]
+    assert len(data) == 2
+
+
+def test_search_resources_invalid_cursor(client, normal_user_token_headers):
+    cursor = base64.urlsafe_b64encode(b'["name",1]').decode()
+    response = client.get(
+        f"/resource/?q=fraction&cursor={cursor}", headers=normal_user_token_headers
+    )
+    assert response.status_code == 400
+
+
 """ Link """
 
 
@@ -420,6 +563,32 @@ def test_add_multi_standard_link(client, session, normal_user_token_headers):
     assert resource.standards == standards  # check db update
 
 
+def test_add_multi_standard_link_again(client, session, normal_user_token_headers):
+    topic = create_topics(session, 1)
+    standards = create_random_standards(session, topic, 4)
+    user = get_user_from_token_headers(client, normal_user_token_headers)
+    resource = create_random_resource(session, user)
+    standard_ids = [s.id for s in standards]
+    response = client.post(
+        "/resource/standard-link/multi",
+        json={"resource_id": resource.id, "standard_ids": standard_ids[:2]},
+        headers=normal_user_token_headers,
+    )
+    assert response.status_code == 200
+    with count_queries(session) as queries:
+        response = client.post(
+            "/resource/standard-link/multi",
+            json={"resource_id": resource.id, "standard_ids": standard_ids[1:]},
+            headers=normal_user_token_headers,
+        )
+    assert response.status_code == 200
+    assert len(response.json()["standards"]) == 4
+    session.refresh(resource)
+    assert resource.standards == standards
+    # the links are written by one statement, whatever exists already
+    assert len([q for q in queries if q.startswith("INSERT")]) == 1
+
+
 def test_add_multi_standard_link_non_exist_resource(
     client, session, normal_user_token_headers
 ):
@@ -574,3 +743,128 @@ def test_resource_update_not_creator(client, session, normal_user_token_headers)
         f"/resource/{resource.id}", json=data_up, headers=normal_user_token_headers
     )
     assert response.status_code == 401
+
+
+def test_resource_update_if_match(client, session, normal_user_token_headers):
+    user = get_user_from_token_headers(client, normal_user_token_headers)
+    resource = create_random_resource(session, user)
+    url = f"/resource/{resource.id}"
+    etag = client.get(url, headers=normal_user_token_headers).headers["ETag"]
+    # a concurrent edit, e.g. from another device
+    crud.resource.update(session, db_obj=resource, obj_in={"name": "renamed"})
+    response = client.patch(
+        url,
+        json={"name": "mine", "private": False},
+        headers={**normal_user_token_headers, "If-Match": etag},
+    )
+    assert response.status_code == 412
+
+    etag = client.get(url, headers=normal_user_token_headers).headers["ETag"]
+    response = client.patch(
+        url,
+        json={"name": "mine", "private": False},
+        headers={**normal_user_token_headers, "If-Match": etag},
+    )
+    assert response.status_code == 200
+    assert response.json()["name"] == "mine"
+
+
+""" Import and export cards """
+
+
+def test_import_cards_csv(client, session, normal_user_token_headers):
+    user = get_user_from_token_headers(client, normal_user_token_headers)
+    resource = create_random_resource(session, user)
+    body = 'answer,question\r\n4,2 + 2?\r\n"a\r\n""quoted"" line",Multiline?\r\n'
+    response = client.post(
+        f"/resource/{resource.id}/cards/import",
+        content=body.encode(),
+        headers={**normal_user_token_headers, "Content-Type": "text/csv"},
+    )
+    assert response.status_code == 201
+    assert response.json() == {"resource_id": resource.id, "imported": 2}
+    cards = session.exec(crud.card.select_by_resource(resource.id)).all()
+    assert [(c.question, c.answer) for c in cards] == [
+        ("2 + 2?", "4"),
+        ("Multiline?", 'a\r\n"quoted" line'),
+    ]
+
+
+def test_import_cards_ndjson(client, session, normal_user_token_headers):
+    user = get_user_from_token_headers(client, normal_user_token_headers)
+    resource = create_random_resource(session, user)
+    rows = [{"question": f"q{i}", "answer": f"a{i}"} for i in range(50)]
+    response = client.post(
+        f"/resource/{resource.id}/cards/import",
+        content="\n".join(json.dumps(row) for row in rows),
+        headers={**normal_user_token_headers, "Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 201
+    assert response.json()["imported"] == 50
+    cards = session.exec(crud.card.select_by_resource(resource.id)).all()
+    assert [dict(question=c.question, answer=c.answer) for c in cards] == rows
+
+
+def test_import_cards_malformed(client, session, normal_user_token_headers):
+    user = get_user_from_token_headers(client, normal_user_token_headers)
+    resource = create_random_resource(session, user)
+    url = f"/resource/{resource.id}/cards/import"
+    headers = {**normal_user_token_headers, "Content-Type": "application/x-ndjson"}
+    body = '{"question": "q", "answer": "a"}\n{"question": "q"}\n'
+    response = client.post(url, content=body, headers=headers)
+    assert response.status_code == 422
+    response = client.post(
+        url,
+        content="question\nq\n",
+        headers={**normal_user_token_headers, "Content-Type": "text/csv"},
+    )
+    assert response.status_code == 422
+    assert session.exec(crud.card.select_by_resource(resource.id)).all() == []
+
+    headers["Content-Type"] = "application/json"
+    response = client.post(url, content="[]", headers=headers)
+    assert response.status_code == 415
+
+
+def test_import_cards_not_creator(client, session, normal_user_token_headers):
+    resource = create_random_resource(session, create_random_user(session))
+    response = client.post(
+        f"/resource/{resource.id}/cards/import",
+        content="question,answer\nq,a\n",
+        headers={**normal_user_token_headers, "Content-Type": "text/csv"},
+    )
+    assert response.status_code == 401
+
+
+def test_export_cards(client, session, normal_user_token_headers):
+    user = get_user_from_token_headers(client, normal_user_token_headers)
+    resource = create_random_resource(session, user)
+    body = 'question,answer\nq1,a1\n"q, 2","a\n2"\n'
+    client.post(
+        f"/resource/{resource.id}/cards/import",
+        content=body,
+        headers={**normal_user_token_headers, "Content-Type": "text/csv"},
+    )
+    url = f"/resource/{resource.id}/cards/export"
+    response = client.get(url, headers=normal_user_token_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    cards = session.exec(crud.card.select_by_resource(resource.id)).all()
+    lines = [f"{c.id},{c.question},{c.answer}" for c in cards]
+    assert response.text == (
+        f'id,question,answer\r\n{lines[0]}\r\n{cards[1].id},"q, 2","a\n2"\r\n'
+    )
+
+    headers = dict(normal_user_token_headers, Accept="application/x-ndjson")
+    response = client.get(url, headers=headers)
+    data = [json.loads(line) for line in response.text.splitlines()]
+    assert data == [c.dict(exclude={"resource_id", "version"}) for c in cards]
+
+
+def test_export_cards_private_not_creator(client, session, normal_user_token_headers):
+    other = create_random_user(session)
+    resource = create_random_resources(session, other, 1, all_private=True)
+    response = client.get(
+        f"/resource/{resource.id}/cards/export", headers=normal_user_token_headers
+    )
+    assert response.status_code == 401
@@ -1,3 +1,9 @@
 def test_get_root(client):
     response = client.get("/")
     assert response.status_code == 200
+
+
+def test_server_timing(client, normal_user_token_headers):
+    response = client.get("/user/me", headers=normal_user_token_headers)
+    assert response.status_code == 200
+    assert 'db;dur=' in response.headers["Server-Timing"]
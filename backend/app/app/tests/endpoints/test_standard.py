@@ -0,0 +1,89 @@
+from app import crud
+from app.models import StandardRead, StandardUpdate, Subject
+from app.tests.tools.mock_data import create_random_standards, create_topics
+from app.tests.tools.query_count import count_queries
+
+
+def test_get_standard(client, session, normal_user_token_headers):
+    topic = create_topics(session)
+    standard = create_random_standards(session, topic)
+    response = client.get(f"/standard/{standard.id}", headers=normal_user_token_headers)
+    assert response.status_code == 200
+    assert response.json() == StandardRead.from_orm(standard).dict()
+
+
+def test_get_standard_not_modified(client, session, normal_user_token_headers):
+    topic = create_topics(session)
+    standard = create_random_standards(session, topic)
+    url = f"/standard/{standard.id}"
+    etag = client.get(url, headers=normal_user_token_headers).headers["ETag"]
+    headers = {**normal_user_token_headers, "If-None-Match": etag}
+    assert client.get(url, headers=headers).status_code == 304
+    standard_in = StandardUpdate(template="updated", grade=1, subject=Subject.ela)
+    crud.standard.update(session, db_obj=standard, obj_in=standard_in)
+    assert client.get(url, headers=headers).status_code == 200
+
+
+def test_get_standard_not_found(client, normal_user_token_headers):
+    response = client.get("/standard/999999", headers=normal_user_token_headers)
+    assert response.status_code == 404
+
+
+def test_get_standard_from_catalog(client, session, normal_user_token_headers):
+    topic = create_topics(session)
+    std_ids = [s.id for s in create_random_standards(session, topic, 3)]
+    client.get(f"/standard/{std_ids[0]}", headers=normal_user_token_headers)
+    with count_queries(session) as statements:
+        for std_id in std_ids:
+            response = client.get(
+                f"/standard/{std_id}", headers=normal_user_token_headers
+            )
+            assert response.status_code == 200
+    assert not [s for s in statements if "standard" in s]
+
+
+def test_get_standard_after_update(client, session, normal_user_token_headers):
+    topic = create_topics(session)
+    standard = create_random_standards(session, topic)
+    client.get(f"/standard/{standard.id}", headers=normal_user_token_headers)
+    standard_in = StandardUpdate(template="updated", grade=1, subject=Subject.ela)
+    crud.standard.update(session, db_obj=standard, obj_in=standard_in)
+    response = client.get(f"/standard/{standard.id}", headers=normal_user_token_headers)
+    assert response.json()["template"] == "updated"
+
+
+def test_get_standards_by_grade_and_subject(
+    client, session, normal_user_token_headers
+):
+    topic = create_topics(session)
+    standards = create_random_standards(session, topic, 20)
+    grade, subject = standards[0].grade, standards[0].subject
+    response = client.get(
+        "/standard/",
+        params={"grade": grade, "subject": subject},
+        headers=normal_user_token_headers,
+    )
+    assert response.status_code == 200
+    expected = [
+        StandardRead.from_orm(s).dict()
+        for s in standards
+        if s.grade == grade and s.subject == subject
+    ]
+    assert response.json() == expected
+
+
+def test_get_standards_cursor(client, session, normal_user_token_headers):
+    topic = create_topics(session)
+    standards = create_random_standards(session, topic, 7)
+
+    data, cursor = [], None
+    for _ in range(3):
+        params = {"limit": 3, "cursor": cursor} if cursor else {"limit": 3}
+        response = client.get(
+            "/standard/", params=params, headers=normal_user_token_headers
+        )
+        assert response.status_code == 200
+        data.extend(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+    assert cursor is None
+    assert data == [StandardRead.from_orm(s).dict() for s in standards]
@@ -0,0 +1,21 @@
+from contextlib import contextmanager
+from typing import Iterator
+
+from sqlalchemy import event
+from sqlmodel import Session
+
+
+@contextmanager
+def count_queries(session: Session) -> Iterator[list[str]]:
+    """Collect the SQL statements executed on the session's engine"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
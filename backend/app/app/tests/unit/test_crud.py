@@ -1,9 +1,15 @@
+import asyncio
+
 import pytest
 import sqlalchemy.exc
+from sqlalchemy.orm.exc import StaleDataError
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app import crud
 from app.controller.endpoints.attempt import is_correct
 from app.models import (
+    Resource,
     StandardCreate,
     Subject,
     ResourceCreateInternal,
@@ -17,6 +23,9 @@ from app.models import (
     LapCreate,
     AttemptCreateExternal,
     AttemptCreateInternal,
+    CardCreate,
+    GoalReadWithResources,
+    LapReadWithAttempts,
 )
 from app.tests.tools.mock_data import (
     create_topics,
@@ -28,10 +37,12 @@ from app.tests.tools.mock_data import (
     create_random_cards,
     create_random_goals_with_resources,
     create_random_laps,
+    create_random_attempts,
     pprint_dict,
 )
-from app.tests.tools.mock_params import random_email
+from app.tests.tools.mock_params import random_email, random_lower_string
 from app.tests.tools.mock_user import random_password
+from app.tests.tools.query_count import count_queries
 
 
 def test_resource_user_relationship(session):
@@ -84,7 +95,8 @@ def test_standard_create_multiple_per_topic(session):
             standard = crud.standard.create(session, obj_in=standard_in)
             assert standard.topic == topic
             created_standards.append(standard)
-        assert topic.standards == created_standards
+        # heap order, and so the lazy load's order, shifts once rows are updated
+        assert sorted(topic.standards, key=lambda s: s.id) == created_standards
 
 
 def test_standard_resources(session):
@@ -284,6 +296,70 @@ def test_get_multi_by_ids(session):
     assert ret_standards == standards[::2]
 
 
+def test_get_multi_keyset(session):
+    topic = create_topics(session, 1)
+    standards = create_random_standards(session, topic, 10)
+    page1 = crud.standard.get_multi(session, limit=4)
+    page2 = crud.standard.get_multi(
+        session, limit=4, after=crud.standard.keyset_key(page1[-1])
+    )
+    page3 = crud.standard.get_multi(
+        session, limit=4, after=crud.standard.keyset_key(page2[-1])
+    )
+    assert page1 + page2 + page3 == standards
+
+
+def test_get_multi_keyset_sort_key(session):
+    topic = create_topics(session, 1)
+    standards = create_random_standards(session, topic, 10)
+    expected = sorted(standards, key=lambda s: (s.grade, s.id))
+    page1 = crud.standard.get_multi(session, limit=6, sort_key="grade")
+    after = crud.standard.keyset_key(page1[-1], sort_key="grade")
+    page2 = crud.standard.get_multi(session, limit=6, after=after, sort_key="grade")
+    assert page1 + page2 == expected
+
+
+def test_create_multi_bulk(session):
+    user = create_random_user(session)
+    resource = create_random_resources(session, user)
+    assert resource.cards == []
+    cards_in = [
+        CardCreate(
+            question=random_lower_string(12),
+            answer=random_lower_string(12),
+            resource_id=resource.id,
+        )
+        for _ in range(25)
+    ]
+    cards = crud.card.create_multi(session, objs_in=cards_in, bulk=True)
+    assert len(cards) == 25
+    assert [c.question for c in cards] == [c.question for c in cards_in]
+    assert all(c.id is not None for c in cards)
+    # objects are persistent and the parent collection was expired on commit
+    assert crud.card.get(session, cards[0].id) is cards[0]
+    assert resource.cards == cards
+
+
+def test_create_multi_bulk_composite_key(session):
+    goal = create_random_goals_with_resources(session, n=1, n_rsc_per=1, n_cards_per=4)
+    resource = goal.resources[0]
+    lap = create_random_laps(session, goal, resource)
+    attempts_in = [
+        AttemptCreateInternal(
+            lap_id=lap.id, card_id=card.id, submission="answer", correct=False
+        )
+        for card in resource.cards
+    ]
+    attempts = crud.attempt.create_multi(session, objs_in=attempts_in, bulk=True)
+    assert [a.card_id for a in attempts] == [c.id for c in resource.cards]
+    assert len({a.id for a in attempts}) == 4
+    assert lap.attempts == attempts
+
+
+def test_create_multi_bulk_empty(session):
+    assert crud.card.create_multi(session, objs_in=[], bulk=True) == []
+
+
 def test_create_goal(session):
     teacher = create_random_user(session)
     student = create_random_user(session)
@@ -331,6 +407,23 @@ def test_update(session):
     assert user.resources[0] == resource_updated_db
 
 
+def test_update_bumps_version(session, engine):
+    user = create_random_user(session)
+    resource_in = ResourceCreateInternal(name="og", creator_id=user.id)
+    resource_db = crud.resource.create(session, obj_in=resource_in)
+    assert resource_db.version == 1
+    crud.resource.update(session, db_obj=resource_db, obj_in={"name": "new"})
+    assert resource_db.version == 2
+
+    # another session updates the row after this one read it
+    with Session(engine) as other:
+        other_db = other.get(Resource, resource_db.id)
+        crud.resource.update(other, db_obj=other_db, obj_in={"name": "x"})
+    with pytest.raises(StaleDataError):
+        crud.resource.update(session, db_obj=resource_db, obj_in={"name": "lost"})
+    session.rollback()
+
+
 def test_base_update_with_dict(session):
     user = create_random_user(session)
     resource_in1 = ResourceCreateInternal(
@@ -414,6 +507,74 @@ def test_goal_resource_link(session):
     assert all(r.goals == [goal] for r in resources)
 
 
+def test_get_goal_loader_profile(session):
+    goal = create_random_goals_with_resources(session, n_rsc_per=3, n_cards_per=4)
+    session.commit()
+    goal_id = goal.id
+    session.expunge_all()
+    with count_queries(session) as statements:
+        goal = crud.goal.get(session, goal_id, load=GoalReadWithResources)
+        data = GoalReadWithResources.from_orm(goal)
+    # goal with teacher, student, standard and topic; resources; cards
+    assert len(statements) == 3
+    assert len(data.resources) == 3
+    assert all(len(r.cards) == 4 for r in data.resources)
+
+
+def test_get_lap_loader_profile(session):
+    goal = create_random_goals_with_resources(session, n_rsc_per=1, n_cards_per=5)
+    lap = create_random_laps(session, goal, goal.resources[0])
+    create_random_attempts(session, lap)
+    lap_id = lap.id
+    session.expunge_all()
+    with count_queries(session) as statements:
+        lap = crud.lap.get(session, lap_id, load=LapReadWithAttempts)
+        data = LapReadWithAttempts.from_orm(lap)
+    # lap with goal, resource and the goal's relations; cards; attempts with card
+    assert len(statements) == 3
+    assert len(data.attempts) == 5
+
+
+def test_aget_lap_loader_profile(session, async_engine):
+    goal = create_random_goals_with_resources(session, n_rsc_per=1, n_cards_per=5)
+    lap = create_random_laps(session, goal, goal.resources[0])
+    create_random_attempts(session, lap)
+    session.commit()
+
+    async def read_lap():
+        async with AsyncSession(async_engine) as a_session:
+            db_lap = await crud.lap.aget(a_session, lap.id, load=LapReadWithAttempts)
+            # no lazy loads are possible here, so the profile must cover the model
+            return LapReadWithAttempts.from_orm(db_lap)
+
+    data = asyncio.run(read_lap())
+    assert data.goal.student.id == goal.student_id
+    assert len(data.attempts) == 5
+
+
+def test_acreate_multi(session, async_engine):
+    user = create_random_user(session)
+    resource = create_random_resources(session, user)
+    session.commit()
+    cards_in = [
+        CardCreate(question=random_lower_string(), answer="a", resource_id=resource.id)
+        for _ in range(3)
+    ]
+
+    async def create_cards():
+        async with AsyncSession(async_engine) as a_session:
+            return await crud.card.acreate_multi(a_session, objs_in=cards_in)
+
+    cards = asyncio.run(create_cards())
+    assert [c.question for c in cards] == [c.question for c in cards_in]
+    assert all(c.id is not None for c in cards)
+
+
+def test_get_unknown_loader_profile(session):
+    with pytest.raises(ValueError):
+        crud.topic.get(session, 1, load=GoalReadWithResources)
+
+
 def test_create_group(session):
     group_in = GroupCreate(label="Tester's classroom")
     group = crud.group.create(session, obj_in=group_in)
@@ -476,6 +637,45 @@ def test_create_attempts(session):
         assert len(lap.attempts) == 3
 
 
+def test_attempt_lap_counters(session):
+    goal = create_random_goals_with_resources(session, n_rsc_per=1, n_cards_per=6)
+    lap = create_random_laps(session, goal, goal.resources[0])
+    attempts = create_random_attempts(session, lap)
+    n_correct = sum(a.correct for a in attempts)
+    session.refresh(lap)
+    assert lap.n_attempted == 6
+    assert lap.n_correct == n_correct
+    assert lap.score == pytest.approx(100 * n_correct / 6)
+
+
+def test_reconcile_lap_counters(session):
+    goal = create_random_goals_with_resources(session, n_rsc_per=1, n_cards_per=4)
+    lap = create_random_laps(session, goal, goal.resources[0])
+    create_random_attempts(session, lap)
+    session.refresh(lap)
+    counters = lap.n_attempted, lap.n_correct, lap.score
+    crud.lap.update(session, db_obj=lap, obj_in={"n_attempted": 0, "score": None})
+
+    assert crud.lap.reconcile_counters(session) == [lap.id]
+    session.refresh(lap)
+    assert (lap.n_attempted, lap.n_correct, lap.score) == counters
+    assert crud.lap.reconcile_counters(session) == []
+
+
+def test_reconcile_goal_progress(session):
+    goal = create_random_goals_with_resources(session, n_rsc_per=1, n_cards_per=4)
+    lap = create_random_laps(session, goal, goal.resources[0])
+    create_random_attempts(session, lap)
+    progress = crud.goal_progress.get(session, goal.id)
+    expected = progress.n_trials, progress.n_correct, progress.met
+    crud.goal_progress.remove(session, _id=goal.id)
+
+    assert crud.goal_progress.reconcile(session) == [goal.id]
+    progress = crud.goal_progress.get(session, goal.id)
+    assert (progress.n_trials, progress.n_correct, progress.met) == expected
+    assert crud.goal_progress.reconcile(session) == []
+
+
 def test_remove_resource_associated_with_standard(session):
     user = create_random_user(session, role=None)
     resource = create_random_resources(session, user, 1)
@@ -0,0 +1,130 @@
+from sqlmodel import select
+
+from app.benchmarks.index_advisor import (
+    Proposal,
+    TableIndex,
+    advise,
+    alternatives,
+    capture,
+    consolidate,
+    propose_for_filter,
+    propose_for_plan,
+    redundant_indexes,
+    render_migration,
+)
+from app.models import Attempt
+
+RESOURCE_COLUMNS = {
+    "id": "integer",
+    "creator_id": "integer",
+    "private": "boolean",
+    "name": "character varying",
+}
+
+
+def test_alternatives():
+    expr = "((id > 10) AND ((creator_id = 5) OR (NOT private)))"
+    assert alternatives(expr) == [
+        ["id > 10", "creator_id = 5"],
+        ["id > 10", "NOT private"],
+    ]
+
+
+def test_propose_partial_index():
+    expr = "((resource.creator_id = 5) OR (NOT resource.private))"
+    proposals = propose_for_filter(
+        "resource", "resource", expr, RESOURCE_COLUMNS, ["id"]
+    )
+    assert [(p.columns, p.where) for p in proposals] == [
+        (["creator_id"], None),
+        (["id"], "NOT private"),
+    ]
+    assert proposals[1].name == "ix_resource_id_not_private"
+
+
+def test_propose_for_sorted_scan():
+    plan = {
+        "Node Type": "Sort",
+        "Sort Key": ["card.id"],
+        "Plans": [
+            {
+                "Node Type": "Seq Scan",
+                "Relation Name": "card",
+                "Alias": "card",
+                "Filter": "(resource_id = 3)",
+            }
+        ],
+    }
+    columns = {"card": {"id": "integer", "resource_id": "integer"}}
+    [proposal] = propose_for_plan(plan, columns, {}, {"card": 10_000}, 1000)
+    assert proposal.columns == ["resource_id", "id"]
+    assert propose_for_plan(plan, columns, {}, {"card": 10}, 1000) == []
+
+
+def test_consolidate_keeps_longest():
+    short = Proposal("card", ["resource_id"], 1, reasons={"foreign key"})
+    long = Proposal(
+        "card", ["resource_id", "id"], 1, reasons={"workload"}, calls=3, total_ms=9
+    )
+    [proposal] = consolidate([short, long])
+    assert proposal.columns == ["resource_id", "id"]
+    assert proposal.reasons == {"foreign key", "workload"}
+    assert proposal.calls == 3
+
+
+def test_redundant_unique_index():
+    pkey = TableIndex("card", "card_pkey", ["id"], True, True, None, "btree")
+    pair = TableIndex(
+        "card", "card_id_resource_id_key", ["id", "resource_id"],
+        True, False, None, "btree", "card_id_resource_id_key",
+    )
+    assert redundant_indexes([pkey, pair], set()) == [(pair, pkey)]
+    # a foreign key pointing at the pair needs it unique
+    assert redundant_indexes([pkey, pair], {("card", ("id", "resource_id"))}) == []
+
+
+def test_render_migration():
+    advice = dict(
+        proposals=[
+            dict(
+                name="ix_resource_id_not_private",
+                table="resource",
+                columns=["id"],
+                where="NOT private",
+                reasons=["workload"],
+                calls=2,
+                total_ms=1.5,
+            )
+        ],
+        redundant=[
+            dict(
+                name="card_id_resource_id_key",
+                table="card",
+                columns=["id", "resource_id"],
+                unique=True,
+                constraint="card_id_resource_id_key",
+                covered_by="card_pkey",
+            )
+        ],
+    )
+    source = render_migration(advice, "workload indexes", "abc123", "def456")
+    compile(source, "migration", "exec")
+    assert 'postgresql_where=sa.text("NOT private")' in source
+    assert "postgresql_concurrently=True" in source
+    assert 'op.drop_constraint("card_id_resource_id_key", "card"' in source
+
+
+def test_models_index_foreign_keys(session):
+    advice = advise(session, {}, min_rows=0)
+    assert advice["proposals"] == []
+    assert advice["redundant"] == []
+
+
+def test_advise_from_capture(session):
+    with capture() as workload:
+        session.exec(select(Attempt).where(Attempt.submission == "42")).all()
+    advice = advise(session, workload, min_rows=-1)
+    assert advice["workload"]["explained"] == 1
+    [proposal] = advice["proposals"]
+    assert proposal["name"] == "ix_attempt_submission"
+    assert proposal["reasons"] == ["workload"]
@@ -0,0 +1,60 @@
+from app.benchmarks.plan_check import compare, statement_key, summarize
+
+PLAN = {
+    "Node Type": "Nested Loop",
+    "Total Cost": 120.5,
+    "Plans": [
+        {
+            "Node Type": "Index Scan",
+            "Relation Name": "lap",
+            "Index Name": "lap_pkey",
+        },
+        {
+            "Node Type": "Bitmap Heap Scan",
+            "Relation Name": "attempt",
+            "Plans": [
+                {"Node Type": "Bitmap Index Scan", "Index Name": "ix_attempt_lap_id"}
+            ],
+        },
+    ],
+}
+
+
+def test_statement_key_folds_lists():
+    short = "SELECT card.id FROM card\n WHERE card.resource_id IN (%(id_1_1)s)"
+    long = (
+        "SELECT card.id FROM card WHERE card.resource_id "
+        "IN (%(id_1_1)s, %(id_1_2)s, %(id_1_3)s)"
+    )
+    assert statement_key(short) == statement_key(long)
+    assert statement_key("SELECT %s, %s FROM lap") == "SELECT %s FROM lap"
+
+
+def test_summarize_scans_by_index():
+    assert summarize(PLAN) == dict(
+        cost=120.5,
+        scans=["Index Scan using ix_attempt_lap_id", "Index Scan using lap_pkey"],
+    )
+
+
+def test_compare():
+    baseline = {"q": summarize(PLAN)}
+    seq = dict(cost=150.0, scans=["Index Scan using lap_pkey", "Seq Scan on attempt"])
+    report = compare(baseline, {"q": seq}, {"attempt": 10_000}, 1000, 2.0)
+    assert [r["reason"] for r in report["regressions"]] == ["Seq Scan on attempt"]
+    assert report["changed"][0]["after"] == seq["scans"]
+
+    # a sequential scan of a small table is no regression
+    report = compare(baseline, {"q": seq}, {"attempt": 10}, 1000, 2.0)
+    assert report["regressions"] == []
+
+    dearer = dict(summarize(PLAN), cost=900.0)
+    report = compare(baseline, {"q": dearer}, {}, 1000, 2.0)
+    assert [r["reason"] for r in report["regressions"]] == ["cost 120.5 -> 900.0"]
+
+    report = compare(baseline, {"new": seq}, {"attempt": 10_000}, 1000, 2.0)
+    assert [r["reason"] for r in report["regressions"]] == [
+        "new statement with Seq Scan on attempt"
+    ]
+    assert report["new"] == ["new"]
+    assert report["missing"] == ["q"]
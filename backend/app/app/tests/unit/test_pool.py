@@ -0,0 +1,52 @@
+import pytest
+import sqlalchemy.exc
+from sqlmodel import create_engine
+
+from app.core.pool import InstrumentedQueuePool
+
+
+@pytest.fixture
+def small_engine(engine):
+    small = create_engine(
+        engine.url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=1,
+        pool_timeout=0.1,
+    )
+    yield small
+    small.dispose()
+
+
+def test_pool_stats_checkouts(small_engine):
+    with small_engine.connect(), small_engine.connect():
+        status = small_engine.pool.status_dict()
+        assert status["checked_out"] == 2
+        assert status["overflow"] == 1
+    status = small_engine.pool.status_dict()
+    assert status["checkouts"] == 2
+    assert status["connects"] == 2
+    assert status["peak_overflow"] == 1
+    assert status["waits"] == status["timeouts"] == 0
+
+
+def test_pool_stats_timeout(small_engine):
+    with small_engine.connect(), small_engine.connect():
+        with pytest.raises(sqlalchemy.exc.TimeoutError):
+            small_engine.connect()
+    status = small_engine.pool.status_dict()
+    assert status["checkouts"] == 2
+    assert status["waits"] == status["timeouts"] == 1
+    assert status["wait_ms_max"] >= 100
+
+
+def test_pool_stats_invalidate_and_dispose(small_engine):
+    with small_engine.connect() as connection:
+        connection.invalidate()
+    small_engine.dispose()
+    with small_engine.connect():
+        pass
+    status = small_engine.pool.status_dict()
+    assert status["invalidations"] == 1
+    assert status["checkouts"] == 2
+    assert status["connects"] == 2
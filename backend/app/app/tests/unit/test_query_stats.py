@@ -0,0 +1,40 @@
+import logging
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.core.query_stats import QueryStatsMiddleware
+
+
+@pytest.fixture
+def stats_client(engine):
+    app = FastAPI()
+    app.add_middleware(QueryStatsMiddleware, max_queries=3, max_ms=10_000)
+
+    @app.get("/queries/{n}")
+    def run_queries(n: int):
+        with engine.connect() as conn:
+            for i in range(n):
+                conn.execute(text("SELECT :i"), {"i": i})
+        return {}
+
+    return TestClient(app)
+
+
+def test_server_timing_counts_queries(stats_client):
+    response = stats_client.get("/queries/2")
+    assert response.status_code == 200
+    assert 'desc="2 queries"' in response.headers["Server-Timing"]
+
+
+def test_log_request_over_query_limit(stats_client, caplog):
+    with caplog.at_level(logging.WARNING, logger="app.core.query_stats"):
+        stats_client.get("/queries/3")
+        assert not caplog.records
+        stats_client.get("/queries/5")
+    [record] = caplog.records
+    assert "GET /queries/5" in record.getMessage()
+    assert "5 x" in record.getMessage()
+    assert "SELECT %(i)s" in record.getMessage()
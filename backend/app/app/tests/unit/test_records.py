@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.controller.endpoints.common_params import csv_records, ndjson_records
+
+
+def parse(records, body: bytes, chunk_size: int) -> list[tuple[str, ...]]:
+    async def chunks():
+        for i in range(0, len(body), chunk_size):
+            yield body[i: i + chunk_size]
+
+    async def collect():
+        return [row async for row in records(chunks(), ("question", "answer"))]
+
+    return asyncio.run(collect())
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 1000])
+def test_csv_records_across_chunks(chunk_size):
+    body = '﻿answer,question\n4,2 + 2?\n"x\n""y""",π?\n'.encode()
+    assert parse(csv_records, body, chunk_size) == [
+        ("2 + 2?", "4"),
+        ("π?", 'x\n"y"'),
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 1000])
+def test_ndjson_records_across_chunks(chunk_size):
+    body = '{"question": "π?", "answer": "3.14"}\n\n{"question": "q", "answer": "a"}'
+    assert parse(ndjson_records, body.encode(), chunk_size) == [
+        ("π?", "3.14"),
+        ("q", "a"),
+    ]
+
+
+def test_records_malformed():
+    with pytest.raises(HTTPException):
+        parse(csv_records, b"question,answer\nq\n", 4)
+    with pytest.raises(HTTPException):
+        parse(csv_records, b"", 4)
+    with pytest.raises(HTTPException):
+        parse(csv_records, b"question,answer\n\xff,a\n", 4)
+    with pytest.raises(HTTPException):
+        parse(ndjson_records, b'{"question": 1, "answer": "a"}\n', 4)
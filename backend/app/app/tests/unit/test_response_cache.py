@@ -0,0 +1,58 @@
+import threading
+
+import pytest
+
+from app.core.response_cache import (
+    CacheServer,
+    LRUBackend,
+    ResponseCache,
+    SocketBackend,
+)
+
+
+def test_lru_evicts_least_recently_used():
+    backend = LRUBackend(max_bytes=10)
+    backend.set("a", b"1234")
+    backend.set("b", b"1234")
+    backend.get("a")
+    backend.set("c", b"1234")
+    assert backend.get("b") is None
+    assert backend.get("a") == b"1234"
+    assert backend.size == 8
+    backend.set("big", b"x" * 11)
+    assert backend.get("big") is None
+
+
+def test_cache_checks_version():
+    cache = ResponseCache(LRUBackend(max_bytes=1000))
+    cache.set("deck:1", 2, b'{"id":1}')
+    assert cache.get("deck:1", 2) == b'{"id":1}'
+    assert cache.get("deck:1", 3) is None
+    cache.invalidate("deck:1")
+    assert cache.get("deck:1", 2) is None
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.fixture
+def cache_server(tmp_path):
+    path = str(tmp_path / "cache.sock")
+    server = CacheServer(path, max_bytes=1000)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield path
+    server.shutdown()
+    server.server_close()
+
+
+def test_socket_backend(cache_server):
+    worker1, worker2 = SocketBackend(cache_server), SocketBackend(cache_server)
+    worker1.set("deck:1", b"\n" * 3)
+    assert worker2.get("deck:1") == b"\n" * 3
+    worker2.delete("deck:1")
+    assert worker1.get("deck:1") is None
+
+
+def test_socket_backend_unavailable(tmp_path):
+    backend = SocketBackend(str(tmp_path / "none.sock"))
+    backend.set("deck:1", b"{}")
+    assert backend.get("deck:1") is None
@@ -0,0 +1,18 @@
+import json
+from datetime import datetime
+
+from fastapi.encoders import jsonable_encoder
+
+from app.core.serialization import dumps
+from app.models import AttemptRead, CardRead, ResourceFormat, ResourceReadWithCards
+
+
+def test_dumps_matches_jsonable_encoder():
+    card = CardRead(id=1, question="2 + 2?", answer="4")
+    content = {
+        "resource": ResourceReadWithCards(id=1, name="sums", cards=[card]),
+        "attempts": [AttemptRead(submission="4", correct=True, card=card)],
+        "format": ResourceFormat.flashcard,
+        "at": datetime(2023, 5, 1, 12, 30),
+    }
+    assert json.loads(dumps(content)) == jsonable_encoder(content)
@@ -0,0 +1,33 @@
+import gc
+
+from app.server import APP, Server, cpu_count, gunicorn_options, worker_count
+
+
+def test_worker_count(test_settings):
+    assert worker_count(test_settings.copy(update=dict(WEB_CONCURRENCY=None))) == (
+        cpu_count()
+    )
+    assert worker_count(test_settings.copy(update=dict(WEB_CONCURRENCY=3))) == 3
+
+
+def test_gunicorn_options(test_settings):
+    settings = test_settings.copy(update=dict(WEB_CONCURRENCY=2))
+    server = Server(APP, gunicorn_options(settings, "127.0.0.1:8000", "warning"))
+    assert server.cfg.workers == 2
+    assert server.cfg.worker_class_str == "uvicorn.workers.UvicornWorker"
+    assert server.cfg.bind == ["127.0.0.1:8000"]
+    assert server.cfg.preload_app is settings.WEB_PRELOAD
+    assert server.cfg.max_requests == settings.WEB_MAX_REQUESTS
+    assert server.cfg.loglevel == "warning"
+
+
+def test_preload_freezes_app(test_settings):
+    options = gunicorn_options(test_settings, "127.0.0.1:8000", "info")
+    options["preload_app"] = True
+    try:
+        app = Server(APP, options).load()
+        assert app.title
+        assert gc.isenabled()
+        assert gc.get_freeze_count() > 0
+    finally:
+        gc.unfreeze()
@@ -35,6 +35,6 @@ export PORT=${PORT:-8000}  # should be routed in docker-compose.yml
 export BACKEND_CORS_ORIGINS=${BACKEND_CORS_ORIGINS}
 export LOG_LEVEL="info"
 
-# Run gunicorn/uvicorn
-#exec uvicorn --reload --host $HOST --port $PORT --log-level debug "$APP_MODULE" --reload-exclude "test_*.py"
-exec gunicorn --reload --bind $HOST:$PORT  "$APP_MODULE" -k uvicorn.workers.UvicornWorker -w 1 --log-level $LOG_LEVEL
\ No newline at end of file
+# Run uvicorn with reload in local/dev, gunicorn with uvicorn workers elsewhere,
+# see app/server.py and the WEB_* settings
+exec python -m app.server --host $HOST --port $PORT --log-level $LOG_LEVEL --app "$APP_MODULE"
\ No newline at end of file